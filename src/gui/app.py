@@ -18,6 +18,9 @@ from gui.core.stocks_callbacks import register_stocks_callbacks
 from gui.core.home_callbacks import register_home_callbacks
 
 from stocktracker.wallet import Wallet
+from stocktracker.journal import WalletJournal, load_wallets
+from stocktracker.portfolioset import PortfolioSet
+from stocktracker.benchmarks import get_benchmark_service
 
 # Initialize the app
 app = dash.Dash(
@@ -29,8 +32,13 @@ app = dash.Dash(
 # DEMO DATA SETUP
 # =============================================================================
 def get_wallets():
-    """Returns new wallet instances every time"""
-    
+    """Loads the saved wallets (snapshot + journal tail), creating the demo wallets on first run"""
+
+    list_wallets = PortfolioSet(load_wallets())
+    if list_wallets:
+        list_wallets.refresh()  # um download em lote para todas as carteiras
+        return list_wallets
+
     tech_wallet = Wallet("Tech Titans")
     tech_wallet.add_stock("AAPL", 15, 182.63, "2024-06-03")
     tech_wallet.add_stock("MSFT", 8, 402.15, "2024-05-15")
@@ -47,7 +55,10 @@ def get_wallets():
     auto_wallet.add_stock("F", 50, 12.06, "2024-05-10")
     auto_wallet.add_stock("GM", 30, 46.25, "2024-05-18")
 
-    list_wallets = [tech_wallet, finance_wallet, auto_wallet]
+    list_wallets = PortfolioSet([tech_wallet, finance_wallet, auto_wallet])
+    for wallet in list_wallets:
+        WalletJournal.create(wallet)  # passa a gravar as compras e vendas
+    list_wallets.refresh()  # um download em lote para todas as carteiras
     
     return list_wallets
 
@@ -56,6 +67,7 @@ def get_wallets():
 # =============================================================================
 # Register all callbacks at startup
 wallets_l = get_wallets()
+get_benchmark_service().start()  # indices do dropdown ficam em memoria, atualizados em segundo plano
 register_wallets_callbacks(app, wallets_l)
 register_stocks_callbacks(app, wallets_l)
 register_home_callbacks(app)
@@ -11,19 +11,20 @@ import dash_bootstrap_components as dbc
 
 import plotly.graph_objects as go
 
-import yfinance as yf
-
 from stocktracker.performancereport import performancereport
 
 
-def get_benchmark_history(benchmark_ticket, start_date, end_date):
-    benchmark = yf.Ticker(benchmark_ticket)
-    hist = benchmark.history(start=start_date, end=end_date)
-    if hist.empty or "Close" not in hist.columns:
-        return None
-    hist.index = hist.index.tz_localize(None) if hist.index.tzinfo else hist.index
-    hist.index = hist.index.normalize()
-    return hist["Close"]
+def format_metric(value, scale=1, suffix="", decimals=2):
+    """Formats a metric with `decimals` decimals (times `scale`, plus `suffix`), or 'n/a' when it is NaN."""
+    return "n/a" if pd.isna(value) else f"{value * scale:.{decimals}f}{suffix}"
+
+
+def metric_row(items):
+    """Row of small labeled values, four per line, from (label, value) pairs."""
+    return dbc.Row([
+        dbc.Col([html.Small(label, className="text-muted"), html.H6(value)], width=3)
+        for label, value in items
+    ])
 
 
 def register_stocks_callbacks(app, wallets):
@@ -149,12 +150,14 @@ def register_stocks_callbacks(app, wallets):
             except (TypeError, ValueError):
                 raise ValueError("Please enter a valid date (YYYY-MM-DD)")
 
-            # All validations passed - add the stock to wallet
+            # All validations passed - add the stock to wallet; the purchase is
+            # checked against the price history before it is journaled
             wallet.add_stock(
                 ticket.strip().upper(),  # Standardize ticket format
                 quantity,  # Number of shares
                 price,  # Purchase price
                 purchase_date,  # Formatted purchase date
+                validate=True,
             )
 
             # Create updated stock list display
@@ -494,46 +497,10 @@ def register_stocks_callbacks(app, wallets):
             name="Carteira"
         ))
 
-        # Adiciona o benchmark se selecionado
+        # Adiciona o benchmark se selecionado: mesmas compras, feitas no benchmark
         if benchmark_ticket and benchmark_ticket != "none":
-            start_date = wallet_history.index[0].strftime("%Y-%m-%d")
-            end_date = wallet_history.index[-1].strftime("%Y-%m-%d")
-            benchmark_prices = get_benchmark_history(benchmark_ticket, start_date, end_date)
-            if benchmark_prices is not None:
-                benchmark_prices = benchmark_prices.reindex(wallet_history.index).ffill()
-                
-                # Calculate hypothetical benchmark investment based on actual purchase dates/amounts
-                benchmark_value = pd.Series(0.0, index=wallet_history.index)
-                total_shares = 0.0
-                
-                # Collect all purchases across all stocks
-                all_purchases = []
-                for stock in wallet.stocks.values():
-                    for date, purchase in stock.purchases.items():
-                        all_purchases.append({
-                            'date': pd.to_datetime(date),
-                            'amount': purchase.price * purchase.quantity
-                        })
-                
-                # Sort purchases by date
-                all_purchases.sort(key=lambda x: x['date'])
-                
-                # Simulate investing same amounts in benchmark at same times
-                for purchase in all_purchases:
-                    if purchase['date'] in benchmark_prices.index:
-                        price = benchmark_prices.loc[purchase['date']]
-                        if price > 0:
-                            shares_bought = purchase['amount'] / price
-                            total_shares += shares_bought
-                            # Update benchmark value from this point forward
-                            mask = benchmark_value.index >= purchase['date']
-                            benchmark_value[mask] += shares_bought * benchmark_prices[mask]
-                
-                # If no purchases (shouldn't happen if wallet has value), normalize by initial value
-                if not all_purchases and not benchmark_prices.empty:
-                    initial_ratio = wallet_history.iloc[0] / benchmark_prices.iloc[0]
-                    benchmark_value = benchmark_prices * initial_ratio
-                
+            benchmark_value = wallet.get_benchmark_history(benchmark_ticket)
+            if not benchmark_value.dropna().empty:
                 fig.add_trace(go.Scatter(
                     x=benchmark_value.index,
                     y=benchmark_value.values,
@@ -554,6 +521,80 @@ def register_stocks_callbacks(app, wallets):
         return fig
     
 
+    @app.callback(
+        Output("wallet-risk", "children"),
+        Input("benchmark-dropdown", "value"),
+        Input("stock-list", "children"),  # Recalculate after buys/sells
+        State("current-wallet-store", "data"),
+    )
+    def update_wallet_risk(benchmark_ticket, _, wallet_data):
+        wallet = get_current_wallet(wallet_data)
+        if not wallet or not wallet.stocks:
+            return ""
+
+        benchmark = benchmark_ticket if benchmark_ticket and benchmark_ticket != "none" else None
+        risk = wallet.get_risk_metrics(days=365, benchmark=benchmark)
+
+        items = [
+            ("Volatility (1y)", format_metric(risk["Volatility"], 100, "%")),
+            ("Sharpe", format_metric(risk["Sharpe"])),
+            ("Sortino", format_metric(risk["Sortino"])),
+            ("Max Drawdown", format_metric(risk["Max Drawdown"], 100, "%")),
+            # duracao contada em pregoes, nao em dias corridos
+            ("Drawdown Duration", format_metric(risk["Drawdown Duration"], suffix=" sessions", decimals=0)),
+            ("VaR 95% (1d)", format_metric(risk["VaR 95%"], 100, "%")),
+            ("CVaR 95% (1d)", format_metric(risk["CVaR 95%"], 100, "%")),
+        ]
+        if benchmark:
+            items += [("Beta", format_metric(risk["Beta"])), ("Alpha", format_metric(risk["Alpha"], 100, "%"))]
+
+        return dbc.Card([
+            dbc.CardHeader("Risk Metrics (current holdings)"),
+            dbc.CardBody(metric_row(items)),
+        ])
+
+    @app.callback(
+        Output("wallet-correlation", "figure"),
+        Output("wallet-diversification", "children"),
+        Input("stock-list", "children"),  # Recalculate after buys/sells
+        State("current-wallet-store", "data"),
+    )
+    def update_wallet_correlation(_, wallet_data):
+        wallet = get_current_wallet(wallet_data)
+        fig = go.Figure()
+        fig.update_layout(
+            title="Correlation of Daily Returns (1y)",
+            plot_bgcolor="#1e1e1e",
+            paper_bgcolor="#1e1e1e",
+            font={"color": "white"},
+        )
+        if not wallet or not wallet.stocks:
+            return fig, ""
+
+        # Both come from the shared covariance engine, updated only with the new trading days
+        correlation = wallet.get_correlation()
+        diversification = wallet.get_diversification()
+
+        fig.add_trace(go.Heatmap(
+            z=correlation.to_numpy(),
+            x=list(correlation.columns),
+            y=list(correlation.index),
+            zmin=-1,
+            zmax=1,
+            colorscale="RdBu_r",
+            text=correlation.round(2).to_numpy(),
+            texttemplate="%{text}",
+            hovertemplate="%{y} x %{x}: %{z:.2f}<extra></extra>",
+        ))
+        fig.update_yaxes(autorange="reversed")
+
+        items = [
+            ("Diversification Ratio", format_metric(diversification["Diversification Ratio"])),
+            ("Average Correlation", format_metric(diversification["Average Correlation"])),
+            ("Volatility (1y)", format_metric(diversification["Volatility"], 100, "%")),
+        ]
+        return fig, metric_row(items)
+
     @app.callback(
         Output("download-metrics", "data"),
         Input("download-metrics-btn", "n_clicks"),
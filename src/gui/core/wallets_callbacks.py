@@ -11,6 +11,7 @@ import dash_bootstrap_components as dbc
 # Import custom components
 from gui.components.wallet_card import wallet_card
 from stocktracker.wallet import Wallet
+from stocktracker.journal import WalletJournal
 
 def register_wallets_callbacks(app, wallets):
     """
@@ -78,6 +79,8 @@ def register_wallets_callbacks(app, wallets):
         """
         if wallet_index is not None and 0 <= wallet_index < len(wallets):
             #print(f"Deleting wallet at index: {wallet_index}")  # Debug
+            if wallets[wallet_index].journal is not None:
+                wallets[wallet_index].journal.delete()  # Remove saved journal and snapshot
             del wallets[wallet_index]   # Remove wallet from list
         return update_wallets_display(wallets, _)   # Refresh display
     
@@ -109,7 +112,9 @@ def register_wallets_callbacks(app, wallets):
             
         if trigger_id == "submit-create-wallet":
             if name_value and name_value.strip():   # Validate input
-                wallets.append(Wallet(name_value.strip()))  # Add new wallet
+                wallet = Wallet(name_value.strip())
+                WalletJournal.create(wallet)  # Persist its purchases and sales
+                wallets.append(wallet)  # Add new wallet
                 return False, ""  # Close and clear on success
             return True, name_value  # Stay open if invalid
             
@@ -8,6 +8,7 @@ import dash_bootstrap_components as dbc
 
 from gui.components.sidebar import sidebar
 from gui.components.stocks_modals import add_stock_modal, sell_stock_modal
+from stocktracker.benchmarks import BENCHMARKS
 
 
 def create_layout(wallet):
@@ -118,11 +119,9 @@ def create_layout(wallet):
                                         dcc.Dropdown(
                                             id='benchmark-dropdown',
                                             options=[
-                                                {'label': 'S&P 500', 'value': '^GSPC'},
-                                                {'label': 'Dow Jones', 'value': '^DJI'},
-                                                {'label': 'NASDAQ', 'value': '^IXIC'},
-                                                {'label': 'None', 'value': 'none'},
-                                            ],
+                                                {'label': label, 'value': ticket}
+                                                for ticket, label in BENCHMARKS.items()
+                                            ] + [{'label': 'None', 'value': 'none'}],
                                             value='none',
                                             clearable=False,
                                             className="mb-3",
@@ -148,6 +147,24 @@ def create_layout(wallet):
                                 },
                                 config={"displayModeBar": False},
                             ),
+                            # Risk metrics of the current holdings (benchmark from the dropdown)
+                            html.Div(id="wallet-risk", className="p-3 bg-dark rounded mb-4"),
+                            # Correlation between the holdings and diversification score
+                            html.H5("Diversification"),
+                            html.Div(id="wallet-diversification", className="mb-2"),
+                            dcc.Graph(
+                                id="wallet-correlation",
+                                figure={
+                                    "data": [],
+                                    "layout": {
+                                        "title": "Correlation of Daily Returns",
+                                        "plot_bgcolor": "#1e1e1e",
+                                        "paper_bgcolor": "#1e1e1e",
+                                        "font": {"color": "white"},
+                                    },
+                                },
+                                config={"displayModeBar": False},
+                            ),
                         ]
                     )
                 ]
@@ -0,0 +1,291 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Metricas de risco calculadas com NumPy sobre series diarias: uma serie de
+# valores (1-D) ou varias em colunas (2-D, dias x series), sem lacos em Python
+# sobre os dias. Com varias colunas cada metrica devolve um valor por coluna,
+# entao todas as carteiras sao avaliadas numa unica chamada.
+
+TRADING_DAYS = 252  # pregoes por ano, usados para anualizar
+
+
+def to_returns(values):
+    """
+    Daily simple returns of a value series (days x series). Days where the
+    previous value is zero or missing (nothing held yet) have NaN returns.
+    """
+    values = np.asarray(values, dtype=float)
+    previous, current = values[:-1], values[1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(previous > 0, current / previous - 1, np.nan)
+
+
+def portfolio_returns(returns, weights):
+    """
+    Returns of a portfolio given the returns matrix of its holdings
+    (days x holdings) and the weight of each holding. Missing returns count
+    as zero (the holding did not trade that day).
+    """
+    weights = np.asarray(weights, dtype=float)
+    total = weights.sum()
+    if total == 0:
+        return np.full(len(returns), np.nan)
+    return np.nan_to_num(np.asarray(returns, dtype=float)) @ (weights / total)
+
+
+def annualized_volatility(returns, periods: int = TRADING_DAYS):
+    """Standard deviation of the returns scaled to a year of `periods` days."""
+    return _nanstd(returns) * np.sqrt(periods)
+
+
+def sharpe_ratio(returns, risk_free: float = 0.0, periods: int = TRADING_DAYS):
+    """Annualized Sharpe ratio; `risk_free` is the annual risk-free rate."""
+    excess = np.asarray(returns, dtype=float) - risk_free / periods
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.nanmean(excess, axis=0) / _nanstd(excess) * np.sqrt(periods)
+
+
+def sortino_ratio(returns, risk_free: float = 0.0, periods: int = TRADING_DAYS):
+    """Annualized Sortino ratio: like Sharpe, but only losses count as risk."""
+    excess = np.asarray(returns, dtype=float) - risk_free / periods
+    downside = np.sqrt(np.nanmean(np.minimum(excess, 0) ** 2, axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.nanmean(excess, axis=0) / downside * np.sqrt(periods)
+
+
+def max_drawdown(values):
+    """
+    Largest fall from a previous peak of a value series.
+
+    Returns:
+        tuple: (drawdown as a negative fraction, longest time below a peak in periods)
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    if not len(values):
+        return np.nan, 0
+    peaks = np.maximum.accumulate(values, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdowns = np.where(peaks > 0, values / peaks - 1, 0.0)
+
+    # dias desde o ultimo pico: posicao atual menos a posicao do pico mais recente
+    positions = np.arange(len(values)).reshape((-1,) + (1,) * (values.ndim - 1))
+    last_peak = np.maximum.accumulate(np.where(values >= peaks, positions, 0), axis=0)
+    return drawdowns.min(axis=0), (positions - last_peak).max(axis=0)
+
+
+def beta_alpha(returns, benchmark_returns, periods: int = TRADING_DAYS):
+    """
+    Beta and annualized alpha (Jensen, zero risk-free rate) of the returns
+    against the returns of a benchmark. Days missing in either are ignored.
+
+    Returns:
+        tuple: (beta, alpha)
+    """
+    returns = np.asarray(returns, dtype=float)
+    benchmark = np.asarray(benchmark_returns, dtype=float).reshape((-1,) + (1,) * (returns.ndim - 1))
+    valid = ~np.isnan(returns) & ~np.isnan(benchmark)
+    count = valid.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_returns = np.where(valid, returns, 0).sum(axis=0) / count
+        mean_benchmark = np.where(valid, benchmark, 0).sum(axis=0) / count
+        deviation = np.where(valid, benchmark - mean_benchmark, 0)
+        covariance = (deviation * np.where(valid, returns - mean_returns, 0)).sum(axis=0)
+        beta = covariance / (deviation ** 2).sum(axis=0)
+    return beta, (mean_returns - beta * mean_benchmark) * periods
+
+
+def value_at_risk(returns, level: float = 0.95):
+    """
+    Historical Value at Risk and Conditional VaR (expected shortfall) of one
+    period, as positive fractions of the value.
+
+    Returns:
+        tuple: (VaR, CVaR)
+    """
+    returns = np.asarray(returns, dtype=float)
+    cutoff = np.nanquantile(returns, 1 - level, axis=0)
+    tail = np.where(returns <= cutoff, returns, np.nan)
+    return -cutoff, -np.nanmean(tail, axis=0)
+
+
+def time_weighted_return(values, flows):
+    """
+    Time-weighted return of a value series with external cash flows: each
+    day's return excludes the money added that day, and the daily returns
+    are chained.
+
+    Args:
+        values: Daily values (days x series).
+        flows: Money added (positive) or withdrawn (negative) on each day,
+            already included in that day's value.
+
+    Returns:
+        Cumulative return as a fraction (one per series).
+    """
+    values = np.asarray(values, dtype=float)
+    flows = np.asarray(flows, dtype=float)
+    previous = values[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.where(previous > 0, (values[1:] - flows[1:]) / previous - 1, np.nan)
+    return np.nanprod(1 + returns, axis=0) - 1
+
+
+def xirr(amounts, days, guess: float = 0.1, tol: float = 1e-9, max_iter: int = 50):
+    """
+    Annual internal rate of return of many cash flow series solved together:
+    Newton iterations over all series at once, with a bisection fallback for
+    series where Newton does not converge. Only the iterations are a Python
+    loop, never the series or the flows.
+
+    Args:
+        amounts: Cash flows (series x flows, or 1-D for one series); negative
+            for money invested, positive for money received. Zeros pad series
+            with fewer flows.
+        days: Day ordinals of the flows, same shape as `amounts`.
+
+    Returns:
+        Annual rate per series; NaN when there is no rate (e.g. every flow has
+        the same sign).
+    """
+    single = np.ndim(amounts) == 1
+    amounts = np.atleast_2d(np.asarray(amounts, dtype=float))
+    days = np.atleast_2d(np.asarray(days, dtype=float))
+    active = amounts != 0
+    first_day = np.min(np.where(active, days, np.inf), axis=1, keepdims=True)
+    years = np.where(active, (days - first_day) / 365.0, 0.0)
+    solvable = (amounts < 0).any(axis=1) & (amounts > 0).any(axis=1)
+
+    def npv(amounts, years, rate):
+        return (amounts * np.exp(-years * np.log1p(rate)[:, None])).sum(axis=1)
+
+    rate = np.full(len(amounts), guess)
+    pending = np.flatnonzero(solvable)  # series que ainda nao convergiram
+    with np.errstate(all="ignore"):
+        for _ in range(max_iter):
+            if not len(pending):
+                break
+            flows, times, current = amounts[pending], years[pending], rate[pending]
+            discounted = flows * np.exp(-times * np.log1p(current)[:, None])
+            value = discounted.sum(axis=1)
+            slope = -(times * discounted).sum(axis=1) / (1 + current)
+            step = np.where(slope != 0, value / slope, 0.0)
+            rate[pending] = np.maximum(current - step, -0.999999)
+            pending = pending[np.abs(step) >= tol]
+        scale = np.abs(amounts).sum(axis=1)
+        converged = np.isfinite(rate) & (np.abs(npv(amounts, years, rate)) <= 1e-6 * np.maximum(scale, 1))
+
+        # bisecao entre -99.99% e 10000% ao ano para as series restantes
+        retry = solvable & ~converged
+        if retry.any():
+            low, high = np.full(retry.sum(), -0.9999), np.full(retry.sum(), 100.0)
+            flows, times = amounts[retry], years[retry]
+            low_value = npv(flows, times, low)
+            bracketed = np.sign(low_value) != np.sign(npv(flows, times, high))
+            for _ in range(100):
+                middle = (low + high) / 2
+                middle_value = npv(flows, times, middle)
+                same = np.sign(middle_value) == np.sign(low_value)
+                low, low_value = np.where(same, middle, low), np.where(same, middle_value, low_value)
+                high = np.where(same, high, middle)
+            rate[retry] = np.where(bracketed, (low + high) / 2, np.nan)
+            converged[retry] = bracketed
+
+    rate = np.where(solvable & converged, rate, np.nan)
+    return rate[0] if single else rate
+
+
+def xirr_by_group(groups, days, amounts):
+    """
+    XIRR of each group of cash flows (e.g. one group per holding) solved in a
+    single xirr() batch.
+
+    Args:
+        groups: Group key of each flow.
+        days: Day ordinal of each flow.
+        amounts: Amount of each flow (see xirr()).
+
+    Returns:
+        pd.Series of annual rates indexed by group key (in first-seen order).
+    """
+    codes, keys = pd.factorize(pd.Series(list(groups), dtype=object))
+    if not len(codes):
+        return pd.Series(dtype=float)
+    # coloca os fluxos de cada grupo numa linha da matriz, completando com zeros
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes)
+    positions = np.arange(len(codes)) - np.repeat(np.cumsum(counts) - counts, counts)
+    matrix_amounts = np.zeros((len(keys), counts.max()))
+    matrix_days = np.zeros((len(keys), counts.max()))
+    matrix_amounts[codes[order], positions] = np.asarray(amounts, dtype=float)[order]
+    matrix_days[codes[order], positions] = np.asarray(days, dtype=float)[order]
+    return pd.Series(xirr(matrix_amounts, matrix_days), index=keys)
+
+
+METRICS = [
+    "Volatility",
+    "Sharpe",
+    "Sortino",
+    "Max Drawdown",
+    "Drawdown Duration",
+    "Beta",
+    "Alpha",
+    "VaR 95%",
+    "CVaR 95%",
+]
+
+
+def risk_metrics(values, benchmark=None, risk_free: float = 0.0, periods: int = TRADING_DAYS):
+    """
+    Every risk metric of a daily value series, e.g. the one returned by
+    Wallet.get_performance_history, or of each column of a DataFrame.
+
+    Args:
+        values: pd.Series of values, or pd.DataFrame with one series per column.
+        benchmark: Values of a benchmark on the same days (beta/alpha are
+            NaN without it).
+        risk_free: Annual risk-free rate for Sharpe/Sortino.
+        periods: Periods per year.
+
+    Returns:
+        pd.Series indexed by METRICS for a Series, or a DataFrame with one
+        row per column of `values`.
+    """
+    frame = values.to_frame() if isinstance(values, pd.Series) else values
+    matrix = frame.to_numpy(dtype=float)
+    returns = to_returns(matrix)
+
+    with warnings.catch_warnings():
+        # colunas sem nenhum retorno (carteira vazia) viram NaN sem avisos
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if benchmark is not None:
+            benchmark = pd.Series(benchmark).reindex(frame.index).ffill()
+            beta, alpha = beta_alpha(returns, to_returns(benchmark.to_numpy(dtype=float)), periods)
+        else:
+            beta = alpha = np.full(matrix.shape[1], np.nan)
+        drawdown, duration = max_drawdown(matrix)
+        var, cvar = value_at_risk(returns)
+        table = pd.DataFrame(
+            {
+                "Volatility": annualized_volatility(returns, periods),
+                "Sharpe": sharpe_ratio(returns, risk_free, periods),
+                "Sortino": sortino_ratio(returns, risk_free, periods),
+                "Max Drawdown": drawdown,
+                "Drawdown Duration": duration,
+                "Beta": beta,
+                "Alpha": alpha,
+                "VaR 95%": var,
+                "CVaR 95%": cvar,
+            },
+            index=frame.columns,
+        )
+    return table.iloc[0].rename(values.name) if isinstance(values, pd.Series) else table
+
+
+def _nanstd(returns):
+    returns = np.asarray(returns, dtype=float)
+    count = (~np.isnan(returns)).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.nanmean(returns, axis=0)
+        return np.where(count > 1, np.sqrt(np.nansum((returns - mean) ** 2, axis=0) / (count - 1)), np.nan)
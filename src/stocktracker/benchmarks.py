@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pandas as pd
+
+from stocktracker.stockAPI import SharedAPIService, get_shared_api
+
+# indices oferecidos na interface (ticket -> nome)
+BENCHMARKS = {"^GSPC": "S&P 500", "^DJI": "Dow Jones", "^IXIC": "NASDAQ"}
+
+
+class BenchmarkService:
+    """
+    Mantem em memoria o fechamento diario dos indices de referencia e os
+    atualiza numa thread em segundo plano, em um download em lote a cada
+    `refresh_interval` segundos. Trocar de benchmark na interface so le a
+    memoria; um ticket novo (ou uma data mais antiga) e carregado uma vez e
+    depois passa a ser atualizado junto com os outros.
+    """
+
+    def __init__(self, api=None, tickets=BENCHMARKS, start_date: str = None, refresh_interval: float = 15 * 60):
+        self.api = api or get_shared_api()
+        self.tickets = list(tickets)
+        self.start_date = start_date or (pd.Timestamp("today").normalize() - pd.DateOffset(years=5)).strftime("%Y-%m-%d")
+        self.refresh_interval = refresh_interval
+        self.refreshed_at = None  # horario (time.time()) da ultima atualizacao
+        self.last_error = None  # erro da ultima atualizacao em segundo plano
+        self._closes = {}  # ticket -> Series de fechamentos indexada por dia
+        self._loaded_from = {}  # ticket -> data inicial do ultimo carregamento
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self, tickets=None):
+        """
+        Reloads the closes of `tickets` (defaults to every tracked ticket) with
+        one batched request. Tickets without data keep their previous series.
+        """
+        with self._lock:
+            tickets = list(tickets or self.tickets)
+            start_date = self.start_date
+        closes = self.api.get_histories(tickets, start_date)
+        closes.index = closes.index.normalize()
+
+        loaded = {}
+        for ticket in tickets:
+            if ticket in closes.columns and closes[ticket].notna().any():
+                loaded[ticket] = closes[ticket].dropna().rename(ticket)
+        with self._lock:
+            self._closes.update(loaded)
+            self._loaded_from.update(dict.fromkeys(loaded, start_date))
+            self.refreshed_at = time.time()
+
+    def closes(self, ticket: str, start_date=None):
+        """
+        Daily closes of `ticket` from `start_date` on, served from memory. A
+        ticket that is not loaded yet, or not from that far back, is loaded
+        now and tracked from then on.
+        """
+        start = pd.Timestamp(start_date).normalize() if start_date is not None else None
+        with self._lock:
+            series = self._closes.get(ticket)
+            covered = series is not None and (start is None or start >= pd.Timestamp(self._loaded_from[ticket]))
+            if not covered:
+                if ticket not in self.tickets:
+                    self.tickets.append(ticket)
+                if start is not None and start < pd.Timestamp(self.start_date):
+                    self.start_date = start.strftime("%Y-%m-%d")
+
+        if not covered:
+            self.refresh([ticket])
+            with self._lock:
+                series = self._closes.get(ticket, pd.Series(dtype=float, name=ticket))
+        return series[series.index >= start] if start is not None else series.copy()
+
+    def aligned(self, ticket: str, index: pd.DatetimeIndex, base: float = None):
+        """
+        Closes of `ticket` on the days of `index`, carried over days without
+        trading. With `base` the series is rescaled to start at `base`.
+        """
+        if not len(index):
+            return pd.Series(dtype=float, name=ticket)
+        closes = self.closes(ticket, index[0] - pd.Timedelta(days=7))
+        series = closes.reindex(closes.index.union(index)).ffill().reindex(index)
+        if base is not None:
+            first = series.dropna()
+            series = series / first.iloc[0] * base if not first.empty else series
+        return series
+
+    def start(self):
+        """Starts refreshing the tracked tickers in a background thread (first refresh right away)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="benchmark-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                # mantem as series antigas; tenta de novo no proximo ciclo
+                self.last_error = e
+                print(f"Benchmark refresh failed: {e}")
+            if self._stop.wait(self.refresh_interval):
+                return
+
+
+_service = SharedAPIService(BenchmarkService, BenchmarkService.stop)
+
+
+def get_benchmark_service():
+    """Returns the process-wide BenchmarkService, bound to the shared StockAPI."""
+    return _service.get()
@@ -0,0 +1,269 @@
+import numpy as np
+import pandas as pd
+
+from stocktracker.lotledger import _date, _ordinal
+
+
+class CostBasisMethod:
+    """
+    Regra que escolhe quais lotes de um LotLedger saem numa venda. Cada
+    metodo tem um nome e um match() que consome os lotes no proprio livro e
+    devolve (acoes removidas, custo delas). Novos metodos entram com
+    register_method().
+    """
+
+    name = None
+
+    def match(self, ledger, quantity: int, lots=None):
+        """
+        Removes `quantity` shares from `ledger`.
+
+        Args:
+            ledger: LotLedger of the stock being sold.
+            quantity: Number of shares sold.
+            lots: Views of the lots to sell, for methods that need them.
+
+        Returns:
+            tuple: (shares removed, cost of the removed shares)
+        """
+        raise NotImplementedError
+
+
+class FIFO(CostBasisMethod):
+    """Sells the oldest lots first."""
+
+    name = "fifo"
+
+    def match(self, ledger, quantity: int, lots=None):
+        return ledger.consume(quantity)
+
+
+class LIFO(CostBasisMethod):
+    """Sells the newest lots first."""
+
+    name = "lifo"
+
+    def match(self, ledger, quantity: int, lots=None):
+        return ledger.consume_last(quantity)
+
+
+class AverageCost(CostBasisMethod):
+    """
+    Every share costs the average price of the position. The shares leave
+    the oldest lots (so the holding period stays FIFO); the lots keep their
+    prices and the ledger tracks the pooled basis (see consume_pooled).
+    """
+
+    name = "average"
+
+    def match(self, ledger, quantity: int, lots=None):
+        return ledger.consume_pooled(quantity)
+
+
+class SpecificLot(CostBasisMethod):
+    """Sells from the lots chosen by the user, in the order given."""
+
+    name = "specific"
+
+    def match(self, ledger, quantity: int, lots=None):
+        if not lots:
+            raise ValueError("Specific-lot sales need the lots to sell.")
+        return ledger.consume_lots(lots, quantity)
+
+
+METHODS = {}
+
+
+def register_method(method: CostBasisMethod):
+    """Makes `method` available by its name (e.g. in Wallet(cost_basis=...))."""
+    METHODS[method.name] = method
+    return method
+
+
+def get_method(name: str):
+    try:
+        return METHODS[name]
+    except KeyError:
+        raise ValueError(f"Unknown cost basis method: {name}. Available: {', '.join(METHODS)}.")
+
+
+for _method in (FIFO(), LIFO(), AverageCost(), SpecificLot()):
+    register_method(_method)
+
+
+class RealizedLedger:
+    """
+    Registro das vendas de uma carteira com o lucro realizado de cada uma,
+    em colunas NumPy (ticket como codigo int32, dia, quantidade, valor
+    recebido, custo, valor pago e dia medio em que as acoes vendidas foram
+    compradas). Custo e valor pago so diferem no custo medio. O dia e o
+    valor pago de cada lote vendido ficam em colunas a parte, para os
+    fluxos de caixa da TIR.
+    Os totais sao somados a cada venda, entao ler o lucro realizado nao
+    percorre o historico.
+    """
+
+    def __init__(self, capacity: int = 16):
+        self._tickets = []  # codigo -> ticket
+        self._codes = {}  # ticket -> codigo
+        self._ticket_codes = np.empty(capacity, dtype=np.int32)
+        self._days = np.empty(capacity, dtype=np.int32)
+        self._quantities = np.empty(capacity, dtype=np.int64)
+        self._proceeds = np.empty(capacity, dtype=np.float64)
+        self._costs = np.empty(capacity, dtype=np.float64)
+        self._paid = np.empty(capacity, dtype=np.float64)
+        self._acquired = np.empty(capacity, dtype=np.int32)
+        self._size = 0
+        # lotes vendidos: a venda `i` usa as linhas _flow_starts[i]:_flow_starts[i + 1]
+        self._flow_starts = np.zeros(capacity + 1, dtype=np.int64)
+        self._flow_days = np.empty(capacity, dtype=np.int32)
+        self._flow_amounts = np.empty(capacity, dtype=np.float64)
+        self.total_proceeds = 0.0
+        self.total_cost = 0.0
+
+    @property
+    def gain(self):
+        """Realized profit (or loss) of every sale."""
+        return self.total_proceeds - self.total_cost
+
+    def record(
+        self,
+        ticket: str,
+        date: str,
+        quantity: int,
+        price: float,
+        cost: float,
+        acquired: str = None,
+        paid: float = None,
+        lots: tuple = None,
+    ):
+        """
+        Records the sale of `quantity` shares of `ticket` at `price` that cost
+        `cost` in total and were bought, on average, on `acquired` (defaults
+        to the sale date) for `paid` (defaults to `cost`).
+
+        `lots` is a (days, amounts) pair with the purchase day (ordinal or
+        "YYYY-MM-DD") and the amount paid of each lot sold; without it the
+        whole `paid` is placed on `acquired`.
+        """
+        if self._size == len(self._days):
+            self._grow()
+        if ticket not in self._codes:
+            self._codes[ticket] = len(self._tickets)
+            self._tickets.append(ticket)
+
+        proceeds = quantity * price
+        index = self._size
+        self._ticket_codes[index] = self._codes[ticket]
+        self._days[index] = _ordinal(date)
+        self._quantities[index] = quantity
+        self._proceeds[index] = proceeds
+        self._costs[index] = cost
+        self._paid[index] = cost if paid is None else paid
+        self._acquired[index] = _ordinal(acquired) if acquired else self._days[index]
+        if lots is None:
+            lots = ([self._acquired[index]], [self._paid[index]])
+        days, amounts = lots
+        if len(days) and isinstance(days[0], str):
+            days = [_ordinal(day) for day in days]
+        start, end = self._flow_starts[index], self._flow_starts[index] + len(days)
+        if end > len(self._flow_days):
+            self._grow_flows(end)
+        self._flow_days[start:end] = days
+        self._flow_amounts[start:end] = amounts
+        self._flow_starts[index + 1] = end
+        self._size += 1
+        self.total_proceeds += proceeds
+        self.total_cost += cost
+
+    def gains(self):
+        """Realized profit per ticket (pd.Series)."""
+        codes = self._ticket_codes[:self._size]
+        gains = np.bincount(codes, weights=self._proceeds[:self._size] - self._costs[:self._size], minlength=len(self._tickets))
+        return pd.Series(gains, index=self._tickets, dtype=float)
+
+    def cash_flows(self):
+        """
+        Cash flows of the sales: the amount paid for each lot sold on its
+        purchase day (negative) and the proceeds received on the sale day.
+
+        Returns:
+            tuple: (tickets, day ordinals, amounts), one row per lot sold plus one per sale
+        """
+        size, flows = self._size, self._flow_starts[self._size]
+        codes = self._ticket_codes[:size]
+        lot_codes = np.repeat(codes, np.diff(self._flow_starts[:size + 1]))
+        tickets = [self._tickets[code] for code in np.concatenate([lot_codes, codes])]
+        days = np.concatenate([self._flow_days[:flows], self._days[:size]]).astype(np.int64)
+        amounts = np.concatenate([-self._flow_amounts[:flows], self._proceeds[:size]])
+        return tickets, days, amounts
+
+    def to_frame(self):
+        proceeds, costs = self._proceeds[:self._size], self._costs[:self._size]
+        return pd.DataFrame(
+            {
+                "Ticket": [self._tickets[code] for code in self._ticket_codes[:self._size]],
+                "Date": [_date(int(day)) for day in self._days[:self._size]],
+                "Quantity": self._quantities[:self._size],
+                "Proceeds": proceeds,
+                "Cost": costs,
+                "Gain": proceeds - costs,
+            }
+        )
+
+    def entries(self):
+        """Sales as plain dicts (to be saved as JSON); see record()."""
+        return [
+            {
+                "ticket": self._tickets[int(code)],
+                "date": _date(int(day)),
+                "quantity": int(quantity),
+                "price": float(proceeds) / int(quantity),
+                "cost": float(cost),
+                "acquired": _date(int(acquired)),
+                "paid": float(paid),
+                "lots": [
+                    [_date(int(lot_day)), float(amount)]
+                    for lot_day, amount in zip(self._flow_days[start:end], self._flow_amounts[start:end])
+                ],
+            }
+            for code, day, quantity, proceeds, cost, acquired, paid, start, end in zip(
+                self._ticket_codes[:self._size],
+                self._days[:self._size],
+                self._quantities[:self._size],
+                self._proceeds[:self._size],
+                self._costs[:self._size],
+                self._acquired[:self._size],
+                self._paid[:self._size],
+                self._flow_starts[:self._size],
+                self._flow_starts[1:self._size + 1],
+            )
+        ]
+
+    def clear(self):
+        self._tickets, self._codes = [], {}
+        self._size = 0
+        self.total_proceeds = self.total_cost = 0.0
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self):
+        capacity = 2 * len(self._days)
+        for name in ("_ticket_codes", "_days", "_quantities", "_proceeds", "_costs", "_paid", "_acquired"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+        starts = np.zeros(capacity + 1, dtype=np.int64)
+        starts[:self._size + 1] = self._flow_starts[:self._size + 1]
+        self._flow_starts = starts
+
+    def _grow_flows(self, needed: int):
+        capacity = max(2 * len(self._flow_days), needed)
+        used = self._flow_starts[self._size]
+        for name in ("_flow_days", "_flow_amounts"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:used] = column[:used]
+            setattr(self, name, grown)
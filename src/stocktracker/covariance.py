@@ -0,0 +1,221 @@
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from stocktracker.analytics import TRADING_DAYS
+from stocktracker.stockAPI import LOOKBACK_DAYS, SharedAPIService, get_shared_api
+
+
+class CovarianceEngine:
+    """
+    Covariancia e correlacao dos retornos diarios de varios tickets mantidas
+    de forma incremental: para cada par guarda as somas dos retornos, dos
+    quadrados, dos produtos cruzados e o numero de dias em que os dois
+    negociaram. Cada novo pregao atualiza essas somas em O(tickets²); as
+    consultas leem as somas, sem voltar ao historico. Com `window` so os
+    ultimos `window` pregoes contam (o mais antigo e subtraido). O ultimo
+    pregao somado e refeito quando chega de novo com outros fechamentos.
+    """
+
+    def __init__(self, api=None, window: int = TRADING_DAYS, start_date: str = None):
+        self.api = api
+        self.window = window
+        self.start_date = start_date
+        self.tickets = []
+        self.last_date = None  # ultimo pregao ja somado
+        self._lock = threading.RLock()
+        self._reset([])
+
+    def _reset(self, tickets):
+        size = len(tickets)
+        self.tickets = list(tickets)
+        self._index = {ticket: i for i, ticket in enumerate(self.tickets)}
+        self._counts = np.zeros((size, size))  # [i, j]: dias com retorno de i e de j
+        self._sums = np.zeros((size, size))  # [i, j]: soma dos retornos de i nesses dias
+        self._squares = np.zeros((size, size))  # [i, j]: soma dos quadrados de i nesses dias
+        self._products = np.zeros((size, size))  # [i, j]: soma de (retorno de i x retorno de j)
+        self._last_closes = np.full(size, np.nan)
+        self._rows = deque()  # retornos dentro da janela, para subtrair quando saem
+        # ultimo pregao somado, para refaze-lo se o fechamento dele for revisto
+        self._last_row = None  # fechamentos do dia
+        self._last_returns = None  # retornos somados (None se nenhum ticket tinha retorno)
+        self._previous_closes = self._last_closes.copy()  # _last_closes antes do dia
+        self.last_date = None
+
+    def update(self, date, closes):
+        """
+        Adds one trading day.
+
+        Args:
+            date: Day of the closes; days before the last one added are
+                ignored and the last one is replaced (its closes may have
+                been revised, e.g. by a refresh during the day).
+            closes: Close of each ticket that day (mapping or pd.Series);
+                missing tickets or NaN did not trade.
+        """
+        date = pd.Timestamp(date).normalize()
+        with self._lock:
+            if self.last_date is not None and date < self.last_date:
+                return
+            closes = pd.Series(closes, dtype=float).reindex(self.tickets).to_numpy()
+            if date == self.last_date:
+                if np.array_equal(closes, self._last_row, equal_nan=True):
+                    return
+                self._undo_last()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                returns = closes / self._last_closes - 1
+            self._previous_closes = self._last_closes.copy()
+            traded = ~np.isnan(closes)
+            self._last_closes[traded] = closes[traded]
+            self.last_date = date
+            self._last_row, self._last_returns = closes, None
+
+            if np.isnan(returns).all():
+                return
+            self._add(returns, 1.0)
+            self._last_returns = returns
+            if self.window:
+                self._rows.append(returns)
+                if len(self._rows) > self.window:
+                    self._add(self._rows.popleft(), -1.0)
+
+    def _undo_last(self):
+        # subtrai o ultimo pregao somado e volta os fechamentos de antes dele
+        if self._last_returns is not None:
+            self._add(self._last_returns, -1.0)
+            if self.window:
+                self._rows.pop()
+        self._last_closes = self._previous_closes
+
+    def _add(self, returns, sign):
+        valid = (~np.isnan(returns)).astype(float)
+        values = np.nan_to_num(returns)
+        self._counts += sign * np.outer(valid, valid)
+        self._sums += sign * np.outer(values, valid)
+        self._squares += sign * np.outer(values ** 2, valid)
+        self._products += sign * np.outer(values, values)
+
+    def update_frame(self, closes: pd.DataFrame):
+        """
+        Adds the days of a closes DataFrame (dates x tickets) from the last
+        day already added on (that one is redone if its closes changed).
+        Columns of tickets not tracked yet restart the statistics from the
+        whole frame.
+        """
+        with self._lock:
+            new = [ticket for ticket in closes.columns if ticket not in self._index]
+            if new:
+                self._reset(self.tickets + new)
+            else:
+                closes = closes[closes.index >= self.last_date] if self.last_date is not None else closes
+            for date, row in zip(closes.index, closes.to_numpy(dtype=float)):
+                self.update(date, dict(zip(closes.columns, row)))
+
+    def sync(self, tickets=None):
+        """
+        Brings the statistics up to the last trading day in the shared price
+        store, adding `tickets` that are not tracked yet. Only the days from
+        the last one added on are read, except when new tickets force a restart.
+        """
+        api = self.api or get_shared_api()
+        with self._lock:
+            tickets = list(dict.fromkeys(self.tickets + list(tickets or [])))
+            if not tickets:
+                return
+            restart = self.last_date is None or any(ticket not in self._index for ticket in tickets)
+            if restart:
+                start_date = self.start_date or self._default_start()
+            else:
+                start_date = (self.last_date - pd.Timedelta(days=LOOKBACK_DAYS)).strftime("%Y-%m-%d")
+            closes = api.get_histories(tickets, start_date)
+            closes.index = closes.index.normalize()
+            if restart:
+                self._reset(tickets)
+            self.update_frame(closes[tickets])
+
+    def _default_start(self):
+        # pregoes da janela em dias corridos, com folga para feriados
+        days = (self.window or TRADING_DAYS) * 7 // 5 + LOOKBACK_DAYS
+        return (pd.Timestamp("today").normalize() - pd.Timedelta(days=days)).strftime("%Y-%m-%d")
+
+    def covariance(self, tickets=None, periods: int = 1):
+        """
+        Covariance matrix of the daily returns of `tickets` (defaults to every
+        tracked ticket), each pair measured over the days both traded, scaled
+        by `periods` (e.g. TRADING_DAYS for annual). NaN for pairs with fewer
+        than two common days.
+        """
+        counts, sums, _, products = self._block(tickets)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariance = np.where(counts > 1, (products - sums * sums.T / counts) / (counts - 1), np.nan)
+        return self._frame(covariance * periods, tickets)
+
+    def correlation(self, tickets=None):
+        """Correlation matrix of the daily returns of `tickets` (see covariance())."""
+        counts, sums, squares, products = self._block(tickets)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariance = products - sums * sums.T / counts
+            # variancia de cada lado medida so nos dias em comum do par
+            variances = squares - sums ** 2 / counts
+            correlation = covariance / np.sqrt(variances * variances.T)
+        correlation = np.where(counts > 1, np.clip(correlation, -1.0, 1.0), np.nan)
+        return self._frame(correlation, tickets)
+
+    def portfolio_variance(self, weights, periods: int = 1):
+        """
+        Variance of the returns of a portfolio with `weights` (pd.Series or
+        mapping ticket -> weight; normalized to sum 1). Pairs without enough
+        common days count as uncorrelated.
+        """
+        weights = self._weights(weights)
+        covariance = np.nan_to_num(self.covariance(list(weights.index), periods).to_numpy())
+        return float(max(weights.to_numpy() @ covariance @ weights.to_numpy(), 0.0))
+
+    def diversification_ratio(self, weights):
+        """
+        Weighted average volatility of the holdings over the volatility of the
+        portfolio: 1 when everything moves together, higher the more the
+        holdings offset each other.
+        """
+        weights = self._weights(weights)
+        volatilities = np.sqrt(np.nan_to_num(np.diag(self.covariance(list(weights.index)).to_numpy())))
+        variance = self.portfolio_variance(weights)
+        return float(weights.to_numpy() @ volatilities / np.sqrt(variance)) if variance > 0 else np.nan
+
+    def _weights(self, weights):
+        weights = pd.Series(weights, dtype=float)
+        total = weights.sum()
+        if total == 0:
+            raise ValueError("Weights must not sum to zero.")
+        return weights / total
+
+    def _block(self, tickets):
+        with self._lock:
+            if tickets is None:
+                rows = np.arange(len(self.tickets))
+            else:
+                missing = [ticket for ticket in tickets if ticket not in self._index]
+                if missing:
+                    raise ValueError(f"Tickets not tracked: {', '.join(missing)}.")
+                rows = np.array([self._index[ticket] for ticket in tickets], dtype=int)
+            grid = np.ix_(rows, rows)
+            return (
+                self._counts[grid].copy(),
+                self._sums[grid].copy(),
+                self._squares[grid].copy(),
+                self._products[grid].copy(),
+            )
+
+    def _frame(self, matrix, tickets):
+        labels = list(self.tickets if tickets is None else tickets)
+        return pd.DataFrame(matrix, index=labels, columns=labels)
+
+
+_engine = SharedAPIService(CovarianceEngine)
+
+
+def get_covariance_engine():
+    """Returns the process-wide CovarianceEngine, bound to the shared StockAPI."""
+    return _engine.get()
@@ -0,0 +1,182 @@
+import json
+import os
+import time
+import uuid
+
+from stocktracker.wallet import Wallet
+
+
+def get_journal_dir():
+    """
+    Returns the directory where wallet journals and snapshots are kept.
+
+    Uses the STOCKTRACKER_JOURNAL_DIR environment variable when set,
+    otherwise src/stocktracker/data/journal.
+    """
+    journal_dir = os.environ.get("STOCKTRACKER_JOURNAL_DIR")
+    if not journal_dir:
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        journal_dir = os.path.join(current_dir, "data", "journal")
+    os.makedirs(journal_dir, exist_ok=True)
+    return journal_dir
+
+
+class WalletJournal:
+    """
+    Diario append-only das compras e vendas de uma carteira (um evento JSON
+    por linha, mais o preco que compras gravadas sem preco receberam ao
+    serem resolvidas) e um snapshot do estado a cada `snapshot_every` eventos.
+    Ao gravar um snapshot o diario recomeca vazio, entao carregar a carteira
+    le o snapshot e repete so os eventos gravados depois dele.
+    """
+
+    def __init__(self, wallet_id: str, directory: str = None, snapshot_every: int = 100):
+        self.wallet_id = wallet_id
+        self.directory = directory or get_journal_dir()
+        self.snapshot_every = snapshot_every
+        self.journal_path = os.path.join(self.directory, f"{wallet_id}.journal.jsonl")
+        self.snapshot_path = os.path.join(self.directory, f"{wallet_id}.snapshot.json")
+        self.seq = 0  # numero do ultimo evento gravado
+        self.snapshot_seq = 0  # ultimo evento incluido no snapshot
+        self._file = None
+
+    @classmethod
+    def create(cls, wallet: Wallet, directory: str = None, snapshot_every: int = 100):
+        """Starts a journal for `wallet` (with a snapshot of its current state) and attaches it."""
+        # ids comecam pelo horario de criacao, para load_wallets manter a ordem
+        wallet_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        journal = cls(wallet_id, directory, snapshot_every)
+        journal.snapshot(wallet)
+        wallet.journal = journal
+        return journal
+
+    def record(self, wallet: Wallet, event: dict):
+        """Appends `event` to the journal (flushed to disk) and snapshots when due."""
+        self.seq += 1
+        event = {"seq": self.seq, **event}
+        if self._file is None:
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+        self._file.write(json.dumps(event) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        if self.seq - self.snapshot_seq >= self.snapshot_every:
+            self.snapshot(wallet)
+
+    def snapshot(self, wallet: Wallet):
+        """Writes the current lots of `wallet` and starts an empty journal."""
+        state = {
+            "seq": self.seq,
+            "name": wallet.name,
+            "cost_basis": wallet.cost_basis,
+            "lots": [
+                {"ticket": ticket, "date": purchase.date, "price": purchase.price, "quantity": purchase.quantity}
+                for ticket, stock in wallet.stocks.items()
+                for purchase in stock.purchases.values()
+            ],
+            "realized": wallet.realized.entries(),
+            # diferenca do custo medio para o valor pago pelos lotes (ver LotLedger.consume_pooled)
+            "pool_adjustments": {
+                ticket: stock.purchases.pool_adjustment
+                for ticket, stock in wallet.stocks.items()
+                if stock.purchases.pool_adjustment
+            },
+        }
+        _write_atomic(self.snapshot_path, state)
+
+        # os eventos ate `seq` estao no snapshot; se o programa parar antes do
+        # diario ser zerado, load() ignora esses eventos pelo numero
+        self.close()
+        open(self.journal_path, "w", encoding="utf-8").close()
+        self.snapshot_seq = self.seq
+
+    def load(self) -> Wallet:
+        """Rebuilds the wallet from the snapshot plus the journal tail and attaches the journal."""
+        with open(self.snapshot_path, encoding="utf-8") as f:
+            state = json.load(f)
+
+        # a carteira so recebe o diario no fim, para a repeticao nao ser gravada de novo
+        wallet = Wallet(state["name"], state.get("cost_basis", "fifo"))
+        for lot in state["lots"]:
+            wallet.add_stock(lot["ticket"], lot["quantity"], lot["price"], lot["date"])
+        for ticket, adjustment in state.get("pool_adjustments", {}).items():
+            wallet._restore_pool_adjustment(ticket, adjustment)
+        for sale in state.get("realized", []):
+            # snapshots antigos nao tem os lotes de cada venda
+            lots = tuple(zip(*sale["lots"])) if sale.get("lots") else None
+            wallet.realized.record(
+                sale["ticket"], sale["date"], sale["quantity"], sale["price"], sale["cost"], sale.get("acquired"),
+                sale.get("paid"), lots,
+            )
+        self.seq = self.snapshot_seq = state["seq"]
+
+        for event in self._read_events():
+            if event["seq"] <= self.seq:
+                continue
+            _apply_event(wallet, event)
+            self.seq = event["seq"]
+
+        wallet.journal = self
+        return wallet
+
+    def delete(self):
+        """Removes the journal and snapshot files (the wallet was deleted)."""
+        self.close()
+        for path in (self.journal_path, self.snapshot_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read_events(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # ultima linha cortada por uma parada no meio da escrita
+                    return
+
+
+def load_wallets(directory: str = None, snapshot_every: int = 100):
+    """Loads every journaled wallet of `directory`, in creation order."""
+    directory = directory or get_journal_dir()
+    suffix = ".snapshot.json"
+    wallet_ids = sorted(name[: -len(suffix)] for name in os.listdir(directory) if name.endswith(suffix))
+    return [WalletJournal(wallet_id, directory, snapshot_every).load() for wallet_id in wallet_ids]
+
+
+def _apply_event(wallet: Wallet, event: dict):
+    if event["type"] == "BUY":
+        wallet.add_stock(event["ticket"], event["quantity"], event["price"], event["date"])
+    elif event["type"] == "SELL":
+        # vendas antigas nao tem metodo, preco nem data: usam os padroes da carteira
+        ticket, lots = event["ticket"], event.get("lots")
+        if lots:
+            lots = [wallet.stocks[ticket].purchases.lot(date, position) for date, position in lots]
+        wallet.remove_stock(
+            ticket, event["quantity"], event.get("method"), lots, event.get("price"), event.get("date")
+        )
+    elif event["type"] == "PRICE":
+        # preco que uma compra sem preco recebeu no resolve()
+        date, position = event["lot"]
+        wallet._restore_fill(event["ticket"], wallet.stocks[event["ticket"]].purchases.lot(date, position), event["price"])
+    elif event["type"] == "CLEAR":
+        wallet.clear()
+    else:
+        raise ValueError(f"Unknown journal event: {event['type']}")
+
+
+def _write_atomic(path: str, data: dict):
+    # grava num arquivo temporario e troca, para nunca deixar um snapshot pela metade
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,467 @@
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+
+
+class LotLedger:
+    """
+    Livro de lotes de compra de um ativo, ordenado por data (varios lotes
+    podem ter a mesma data). Os lotes ficam em colunas NumPy (dia como
+    ordinal int32, preco float64, quantidade int64 e um id int32), cerca de
+    24 bytes por lote. A insercao usa busca binaria e as vendas consomem os
+    lotes mais antigos primeiro (FIFO) avancando um cursor.
+
+    Os lotes sao lidos como PurchaseView, com os mesmos atributos de
+    Purchase (date, price, quantity). Tambem se comporta como o antigo
+    dicionario {data: Purchase}: `data in ledger`, `ledger[data]` (primeiro
+    lote aberto da data), `items()` etc.
+    """
+
+    def __init__(self, purchases=(), capacity: int = 16):
+        self._days = np.empty(capacity, dtype=np.int32)
+        self._prices = np.empty(capacity, dtype=np.float64)  # NaN = preco ainda desconhecido
+        self._quantities = np.empty(capacity, dtype=np.int64)
+        self._ids = np.empty(capacity, dtype=np.int32)  # crescem com a chegada: ordenados dentro de cada dia
+        self._head = 0  # primeiro lote aberto; os anteriores ja foram vendidos
+        self._size = 0
+        self._next_id = 0
+        self.last_acquired_day = None  # dia medio de compra (pelo custo) das acoes da ultima venda
+        self.last_paid = 0.0  # valor pago pelas acoes da ultima venda (precos dos lotes)
+        self.last_sold = (np.empty(0, dtype=np.int64), np.empty(0))  # dia e valor pago de cada lote da ultima venda
+        self.pool_adjustment = 0.0  # custo medio (consume_pooled) menos o valor pago pelos lotes abertos
+        for purchase in purchases:
+            self.add(purchase)
+
+    def add(self, purchase):
+        """Inserts a copy of `purchase` (anything with date/price/quantity) and returns its view."""
+        return self.insert(purchase.date, purchase.price, purchase.quantity)
+
+    def insert(self, date: str, price: float, quantity: int):
+        """Inserts a lot after the lots of the same or earlier dates and returns its view."""
+        day = _ordinal(date)
+        if self._size == len(self._days):
+            self._grow()
+
+        # compras em ordem cronologica vao para o fim, sem deslocar nada
+        if self._size == self._head or self._days[self._size - 1] <= day:
+            index = self._size
+        else:
+            index = self._head + int(np.searchsorted(self._days[self._head:self._size], day, side="right"))
+            for column in self._columns():
+                column[index + 1:self._size + 1] = column[index:self._size]
+
+        lot_id = self._next_id
+        self._next_id += 1
+        self._days[index] = day
+        self._prices[index] = np.nan if price is None else price
+        self._quantities[index] = quantity
+        self._ids[index] = lot_id
+        self._size += 1
+        return PurchaseView(self, day, lot_id)
+
+    def extend(self, days, prices, quantities):
+        """
+        Inserts many lots at once, given as arrays of day ordinals, prices
+        (NaN when unknown) and quantities. Lots of the same day keep their
+        order, after the lots already in the ledger. Returns their views.
+        """
+        days = np.asarray(days, dtype=np.int32)
+        ids = np.arange(self._next_id, self._next_id + len(days), dtype=np.int32)
+        self._next_id += len(days)
+        new_columns = (days, np.asarray(prices, dtype=np.float64), np.asarray(quantities, dtype=np.int64), ids)
+
+        # junta os lotes abertos com os novos e reordena por dia (sort estavel mantem a ordem de chegada)
+        merged = [np.concatenate([column[self._head:self._size], new]) for column, new in zip(self._columns(), new_columns)]
+        order = np.argsort(merged[0], kind="stable")
+        self._days, self._prices, self._quantities, self._ids = (column[order] for column in merged)
+        self._head, self._size = 0, len(order)
+        return [PurchaseView(self, int(day), int(lot_id)) for day, lot_id in zip(days, ids)]
+
+    def consume(self, quantity: int):
+        """
+        Sells `quantity` shares from the oldest lots first (FIFO).
+
+        Returns:
+            tuple: (shares removed, cost of the removed shares)
+        """
+        removed = 0
+        spent_removed = 0.0
+        sold = []  # (dias, valores pagos) dos lotes vendidos
+        window = 64
+        while removed < quantity and self._head < self._size:
+            # soma acumulada de uma janela de lotes, que dobra se nao bastar
+            end = min(self._head + window, self._size)
+            quantities = self._quantities[self._head:end]
+            cumulative = np.cumsum(quantities)
+            missing = quantity - removed
+            closed = int(np.searchsorted(cumulative, missing, side="right"))  # lotes vendidos por inteiro
+
+            if closed:
+                costs = quantities[:closed] * self._prices[self._head:self._head + closed]
+                removed += int(cumulative[closed - 1])
+                spent_removed += float(costs.sum())
+                sold.append((self._days[self._head:self._head + closed].copy(), costs))
+                self._head += closed
+                missing = quantity - removed
+            if closed < len(quantities) and missing > 0:
+                # remove so parte do proximo lote
+                self._quantities[self._head] -= missing
+                removed += missing
+                spent_removed += missing * float(self._prices[self._head])
+                sold.append(([self._days[self._head]], [missing * float(self._prices[self._head])]))
+            window *= 2
+        self._compact()
+        self._set_sold(sold)
+        return removed, spent_removed
+
+    def consume_last(self, quantity: int):
+        """
+        Sells `quantity` shares from the newest lots first (LIFO).
+
+        Returns:
+            tuple: (shares removed, cost of the removed shares)
+        """
+        removed = 0
+        spent_removed = 0.0
+        sold = []
+        window = 64
+        while removed < quantity and self._head < self._size:
+            # mesma janela do consume(), lida do fim para o comeco
+            start = max(self._size - window, self._head)
+            quantities = self._quantities[start:self._size][::-1]
+            prices = self._prices[start:self._size][::-1]
+            days = self._days[start:self._size][::-1]
+            cumulative = np.cumsum(quantities)
+            missing = quantity - removed
+            closed = int(np.searchsorted(cumulative, missing, side="right"))
+
+            if closed:
+                costs = quantities[:closed] * prices[:closed]
+                removed += int(cumulative[closed - 1])
+                spent_removed += float(costs.sum())
+                sold.append((days[:closed].copy(), costs))
+                self._size -= closed
+                missing = quantity - removed
+            if closed < len(quantities) and missing > 0:
+                self._quantities[self._size - 1] -= missing
+                removed += missing
+                spent_removed += missing * float(self._prices[self._size - 1])
+                sold.append(([self._days[self._size - 1]], [missing * float(self._prices[self._size - 1])]))
+            window *= 2
+        self._set_sold(sold)
+        return removed, spent_removed
+
+    def consume_lots(self, purchases, quantity: int):
+        """
+        Sells `quantity` shares from the given lots (views), in the given
+        order. Each lot is found by binary search; lots left empty are
+        removed together at the end.
+
+        Returns:
+            tuple: (shares removed, cost of the removed shares)
+        """
+        indexes = [self._find(purchase) for purchase in dict.fromkeys(purchases)]
+        if None in indexes:
+            raise ValueError("Selected lot is no longer in the ledger")
+        available = sum(int(self._quantities[index]) for index in indexes)
+        if quantity > available:
+            raise ValueError(f"Selected lots hold only {available} shares")
+
+        removed = 0
+        spent_removed = 0.0
+        sold = []
+        emptied = []
+        for index in indexes:
+            if removed == quantity:
+                break
+            taken = min(int(self._quantities[index]), quantity - removed)
+            self._quantities[index] -= taken
+            removed += taken
+            spent_removed += taken * float(self._prices[index])
+            sold.append(([self._days[index]], [taken * float(self._prices[index])]))
+            if not self._quantities[index]:
+                emptied.append(index)
+        if emptied:
+            self.remove_rows(emptied)
+        self._set_sold(sold)
+        return removed, spent_removed
+
+    @contextmanager
+    def until(self, date: str):
+        """
+        Within the block only the lots bought up to `date` are open, e.g. to
+        sell as of that date with any method; the later lots come back after.
+        """
+        cut = self._head + int(np.searchsorted(self._days[self._head:self._size], _ordinal(date), side="right"))
+        hidden = [column[cut:self._size].copy() for column in self._columns()]
+        self._size = cut
+        try:
+            yield self
+        finally:
+            # os lotes escondidos sao os de datas maiores: voltam para o fim, ja em ordem
+            count = len(hidden[0])
+            while self._size + count > len(self._days):
+                self._grow()
+            for column, tail in zip(self._columns(), hidden):
+                column[self._size:self._size + count] = tail
+            self._size += count
+
+    def consume_pooled(self, quantity: int):
+        """
+        Sells `quantity` shares at the average cost of the position
+        (average-cost pooling), taking them from the oldest lots. The lots
+        keep the prices paid (costs() and the cash flows stay as they were);
+        the difference to the pooled cost goes to pool_adjustment.
+
+        Returns:
+            tuple: (shares removed, pooled cost of the removed shares)
+        """
+        price = self.average_price()
+        removed, paid = self.consume(quantity)
+        cost = removed * price
+        self.pool_adjustment = self.pool_adjustment + paid - cost if self else 0.0
+        return removed, cost
+
+    def lot_key(self, purchase):
+        """(date, position among the open lots of that date) of a lot; see lot()."""
+        index = self._find(purchase)
+        if index is None:
+            raise KeyError(f"Lot of {purchase.date} is no longer in the ledger")
+        return purchase.date, index - self._day_range(purchase.day)[0]
+
+    def lot(self, date: str, position: int = 0):
+        """View of the open lot at `position` among the lots of `date`."""
+        first, last = self._day_range(_ordinal(date))
+        if not 0 <= position < last - first:
+            raise KeyError(date)
+        return self._view(first + position)
+
+    def remove(self, purchase):
+        """Removes an open lot given its view. Returns False if it is not in the ledger."""
+        index = self._find(purchase)
+        if index is None:
+            return False
+        for column in self._columns():
+            column[index:self._size - 1] = column[index + 1:self._size]
+        self._size -= 1
+        return True
+
+    def rows(self, purchases):
+        """Row of each lot seen by `purchases` (views), or -1 for lots no longer open."""
+        lot_ids = np.fromiter(
+            (purchase.lot_id if purchase.ledger is self else -1 for purchase in purchases), dtype=np.int64
+        )
+        live = self._ids[self._head:self._size]
+        if not len(live):
+            return np.full(len(lot_ids), -1)
+        order = np.argsort(live)
+        positions = np.minimum(np.searchsorted(live[order], lot_ids), len(live) - 1)
+        found = live[order][positions] == lot_ids
+        return np.where(found, order[positions] + self._head, -1)
+
+    def lots_at(self, rows):
+        """Day ordinals, prices and quantities of the given rows (copies)."""
+        return self._days[rows], self._prices[rows], self._quantities[rows]
+
+    def set_prices(self, rows, price: float):
+        self._prices[rows] = price
+
+    def remove_rows(self, rows):
+        keep = np.ones(self._size - self._head, dtype=bool)
+        keep[np.asarray(rows) - self._head] = False
+        for name, column in zip(("_days", "_prices", "_quantities", "_ids"), self._columns()):
+            setattr(self, name, column[self._head:self._size][keep])
+        self._head, self._size = 0, int(keep.sum())
+
+    def holds(self, purchase):
+        """True if the lot seen by `purchase` is still open in this ledger."""
+        return self._find(purchase) is not None
+
+    def oldest_date(self):
+        """Date of the oldest open lot, or None if the ledger is empty."""
+        return _date(int(self._days[self._head])) if self else None
+
+    def total_quantity(self):
+        return int(self._quantities[self._head:self._size].sum())
+
+    def total_spent(self):
+        """
+        Cost basis of the open lots: the amount paid for them (lots without a
+        known price count as zero) plus pool_adjustment.
+        """
+        spent = float(np.nansum(self._quantities[self._head:self._size] * self._prices[self._head:self._size]))
+        return spent + self.pool_adjustment
+
+    def average_price(self):
+        quantity = self.total_quantity()
+        return self.total_spent() / quantity if quantity else 0
+
+    def lots(self):
+        """Day ordinals and quantities of the open lots (read-only views of the columns)."""
+        days, quantities = self._days[self._head:self._size], self._quantities[self._head:self._size]
+        days.flags.writeable = quantities.flags.writeable = False
+        return days, quantities
+
+    def costs(self):
+        """Amount paid for each open lot (price x quantity; NaN when the price is unknown)."""
+        return self._prices[self._head:self._size] * self._quantities[self._head:self._size]
+
+    def get(self, date: str, default=None):
+        index = self._first_index(date)
+        return self._view(index) if index is not None else default
+
+    def keys(self):
+        return [_date(int(day)) for day in self._days[self._head:self._size]]
+
+    def values(self):
+        return [self._view(index) for index in range(self._head, self._size)]
+
+    def items(self):
+        return [(view.date, view) for view in self.values()]
+
+    def __contains__(self, date):
+        return self._first_index(date) is not None
+
+    def __getitem__(self, date):
+        index = self._first_index(date)
+        if index is None:
+            raise KeyError(date)
+        return self._view(index)
+
+    def __setitem__(self, date, purchase):
+        # ao contrario do dicionario, uma segunda compra na mesma data nao sobrescreve a primeira
+        self.add(purchase)
+
+    def __delitem__(self, date):
+        first, last = self._day_range(_ordinal(date))
+        if first == last:
+            raise KeyError(date)
+        for column in self._columns():
+            column[first:self._size - (last - first)] = column[last:self._size]
+        self._size -= last - first
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return self._size - self._head
+
+    def _view(self, index):
+        return PurchaseView(self, int(self._days[index]), int(self._ids[index]))
+
+    def _columns(self):
+        return (self._days, self._prices, self._quantities, self._ids)
+
+    def _day_range(self, day):
+        days = self._days[self._head:self._size]
+        first = self._head + int(np.searchsorted(days, day, side="left"))
+        last = self._head + int(np.searchsorted(days, day, side="right"))
+        return first, last
+
+    def _first_index(self, date):
+        first, last = self._day_range(_ordinal(date))
+        return first if first < last else None
+
+    def _find(self, purchase):
+        if getattr(purchase, "ledger", None) is not self:
+            return None
+        # dentro de um dia os ids estao em ordem crescente
+        first, last = self._day_range(purchase.day)
+        index = first + int(np.searchsorted(self._ids[first:last], purchase.lot_id))
+        if index < last and self._ids[index] == purchase.lot_id:
+            return index
+        return None
+
+    def _set_sold(self, sold):
+        # dia e valor pago de cada lote vendido (fluxos de caixa da compra das acoes vendidas)
+        days = np.concatenate([np.asarray(lot_days, dtype=np.int64) for lot_days, _ in sold]) if sold else np.empty(0, dtype=np.int64)
+        paid = np.concatenate([np.asarray(amounts, dtype=float) for _, amounts in sold]) if sold else np.empty(0)
+        self.last_sold = (days, paid)
+        self.last_paid = float(paid.sum())
+        # dia de compra medio ponderado pelo valor pago
+        self.last_acquired_day = int(round(float(np.dot(paid, days)) / self.last_paid)) if self.last_paid > 0 else None
+        if not self:
+            self.pool_adjustment = 0.0  # sem lotes abertos nao sobra diferenca do custo medio
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self._days))
+        for name in ("_days", "_prices", "_quantities", "_ids"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def _compact(self):
+        # descarta os lotes vendidos quando eles passam da metade (custo amortizado O(1))
+        if self._head > 64 and self._head * 2 > self._size:
+            for column in self._columns():
+                column[:self._size - self._head] = column[self._head:self._size]
+            self._size -= self._head
+            self._head = 0
+
+
+class PurchaseView:
+    """
+    A lot of a LotLedger seen with the attributes of Purchase. Reads and
+    writes go to the ledger columns; a price that is not known yet reads
+    as None.
+    """
+
+    __slots__ = ("ledger", "day", "lot_id")
+
+    def __init__(self, ledger: LotLedger, day: int, lot_id: int):
+        self.ledger = ledger
+        self.day = day
+        self.lot_id = lot_id
+
+    @property
+    def date(self):
+        return _date(self.day)
+
+    @property
+    def price(self):
+        price = self.ledger._prices[self._index()]
+        return None if np.isnan(price) else float(price)
+
+    @price.setter
+    def price(self, price):
+        self.ledger._prices[self._index()] = np.nan if price is None else price
+
+    @property
+    def quantity(self):
+        return int(self.ledger._quantities[self._index()])
+
+    @quantity.setter
+    def quantity(self, quantity):
+        self.ledger._quantities[self._index()] = quantity
+
+    def _index(self):
+        index = self.ledger._find(self)
+        if index is None:
+            raise KeyError(f"Lot of {self.date} is no longer in the ledger")
+        return index
+
+    def __eq__(self, other):
+        return isinstance(other, PurchaseView) and (self.ledger, self.lot_id) == (other.ledger, other.lot_id)
+
+    def __hash__(self):
+        return hash((id(self.ledger), self.lot_id))
+
+    def __repr__(self):
+        return f"PurchaseView(date={self.date!r}, lot_id={self.lot_id})"
+
+
+@lru_cache(maxsize=4096)
+def _ordinal(date: str):
+    # a mesma data aparece em muitos lotes, entao o strptime so roda uma vez por data
+    try:
+        return datetime.strptime(date, "%Y-%m-%d").toordinal()
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date format: {date}. Expected format: YYYY-MM-DD.")
+
+
+@lru_cache(maxsize=4096)
+def _date(day: int):
+    return datetime.fromordinal(day).strftime("%Y-%m-%d")
@@ -5,8 +5,6 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import csv
 from stocktracker.wallet import Wallet
-from stocktracker.stock import Stock
-from stocktracker.purchase import Purchase
 
 class performancereport:
     """
@@ -27,7 +25,7 @@ class performancereport:
     @staticmethod
     def generate_metrics_report(wallet: Wallet, metrics_filename):
     #gera um txt com portfolio gain, avg gain, gain per asset, avg gain per sector, total_spent, total_value
-        wallet.update_wallet_status()
+        wallet.resolve()
         filepath = os.path.join(performancereport.get_data_path(), metrics_filename)
         with open(filepath, 'w', encoding='utf-8') as file:
             file.write(f"Wallet Name: {wallet.name}\n")
@@ -38,6 +36,27 @@ class performancereport:
             file.write(f"  Total spent: {wallet.total_spent:.2f}\n")
             file.write(f"  Number of tickets: {wallet.tickets_count}\n")
             file.write(f"  Number of shares: {wallet.total_quantity}\n")
+            # retornos que descontam os aportes feitos em datas diferentes
+            returns = wallet.get_money_weighted_returns()
+            file.write(f"  Time-weighted return (%): {wallet.get_time_weighted_return() * 100:.2f}\n")
+            file.write(f"  Money-weighted return (XIRR, % p.a.): {returns.get('Total', float('nan')) * 100:.2f}\n")
+            if wallet.refresh_errors:
+                # ativos cujo preco nao pode ser atualizado aparecem com o ultimo valor conhecido
+                file.write(f"  Price refresh failed for: {', '.join(sorted(wallet.refresh_errors))}\n")
+
+            if wallet.stocks:
+                # risco das posicoes atuais no ultimo ano
+                risk = wallet.get_risk_metrics(days=365, benchmark="^GSPC")
+                file.write("Risk Metrics (current holdings, last 365 days):\n")
+                file.write(f"  Annualized volatility (%): {risk['Volatility'] * 100:.2f}\n")
+                file.write(f"  Sharpe ratio: {risk['Sharpe']:.2f}\n")
+                file.write(f"  Sortino ratio: {risk['Sortino']:.2f}\n")
+                file.write(f"  Max drawdown (%): {risk['Max Drawdown'] * 100:.2f}\n")
+                file.write(f"  Max drawdown duration (trading days): {risk['Drawdown Duration']:.0f}\n")
+                file.write(f"  Beta (S&P 500): {risk['Beta']:.2f}\n")
+                file.write(f"  Alpha (S&P 500, %): {risk['Alpha'] * 100:.2f}\n")
+                file.write(f"  1-day VaR 95% (%): {risk['VaR 95%'] * 100:.2f}\n")
+                file.write(f"  1-day CVaR 95% (%): {risk['CVaR 95%'] * 100:.2f}\n")
             
             file.write("Stock Details:\n")
             for ticket, stock in wallet.stocks.items():
@@ -47,6 +66,7 @@ class performancereport:
                 file.write(f"  Current value: {stock.current_value:.2f}\n")
                 file.write(f"  Current total value: {stock.current_value * stock.quantity:.2f}\n")
                 file.write(f"  Gain (%): {stock.gain:.2f}%\n")
+                file.write(f"  IRR (% p.a.): {returns.get(ticket, float('nan')) * 100:.2f}\n")
                 file.write(f"  Purchases:\n")
                 for data_compra, compra in stock.purchases.items():
                     file.write(
@@ -59,7 +79,7 @@ class performancereport:
 
     @staticmethod
     def generate_purchase_history(wallet: Wallet, purchase_filename):
-        wallet.update_wallet_status()
+        wallet.resolve()
         filepath = os.path.join(performancereport.get_data_path(), purchase_filename)
 
         fieldnames = [
@@ -95,7 +115,7 @@ class performancereport:
 
     @staticmethod
     def generate_assets_listing(wallet: Wallet, assets_filename):
-        wallet.update_wallet_status()
+        wallet.resolve()
         filepath = os.path.join(performancereport.get_data_path(), assets_filename)
         records = []
 
@@ -135,7 +155,7 @@ class performancereport:
 
     @staticmethod
     def generate_csv_report(wallet: Wallet, filename: str = "portfolio.csv"):   #cria portfolio.csv na pasta data
-        wallet.update_wallet_status()
+        wallet.resolve()
         filepath = os.path.join(performancereport.get_data_path(), filename)
 
         fieldnames = [
@@ -197,7 +217,12 @@ class performancereport:
         print(f"Relatório salvo em: {filepath}")
 
     @staticmethod
-    def restore_from_csv(filename: str = "portfolio.csv") -> Wallet:
+    def restore_from_csv(filename: str = "portfolio.csv", resolve: bool = True) -> Wallet:
+        """
+        Rebuilds a wallet from the purchases saved by save_to_csv. The
+        purchases are only recorded while reading; prices are refreshed in
+        a single batched download at the end (or later, if `resolve` is False).
+        """
         filepath = os.path.join(performancereport.get_data_path(), filename) #acessa src/stocktracker/data
         if not os.path.exists(filepath):                                     #verifica se existe "portfolio.csv" nele
             print("Arquivo de carteira não encontrado.")
@@ -212,23 +237,8 @@ class performancereport:
                 if 'wallet_name' in row and row['wallet_name']:
                     wallet.name = row['wallet_name']
                 if row["type"] == "PURCHASE":
-                    ticket = row["ticket"]
-                    date = row["purchase_date"]
-                    quantity = int(row["quantity"])
-                    price = float(row["price"])
-
-                    if ticket in wallet.stocks:
-                        stock = wallet.stocks[ticket]
-                        stock.purchases[date] = Purchase(date, price, quantity)
-                        stock.quantity += quantity
-                        stock.total_spent += price * quantity
-                    else:
-                        stock = Stock(ticket, 0, date)
-                        stock.purchases = {}
-                        stock.purchases[date] = Purchase(date, price, quantity)
-                        stock.quantity = quantity
-                        stock.total_spent = price * quantity
-                        wallet.stocks[ticket] = stock
-
-        wallet.update_wallet_status()
+                    wallet.add_stock(row["ticket"], int(row["quantity"]), float(row["price"]), row["purchase_date"])
+
+        if resolve:
+            wallet.update_wallet_status()
         return wallet
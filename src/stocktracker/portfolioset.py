@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+from stocktracker import analytics
+from stocktracker.covariance import get_covariance_engine
+from stocktracker.stockAPI import LOOKBACK_DAYS, get_shared_api
+from stocktracker.wallet import get_benchmark_closes
+
+
+class PortfolioSet(list):
+    """
+    Lista das carteiras do usuario que busca os precos de todas juntas: a
+    uniao dos tickets, desde a compra mais antiga, e baixada em uma unica
+    chamada e cada carteira depois e atualizada a partir do cache. Assim
+    atualizar N carteiras custa o mesmo que atualizar os tickets distintos
+    delas uma vez.
+    """
+
+    def tickers(self):
+        """Union of the tickers of every wallet, in first-seen order."""
+        return list(dict.fromkeys(ticket for wallet in self for ticket in wallet.stocks))
+
+    def oldest_date(self):
+        """Oldest purchase date of any wallet (yyyy-mm-dd), or None without purchases."""
+        dates = [
+            stock.purchases.oldest_date() for wallet in self for stock in wallet.stocks.values() if stock.purchases
+        ]
+        return min(dates, default=None)
+
+    def prefetch(self, start_date: str = None):
+        """
+        Downloads the history of every ticker of every wallet from `start_date`
+        (defaults to the oldest purchase) with one batched request.
+        """
+        tickets = self.tickers()
+        start_date = start_date or self.oldest_date()
+        if tickets and start_date:
+            get_shared_api().get_histories(tickets, start_date)
+
+    def refresh(self):
+        """
+        Refreshes the prices and totals of every wallet after a single
+        prefetch (see Wallet.update_wallet_status).
+
+        Returns:
+            dict: Wallet name -> refresh errors, for the wallets that had any.
+        """
+        self.prefetch()
+        for wallet in self:
+            wallet.update_wallet_status()
+        return {wallet.name: wallet.refresh_errors for wallet in self if wallet.refresh_errors}
+
+    def get_performance_histories(self, days=None):
+        """Returns the get_performance_history(days) of every wallet, fetching prices once."""
+        start_date = self.oldest_date()
+        if start_date and days:
+            start_date = min(start_date, (pd.Timestamp("today") - pd.Timedelta(days=days)).strftime("%Y-%m-%d"))
+        if start_date:
+            # as carteiras pedem alguns dias antes do inicio para preencher feriados
+            self.prefetch((pd.Timestamp(start_date) - pd.Timedelta(days=LOOKBACK_DAYS)).strftime("%Y-%m-%d"))
+        return [wallet.get_performance_history(days) for wallet in self]
+
+    def get_risk_metrics(self, days: int = 365, benchmark: str = None, risk_free: float = 0.0):
+        """
+        Risk metrics of the current holdings of every wallet (one row per
+        wallet), computed together over the last `days` days after a single
+        prefetch; see Wallet.get_risk_metrics.
+        """
+        start_date = (pd.Timestamp("today").normalize() - pd.Timedelta(days=days + LOOKBACK_DAYS)).strftime("%Y-%m-%d")
+        if any(stock.pending for wallet in self for stock in wallet.stocks.values()):
+            # compras ainda nao validadas precisam do historico desde a data delas
+            start_date = min(start_date, self.oldest_date())
+        tickets = self.tickers()  # o benchmark vem da memoria do servico de benchmarks
+        if tickets:
+            get_shared_api().get_histories(tickets, start_date)
+
+        if not self:
+            return pd.DataFrame(columns=analytics.METRICS)
+        # carteiras vazias entram como uma coluna sem valores (metricas NaN)
+        values = pd.concat([wallet.get_holdings_history(days) for wallet in self], axis=1).fillna(0)
+        values.columns = [wallet.name for wallet in self]
+        benchmark_closes = get_benchmark_closes(benchmark, values.index[0]) if benchmark and not values.empty else None
+        return analytics.risk_metrics(values, benchmark_closes, risk_free)
+
+    def get_time_weighted_returns(self, days=None):
+        """Wallet.get_time_weighted_return(days) of every wallet (pd.Series by name), fetching prices once."""
+        self.get_performance_histories(days)
+        return pd.Series([wallet.get_time_weighted_return(days) for wallet in self], index=[wallet.name for wallet in self], dtype=float)
+
+    def get_money_weighted_returns(self):
+        """
+        XIRR of every holding and of every wallet (ticket "Total"), solved in
+        a single batch; pd.Series indexed by (wallet name, ticket).
+        """
+        if any(stock.pending for wallet in self for stock in wallet.stocks.values()):
+            self.prefetch()
+        groups, days, amounts = [], [], []
+        for wallet in self:
+            tickets, wallet_days, wallet_amounts = wallet.get_cash_flows()
+            groups += [(wallet.name, ticket) for ticket in tickets] + [(wallet.name, "Total")] * len(tickets)
+            days += [wallet_days, wallet_days]
+            amounts += [wallet_amounts, wallet_amounts]
+        if not groups:
+            return pd.Series(dtype=float)
+        rates = analytics.xirr_by_group(groups, np.concatenate(days), np.concatenate(amounts))
+        rates.index = pd.MultiIndex.from_tuples(list(rates.index), names=["wallet", "ticket"])
+        return rates
+
+    def get_diversification(self):
+        """
+        Wallet.get_diversification() of every wallet (one row per wallet); the
+        shared CovarianceEngine is brought up to date once for the union of
+        the tickers.
+        """
+        if any(stock.pending for wallet in self for stock in wallet.stocks.values()):
+            self.prefetch()
+        tickets = self.tickers()
+        if tickets:
+            get_covariance_engine().sync(tickets)
+        return pd.DataFrame([wallet.get_diversification() for wallet in self])
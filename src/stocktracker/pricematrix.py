@@ -0,0 +1,163 @@
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+FIELDS = ["Open", "High", "Low", "Close"]
+CHANGE_LOG_SIZE = 64  # mudancas lembradas por ticket; alem disso quem pergunta refaz tudo
+
+
+class PriceMatrix:
+    """
+    Matriz densa (datas x tickets, float64) com os precos de todos os tickets
+    ja carregados pela StockAPI, compartilhada por todos os Stocks e carteiras.
+    Cada ticket ocupa uma coluna; dias sem dado ficam como NaN.
+    """
+
+    def __init__(self):
+        self.dates = np.empty(0, dtype="datetime64[D]")
+        self.columns = {}  # ticket -> indice da coluna
+        self.values = {field: np.empty((0, 0)) for field in FIELDS}
+        self.version = 0  # muda a cada update que altera algum valor, para quem guarda valores derivados dos precos
+        self._changes = {}  # ticket -> deque de (versao, dia mais antigo alterado)
+        self._lock = threading.RLock()
+
+    def update(self, ticket: str, history):
+        """Writes the rows of an OHLC history DataFrame into the column of `ticket`."""
+        if history is None or history.empty:
+            with self._lock:
+                self._column(ticket)
+            return
+
+        index = history.index
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        dates = index.values.astype("datetime64[D]")
+
+        with self._lock:
+            self._add_dates(dates)
+            column = self._column(ticket)
+            rows = np.searchsorted(self.dates, dates)
+            changed = np.zeros(len(rows), dtype=bool)
+            for field in FIELDS:
+                if field in history.columns:
+                    old = self.values[field][rows, column]
+                    new = history[field].to_numpy(dtype=float)
+                    changed |= ~((old == new) | (np.isnan(old) & np.isnan(new)))
+                    self.values[field][rows, column] = new
+            if changed.any():
+                # recargas com os mesmos valores nao invalidam quem guardou derivados
+                self.version += 1
+                log = self._changes.setdefault(ticket, deque(maxlen=CHANGE_LOG_SIZE))
+                log.append((self.version, pd.Timestamp(dates[changed].min())))
+
+    def versions(self, tickets):
+        """Version of the last update that changed each of `tickets` (0 if never), as a dict."""
+        with self._lock:
+            return {ticket: self._changes[ticket][-1][0] if ticket in self._changes else 0 for ticket in tickets}
+
+    def changed_since(self, versions: dict):
+        """
+        Earliest day changed in the tickets of `versions` (as returned by
+        versions()) after those versions, or None if nothing changed. When the
+        change log no longer reaches that far back, returns pd.Timestamp.min.
+        """
+        with self._lock:
+            earliest = None
+            for ticket, version in versions.items():
+                log = self._changes.get(ticket)
+                if not log or log[-1][0] <= version:
+                    continue
+                if len(log) == log.maxlen and log[0][0] > version:
+                    return pd.Timestamp.min  # mudancas antigas ja descartadas
+                day = min(date for changed, date in log if changed > version)
+                earliest = day if earliest is None else min(earliest, day)
+            return earliest
+
+    def __contains__(self, ticket):
+        return ticket in self.columns
+
+    def latest(self, ticket: str, field: str = "Close"):
+        """Last known value of `field` for `ticket` (NaN if there is none)."""
+        with self._lock:
+            if ticket not in self.columns:
+                return np.nan
+            column = self.values[field][:, self.columns[ticket]]
+            valid = np.flatnonzero(~np.isnan(column))
+            return column[valid[-1]] if len(valid) else np.nan
+
+    def latest_many(self, tickets, field: str = "Close"):
+        """Vector with the last known value of `field` for each ticket (NaN if unknown)."""
+        with self._lock:
+            result = np.full(len(tickets), np.nan)
+            known = [i for i, ticket in enumerate(tickets) if ticket in self.columns]
+            if not known or not len(self.dates):
+                return result
+            block = self.values[field][:, [self.columns[tickets[i]] for i in known]]
+            valid = ~np.isnan(block)
+            # linha do ultimo valor valido de cada coluna (-1 quando a coluna e toda NaN)
+            last_rows = np.where(valid, np.arange(len(self.dates))[:, None], -1).max(axis=0)
+            values = block[np.maximum(last_rows, 0), np.arange(len(known))]
+            result[known] = np.where(last_rows >= 0, values, np.nan)
+            return result
+
+    def max(self, ticket: str, field: str = "High", since: str = None):
+        return self._reduce(np.nanmax, ticket, field, since)
+
+    def min(self, ticket: str, field: str = "Low", since: str = None):
+        return self._reduce(np.nanmin, ticket, field, since)
+
+    def frame(self, tickets, start_date: str = None, end_date: str = None, field: str = "Close"):
+        """
+        Returns `field` of `tickets` between `start_date` and `end_date`
+        (exclusive) as a DataFrame (dates x tickets), keeping only the dates
+        where at least one of the tickets has data.
+        """
+        with self._lock:
+            first, last = self._row_range(start_date, end_date)
+            block = np.full((last - first, len(tickets)), np.nan)
+            for i, ticket in enumerate(tickets):
+                if ticket in self.columns:
+                    block[:, i] = self.values[field][first:last, self.columns[ticket]]
+            dates = self.dates[first:last]
+
+        has_data = ~np.isnan(block).all(axis=1)
+        index = pd.DatetimeIndex(dates[has_data], name="Date")
+        return pd.DataFrame(block[has_data], index=index, columns=list(tickets))
+
+    def _reduce(self, function, ticket, field, since):
+        with self._lock:
+            if ticket not in self.columns:
+                return np.nan
+            first, last = self._row_range(since, None)
+            column = self.values[field][first:last, self.columns[ticket]]
+            if np.isnan(column).all():
+                # nenhum pregao desde `since` (ex: compra hoje, num fim de semana): usa o ultimo valor
+                return self.latest(ticket, field)
+            return function(column)
+
+    def _row_range(self, start_date, end_date):
+        first = np.searchsorted(self.dates, np.datetime64(start_date, "D")) if start_date else 0
+        last = np.searchsorted(self.dates, np.datetime64(end_date, "D")) if end_date else len(self.dates)
+        return first, last
+
+    def _column(self, ticket):
+        if ticket not in self.columns:
+            self.columns[ticket] = len(self.columns)
+            for field in FIELDS:
+                matrix = self.values[field]
+                self.values[field] = np.hstack([matrix, np.full((matrix.shape[0], 1), np.nan)])
+        return self.columns[ticket]
+
+    def _add_dates(self, dates):
+        new_dates = np.union1d(self.dates, dates)
+        if len(new_dates) == len(self.dates):
+            return
+        # realoca as linhas existentes nas posicoes da nova lista de datas
+        rows = np.searchsorted(new_dates, self.dates)
+        for field in FIELDS:
+            matrix = np.full((len(new_dates), len(self.columns)), np.nan)
+            matrix[rows] = self.values[field]
+            self.values[field] = matrix
+        self.dates = new_dates
@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def get_cache_dir():
+    """
+    Returns the directory used for the on-disk price cache.
+
+    Uses the STOCKTRACKER_CACHE_DIR environment variable when set,
+    otherwise src/stocktracker/data/cache (next to the CSV reports).
+    """
+    cache_dir = os.environ.get("STOCKTRACKER_CACHE_DIR")
+    if not cache_dir:
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        cache_dir = os.path.join(current_dir, "data", "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+class PriceStore:
+    """
+    Armazena o historico diario (OHLCV) de cada ticket em um banco SQLite,
+    junto com o intervalo de datas que ja foi baixado do provedor.
+    """
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = cache_dir or get_cache_dir()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.path = os.path.join(self.cache_dir, "prices.sqlite3")
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS prices (
+                    ticket TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (ticket, date)
+                )"""
+            )
+            # start: data mais antiga pedida ao provedor
+            # fetched_at: momento (epoch) do ultimo download ate "hoje"
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS coverage (
+                    ticket TEXT PRIMARY KEY,
+                    start TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )"""
+            )
+
+    def get_coverage(self, ticket: str):
+        """Returns (start, fetched_at) for a ticket, or None if it was never stored."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT start, fetched_at FROM coverage WHERE ticket = ?", (ticket,)
+            ).fetchone()
+        return row
+
+    def get_last_date(self, ticket: str):
+        """Returns the most recent stored date (yyyy-mm-dd) for a ticket, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(date) FROM prices WHERE ticket = ?", (ticket,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def read(self, ticket: str, start_date: str, end_date: str = None):
+        """
+        Reads the stored history of a ticket as a DataFrame shaped like
+        yfinance's `history()`. `end_date` is exclusive, as in yfinance.
+        """
+        query = "SELECT date, open, high, low, close, volume FROM prices WHERE ticket = ? AND date >= ?"
+        params = [ticket, start_date]
+        if end_date:
+            query += " AND date < ?"
+            params.append(end_date)
+        query += " ORDER BY date"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        index = pd.DatetimeIndex([row[0] for row in rows], name="Date")
+        return pd.DataFrame([row[1:] for row in rows], index=index, columns=OHLCV_COLUMNS, dtype=float)
+
+    def write(self, ticket: str, history, start_date: str = None, fetched_at: float = None):
+        """
+        Saves (upsert) the rows of a downloaded history and updates the coverage
+        of the ticket. `start_date` extends the covered range backwards and
+        `fetched_at` marks a download that reached the present day.
+        """
+        rows = []
+        if history is not None and not history.empty:
+            index = history.index
+            if index.tz is not None:
+                index = index.tz_localize(None)
+            dates = index.strftime("%Y-%m-%d")
+            values = history.reindex(columns=OHLCV_COLUMNS).to_numpy(dtype=float)
+            rows = [(ticket, date, *map(_nullable, row)) for date, row in zip(dates, values)]
+
+        with self._lock, self._conn:
+            if rows:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+                )
+
+            coverage = self._conn.execute(
+                "SELECT start, fetched_at FROM coverage WHERE ticket = ?", (ticket,)
+            ).fetchone()
+            if coverage is None:
+                coverage = (start_date, 0.0)
+            start = min(filter(None, [coverage[0], start_date]))
+            last_fetch = max(coverage[1], fetched_at or 0.0)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?)", (ticket, start, last_fetch)
+            )
+
+    def clear(self, ticket: str = None):
+        """Removes the cached data of one ticket, or of every ticket."""
+        with self._lock, self._conn:
+            if ticket is None:
+                self._conn.execute("DELETE FROM prices")
+                self._conn.execute("DELETE FROM coverage")
+            else:
+                self._conn.execute("DELETE FROM prices WHERE ticket = ?", (ticket,))
+                self._conn.execute("DELETE FROM coverage WHERE ticket = ?", (ticket,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _nullable(value):
+    # SQLite guarda NaN como NULL
+    return None if value != value else float(value)
+
+
+def is_fresh(fetched_at: float, max_age: float):
+    """True when a download made at `fetched_at` (epoch) is younger than `max_age` seconds."""
+    return (time.time() - fetched_at) < max_age
@@ -0,0 +1,252 @@
+import json
+import os
+import zlib
+from typing import Protocol, runtime_checkable
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from curl_cffi import requests
+from yfinance.exceptions import YFRateLimitError
+
+from stocktracker.pricestore import OHLCV_COLUMNS
+
+
+# erros que valem uma nova tentativa: falhas de rede (curl_cffi herda de OSError) e limite de taxa
+TRANSIENT_ERRORS = (OSError, YFRateLimitError)
+
+
+@runtime_checkable
+class MarketDataProvider(Protocol):
+    """
+    Interface of a market data source used by StockAPI. Histories are daily
+    OHLCV DataFrames indexed by date; `end_date` is exclusive.
+    """
+
+    def get_history(self, ticket: str, start_date: str, end_date: str = None) -> pd.DataFrame:
+        ...
+
+    def get_histories(self, tickets, start_date: str, end_date: str = None) -> dict:
+        ...
+
+    def get_latest_quote(self, ticket: str) -> float:
+        ...
+
+    def get_info(self, ticket: str) -> dict:
+        ...
+
+
+def empty_history():
+    return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name="Date"), dtype=float)
+
+
+class YFinanceProvider:
+    """Market data from Yahoo Finance through yfinance."""
+
+    def __init__(self, max_connections: int = 8):
+        # A sessao do curl_cffi usa um handle curl por thread, entao pode ser compartilhada
+        self.session = requests.Session(impersonate="chrome")
+        self.max_connections = max_connections
+
+    def get_ticker(self, ticket: str):
+        return yf.Ticker(ticket, session=self.session)
+
+    def get_history(self, ticket: str, start_date: str, end_date: str = None):
+        return self.get_ticker(ticket).history(start=start_date, end=end_date)
+
+    def get_histories(self, tickets, start_date: str, end_date: str = None):
+        data = yf.download(
+            list(tickets),
+            start=start_date,
+            end=end_date,
+            session=self.session,
+            group_by="ticker",
+            auto_adjust=True,
+            progress=False,
+            threads=self.max_connections,
+            multi_level_index=True,
+        )
+
+        histories = {}
+        for ticket in tickets:
+            if data is None or ticket not in data.columns.get_level_values(0):
+                histories[ticket] = empty_history()
+            else:
+                histories[ticket] = data[ticket].dropna(how="all")
+        return histories
+
+    def get_latest_quote(self, ticket: str):
+        history = self.get_ticker(ticket).history(period="5d")
+        if history.empty:
+            raise ValueError(f"No quote for {ticket}")
+        return float(history["Close"].iloc[-1])
+
+    def get_info(self, ticket: str):
+        return self.get_ticker(ticket).info
+
+
+class RecordingProvider:
+    """
+    Repassa os pedidos para outro provedor e salva as respostas em disco
+    (um CSV de OHLCV e um JSON de metadados por ticket), no formato lido
+    pelo ReplayProvider.
+    """
+
+    def __init__(self, provider: MarketDataProvider, directory: str):
+        self.provider = provider
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def get_history(self, ticket: str, start_date: str, end_date: str = None):
+        history = self.provider.get_history(ticket, start_date, end_date)
+        self._save_history(ticket, history)
+        return history
+
+    def get_histories(self, tickets, start_date: str, end_date: str = None):
+        histories = self.provider.get_histories(tickets, start_date, end_date)
+        for ticket, history in histories.items():
+            self._save_history(ticket, history)
+        return histories
+
+    def get_latest_quote(self, ticket: str):
+        return self.provider.get_latest_quote(ticket)
+
+    def get_info(self, ticket: str):
+        info = self.provider.get_info(ticket)
+        with open(_info_path(self.directory, ticket), "w", encoding="utf-8") as f:
+            json.dump(info, f, default=str)
+        return info
+
+    def _save_history(self, ticket: str, history):
+        if history is None or history.empty:
+            return
+        history = _normalize(history)
+        recorded = _read_recording(self.directory, ticket)
+        if recorded is not None:
+            # junta com o que ja foi gravado; os dados novos prevalecem
+            history = pd.concat([recorded, history])
+            history = history[~history.index.duplicated(keep="last")].sort_index()
+        history.to_csv(_history_path(self.directory, ticket), index_label="Date")
+
+
+class ReplayProvider:
+    """
+    Offline provider: serves histories recorded by RecordingProvider and,
+    for tickets that were never recorded, deterministic synthetic prices
+    (a random walk seeded by the ticket), so the same request always gets
+    the same answer.
+    """
+
+    SYNTHETIC_EPOCH = "2000-01-03"
+
+    def __init__(self, directory: str = None, synthetic: bool = True, today: str = None):
+        """
+        Args:
+            directory: Folder with recordings; None serves only synthetic data.
+            synthetic: Generate data for tickets without recording (otherwise they are empty).
+            today: Last date served by the synthetic data (defaults to the real today).
+        """
+        self.directory = directory
+        self.synthetic = synthetic
+        self.today = today
+        self._recordings = {}
+
+    def get_history(self, ticket: str, start_date: str, end_date: str = None):
+        history = self._full_history(ticket)
+        history = history.loc[history.index >= pd.Timestamp(start_date)]
+        if end_date:
+            history = history.loc[history.index < pd.Timestamp(end_date)]
+        return history.copy()
+
+    def get_histories(self, tickets, start_date: str, end_date: str = None):
+        return {ticket: self.get_history(ticket, start_date, end_date) for ticket in tickets}
+
+    def get_latest_quote(self, ticket: str):
+        history = self._full_history(ticket)
+        if history.empty:
+            raise ValueError(f"No quote for {ticket}")
+        return float(history["Close"].iloc[-1])
+
+    def get_info(self, ticket: str):
+        if self.directory and os.path.exists(_info_path(self.directory, ticket)):
+            with open(_info_path(self.directory, ticket), encoding="utf-8") as f:
+                return json.load(f)
+        return {"symbol": ticket, "sector": "Unknown"}
+
+    def _full_history(self, ticket: str):
+        if ticket not in self._recordings:
+            history = _read_recording(self.directory, ticket) if self.directory else None
+            if history is None:
+                history = synthetic_history(ticket, self.SYNTHETIC_EPOCH, self.today) if self.synthetic else empty_history()
+            self._recordings[ticket] = history
+        return self._recordings[ticket]
+
+
+def synthetic_history(ticket: str, start_date: str, end_date: str = None):
+    """
+    Builds a deterministic daily OHLCV history for `ticket` on business days
+    from `start_date` to `end_date` (inclusive, defaults to today). The value
+    of a given day does not depend on the range asked for.
+    """
+    index = pd.bdate_range(start_date, end_date or pd.Timestamp("today").normalize(), name="Date")
+    rng = np.random.default_rng(zlib.crc32(ticket.encode()))
+    first_price = rng.uniform(20, 500)
+    draws = rng.standard_normal((len(index), 3))
+
+    close = first_price * np.exp(np.cumsum(0.0003 + 0.02 * draws[:, 0]))
+    open_ = np.concatenate(([first_price], close[:-1]))
+    high = np.maximum(open_, close) * (1 + 0.005 * np.abs(draws[:, 1]))
+    low = np.minimum(open_, close) * (1 - 0.005 * np.abs(draws[:, 2]))
+    volume = np.full(len(index), 1_000_000.0)
+
+    return pd.DataFrame(
+        {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume}, index=index
+    )
+
+
+def get_provider(name: str = None, max_connections: int = 8):
+    """
+    Builds the provider named `name` ('yfinance', 'record' or 'replay').
+    Defaults to the STOCKTRACKER_PROVIDER environment variable, then
+    'yfinance'. Recordings live in STOCKTRACKER_RECORDINGS_DIR.
+    """
+    name = name or os.environ.get("STOCKTRACKER_PROVIDER", "yfinance")
+    directory = os.environ.get("STOCKTRACKER_RECORDINGS_DIR")
+
+    if name == "yfinance":
+        return YFinanceProvider(max_connections)
+    if name == "record":
+        if not directory:
+            raise ValueError("STOCKTRACKER_RECORDINGS_DIR must be set to record market data")
+        return RecordingProvider(YFinanceProvider(max_connections), directory)
+    if name == "replay":
+        return ReplayProvider(directory)
+    raise ValueError(f"Unknown market data provider: {name}")
+
+
+def _normalize(history):
+    history = history.reindex(columns=OHLCV_COLUMNS).astype(float)
+    if history.index.tz is not None:
+        history.index = history.index.tz_localize(None)
+    history.index = history.index.normalize().rename("Date")
+    return history
+
+
+def _history_path(directory: str, ticket: str):
+    return os.path.join(directory, f"{_safe_name(ticket)}.csv")
+
+
+def _info_path(directory: str, ticket: str):
+    return os.path.join(directory, f"{_safe_name(ticket)}.json")
+
+
+def _safe_name(ticket: str):
+    # tickets de indices comecam com ^ (ex: ^GSPC)
+    return ticket.replace("^", "_idx_").replace("/", "_")
+
+
+def _read_recording(directory: str, ticket: str):
+    path = _history_path(directory, ticket)
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, index_col="Date", parse_dates=["Date"])
@@ -6,6 +6,8 @@ class Purchase:
     contendo numero de ativos, data de compra e preco de compra
     """
 
+    __slots__ = ("date", "price", "quantity")
+
     def __init__(self, date: str, price: float, quantity: int):
         # Validação de formato de data: deve ser yyyy-mm-dd
         try:
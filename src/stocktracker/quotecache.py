@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class QuoteCache:
+    """
+    Cache em memoria (LRU com tempo de validade) para historicos e cotacoes,
+    usado pela StockAPI antes de ir ao disco ou a rede.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60):
+        """
+        Args:
+            maxsize: Maximum number of entries; the least recently used one is dropped first.
+            ttl: Seconds an entry stays valid after being stored.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None when missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, ticket: str = None):
+        """Drops every entry of `ticket` (keys start with the ticket), or all entries."""
+        with self._lock:
+            if ticket is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == ticket]:
+                    del self._entries[key]
+
+    def stats(self):
+        """Returns the hit/miss counters and the current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+            }
+
+    def __len__(self):
+        return len(self._entries)
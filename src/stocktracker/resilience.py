@@ -0,0 +1,129 @@
+import random
+import threading
+import time
+
+
+class MarketDataUnavailable(RuntimeError):
+    """Raised when the provider cannot be called (open circuit) and nothing is cached."""
+
+
+class TokenBucket:
+    """
+    Limitador de taxa: cada chamada consome um token e os tokens sao
+    repostos a `rate` por segundo, acumulando no maximo `capacity`.
+    """
+
+    def __init__(self, rate: float = 5, capacity: int = 10):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available and consumes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RetryPolicy:
+    """
+    Repete chamadas que falharam por erros transitorios (rede, limite de taxa)
+    com espera exponencial e jitter entre as tentativas.
+    """
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8, transient=(OSError,)):
+        """
+        Args:
+            attempts: Total number of tries (1 disables retrying).
+            base_delay: Wait before the second try; doubles at each new try.
+            max_delay: Upper bound of a single wait.
+            transient: Exception types worth retrying; other errors are raised at once.
+        """
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.transient = tuple(transient)
+
+    def delay(self, attempt: int):
+        # "full jitter": espera aleatoria entre 0 e o teto exponencial
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, function, *args):
+        for attempt in range(self.attempts):
+            try:
+                return function(*args)
+            except self.transient:
+                if attempt == self.attempts - 1:
+                    raise
+                time.sleep(self.delay(attempt))
+
+
+class CircuitBreaker:
+    """
+    Abre depois de `failure_threshold` falhas seguidas e recusa chamadas por
+    `reset_timeout` segundos; depois deixa as chamadas passarem de novo
+    (meio-aberto): um sucesso fecha o circuito e uma falha reabre.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """True if a call may go through now (closed or half-open)."""
+        return self.state != self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            # meio-aberto ainda tem failures >= limite, entao uma falha reabre
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class CircuitBreakers:
+    """One CircuitBreaker per key (a ticket or a provider host), created on demand."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[key]
+
+    def open_keys(self):
+        """Keys whose breaker is currently refusing calls."""
+        with self._lock:
+            return [key for key, breaker in self._breakers.items() if breaker.state == CircuitBreaker.OPEN]
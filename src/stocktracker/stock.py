@@ -1,7 +1,14 @@
-from stocktracker.purchase import Purchase
-from stocktracker.stockAPI import StockAPI
-from stocktracker.utils import get_current_date, get_oldest_date
-from collections import OrderedDict
+from stocktracker.providers import TRANSIENT_ERRORS
+from stocktracker.resilience import MarketDataUnavailable
+from stocktracker.stockAPI import LOOKBACK_DAYS, get_shared_api
+from stocktracker.utils import get_current_date
+from stocktracker.lotledger import LotLedger
+from stocktracker.costbasis import get_method
+import numpy as np
+import pandas as pd
+
+# falhas ao buscar o historico: as compras continuam pendentes para a proxima tentativa
+FETCH_ERRORS = (MarketDataUnavailable,) + TRANSIENT_ERRORS
 
 
 class Stock:
@@ -11,111 +18,231 @@ class Stock:
         quantity: int,
         price: int = None,
         purchase_date: str = get_current_date(),
+        lazy: bool = False,
     ):
+        """
+        Args:
+            ticket: Stock symbol.
+            quantity: Number of shares bought.
+            price: Price paid per share (defaults to the latest opening price).
+            purchase_date: Date of the purchase (yyyy-mm-dd).
+            lazy: Only record the purchase; the price history is downloaded and
+                the purchase validated on first access to a price or on
+                resolve(). Without it both happen here.
+        """
         # OBS: data compra no formato yyyy/mm/dd
         self.ticket = ticket
-        self.quantity = quantity
-        self.api = StockAPI()
-
-        stock_history = self.api.get_history(self.ticket, purchase_date)
-
-        if stock_history.empty:
-            raise ValueError(f"No data for the purchase date: {purchase_date}")
-        
-        self.current_price = stock_history["Open"].iloc[-1] # Get latest opening price
-
-        self.historical_high = stock_history["High"].max()
-        self.historical_low = stock_history["Low"].min()
+        self.lazy = lazy
+        self.api = get_shared_api()
+        # precos ficam na matriz compartilhada por todas as carteiras, nao no objeto
+        self.prices = self.api.prices
+        self.since = purchase_date  # maxima/minima historicas contam a partir da compra mais antiga
         # self.sector = self.api.get_sector(self.ticket)
 
-        if not price:
-            price = stock_history["Open"].iloc[-1]
-
-        # Dicionario onde a chave é o a data da acao e o valor um objeto Compra
-        self.purchases = {}
-        purchase = Purchase(purchase_date, price, quantity)
-        self.purchases[purchase_date] = purchase
-
-        self.total_spent = purchase.price * purchase.quantity
-        self.current_value = 0  # valor atual total do ativo sera averiguado somente quando quisermos obter valorização, nao tem pra que guardar ele ja agora
-        self.gain = 0
-        
-        self.update_stock_status()
+        # Lotes de compra (objetos Purchase) ordenados por data, varios por data se preciso
+        self.purchases = LotLedger()
+        self.pending = []  # compras ainda nao validadas contra o historico
+        self.filled = []  # compras que ganharam preco no resolve(), para a carteira registrar no diario
+        self.quantity = 0
+        self.total_spent = 0
+        self._record_purchase(purchase_date, quantity, price)
+
+        if not lazy:
+            self.update_stock_status()
+
+    @property
+    def purchases(self):
+        return self._purchases
+
+    @purchases.setter
+    def purchases(self, purchases):
+        # aceita tambem um dicionario {data: Purchase}, como era guardado antes
+        self._purchases = purchases if isinstance(purchases, LotLedger) else LotLedger(purchases.values())
+
+    @property
+    def current_price(self):
+        """Latest opening price."""
+        self._ensure_resolved()
+        return self.prices.latest(self.ticket, "Open") if self.purchases else 0
+
+    @property
+    def current_value(self):
+        """Latest closing price (per share)."""
+        self._ensure_resolved()
+        return self.prices.latest(self.ticket, "Close") if self.purchases else 0
+
+    @property
+    def historical_high(self):
+        self._ensure_resolved()
+        return self.prices.max(self.ticket, "High", self.since) if self.purchases else 0
+
+    @property
+    def historical_low(self):
+        self._ensure_resolved()
+        return self.prices.min(self.ticket, "Low", self.since) if self.purchases else 0
+
+    @property
+    def gain(self):
+        # valorizacao depende do valor gasto, ja que pode ter comprado a acao por precos diferentes
+        self._ensure_resolved()
+        if not self.purchases or self.total_spent <= 0:
+            return 0
+        total_current = self.current_value * self.quantity
+        return ((total_current - self.total_spent) / self.total_spent) * 100  # Em porcentagem
 
     def add_purchase(self, date: str, quantity_purchase: int, purchase_price: float):
         if date is None:
             date = get_current_date()
 
-        stock_history = self.api.get_history(self.ticket, date)
-
+        purchase = self._record_purchase(date, quantity_purchase, purchase_price)
+
+        if not self.lazy:
+            self.update_stock_status()
+        return purchase
+
+    def add_purchases(self, days, quantities, prices):
+        """
+        Records many purchases at once, without network access; they are
+        validated like lazy purchases, on resolve().
+
+        Args:
+            days: Purchase dates as day ordinals (date.toordinal()).
+            quantities: Number of shares of each purchase.
+            prices: Price paid per share (NaN to use the latest opening price).
+        """
+        quantities = np.asarray(quantities, dtype=np.int64)
+        prices = np.asarray(prices, dtype=float)
+        self.pending.extend(self.purchases.extend(days, prices, quantities))
+        self.quantity += int(quantities.sum())
+        self.total_spent += float(np.nansum(prices * quantities))
+
+    def _record_purchase(self, date: str, quantity: int, price: float = None):
+        # registra a compra sem acessar a rede; a validacao fica para o resolve()
+        # adiciona o lote ja na posicao da sua data (venda usa FIFO) e atualiza valor_gasto
+        purchase = self.purchases.insert(date, price, quantity)
+        self.quantity += quantity
+        if price:
+            self.total_spent += price * quantity
+        self.pending.append(purchase)
+        return purchase
+
+    def remove_purchase(self, purchase):
+        """
+        Removes an open lot (view) as if it had never been bought, e.g. a
+        purchase that could not be validated. Returns False if the lot is no
+        longer open.
+        """
+        if not self.purchases.holds(purchase):
+            return False
+        quantity, price = purchase.quantity, purchase.price
+        self.purchases.remove(purchase)
+        self.pending = [pending for pending in self.pending if pending != purchase]
+        self.quantity -= quantity
+        self.total_spent -= (price or 0) * quantity
+        return True
+
+    def resolve(self):
+        """
+        Validates the pending purchases with one history request from the
+        oldest pending date and fills the price of purchases recorded without
+        one. Invalid purchases (the history ends before their date) are
+        removed and reported with a ValueError after the valid ones are kept.
+
+        If the history cannot be fetched, or comes back empty (provider
+        offline or rate limited), nothing is validated: the purchases stay
+        pending and a fetch error (see FETCH_ERRORS) is raised.
+        """
+        if not self.pending:
+            return
+
+        rows = self.purchases.rows(self.pending)
+        views = [purchase for purchase, row in zip(self.pending, rows) if row >= 0]
+        rows = rows[rows >= 0]  # lotes ja vendidos nao precisam de validacao
+        if not len(rows):
+            self.pending = []
+            return
+        days, prices, quantities = self.purchases.lots_at(rows)
+
+        stale_reads = self.api.stale_reads
+        oldest_date = pd.Timestamp.fromordinal(int(days.min())).strftime("%Y-%m-%d")
+        stock_history = self.api.get_history(self.ticket, oldest_date)
         if stock_history.empty:
-            raise ValueError(f"No data for the purchase date: {date}")
-
-        purchase = Purchase(date, purchase_price, quantity_purchase)
-
-        # adiciona objeto Compra para o dicionario e já atualiza valor_gasto
-        self.purchases[date] = purchase
-        self.purchases = OrderedDict(
-            sorted(self.purchases.items())
-        )  # para implementar a venda de acoes usando FIFO
-        # precisamos deixar o dicionario ordenado
-        self.quantity += quantity_purchase
-        self.total_spent += purchase_price * quantity_purchase
-
-        self.update_stock_status()
-
-    def sell(self, quantity):
-        removed = 0  # quantas acoes foram removidas
-        spent_removed = 0
-
-        datas = list(self.purchases.keys())
-
-        for data in datas:
-            purchase = self.purchases[data]
-
-            if purchase.quantity <= (quantity - removed):
-                # remove toda compra
-                removed += purchase.quantity
-                spent_removed += purchase.quantity * purchase.price
-                del self.purchases[data]
-                if (
-                    removed == quantity
-                ):  # para de remover acoes das proximas datas quando já remover o suficiente
-                    break  # sai do loop
-            else:
-                # remove só parte da compra
-                delta = quantity - removed
-                purchase.quantity -= delta
-                removed += delta
-                spent_removed += delta * purchase.price
-
-                break
+            # sem pregao desde a compra ou sem dados do provedor: olha alguns dias antes para distinguir
+            lookback = pd.Timestamp.fromordinal(int(days.min()) - LOOKBACK_DAYS).strftime("%Y-%m-%d")
+            stock_history = self.api.get_history(self.ticket, lookback)
+        last_day = stock_history.index[-1].toordinal() if not stock_history.empty else -1
+        invalid = days > last_day
+
+        # historico incompleto (provedor fora do ar, limite de taxa, nada baixado): so
+        # compras com data futura podem ser recusadas; as outras esperam nova tentativa
+        incomplete = self.api.stale_reads != stale_reads or (
+            stock_history.empty and np.isnan(self.prices.latest(self.ticket, "Close"))
+        )
+        if incomplete and (days[invalid] <= pd.Timestamp("today").toordinal()).any():
+            raise MarketDataUnavailable(f"No market data for {self.ticket} yet; purchases kept pending")
+        self.pending = []
+
+        # valida e completa todos os lotes pendentes de uma vez
+        unpriced = ~invalid & (np.isnan(prices) | (prices == 0))
+        if unpriced.any():
+            latest_open = float(stock_history["Open"].iloc[-1])
+            self.purchases.set_prices(rows[unpriced], latest_open)
+            self.total_spent += latest_open * int(quantities[unpriced].sum())
+            self.filled.extend(view for view, filled in zip(views, unpriced) if filled)
+
+        if invalid.any():
+            self.purchases.remove_rows(rows[invalid])
+            self.quantity -= int(quantities[invalid].sum())
+            self.total_spent -= float(np.nansum(prices[invalid] * quantities[invalid]))
+            dates = [pd.Timestamp.fromordinal(int(day)).strftime("%Y-%m-%d") for day in days[invalid]]
+            raise ValueError(f"No data for the purchase date: {', '.join(dates)}")
+
+    def _ensure_resolved(self):
+        if self.pending:
+            try:
+                self.update_stock_status()
+            except FETCH_ERRORS:
+                pass  # sem historico por enquanto: usa os precos ja conhecidos
+
+    def sell(self, quantity, method: str = "fifo", lots=None):
+        """
+        Removes `quantity` shares, choosing the lots with a cost basis method.
+
+        Args:
+            quantity: Number of shares sold.
+            method: 'fifo', 'lifo', 'average', 'specific' or any other
+                registered with costbasis.register_method.
+            lots: Views of the lots to sell (for 'specific').
+
+        Returns:
+            tuple: (shares removed, cost of the removed shares)
+        """
+        method = get_method(method)
+        removed, spent_removed = method.match(self.purchases, quantity, lots)
+        # lotes pendentes vendidos por inteiro nao tem mais o que validar
+        self.pending = [purchase for purchase in self.pending if self.purchases.holds(purchase)]
 
         self.quantity -= removed
         self.total_spent -= spent_removed
-        self.update_stock_status()
+        # venda nao acessa a rede: precos ficam como estao ate a proxima atualizacao
+        if self.purchases:
+            self.since = self.purchases.oldest_date()
 
         return removed, spent_removed
 
     def update_stock_status(self):
+        # valida compras pendentes (modo lazy) antes de atualizar
+        self.resolve()
+
         # se a purchases estiver vazia, n chama api, alteracao necessaroa para testes 
         if not self.purchases:
-            self.current_value = 0
-            self.historical_high = 0
-            self.historical_low = 0
-            self.gain = 0
-            return    
-
-        # atualiza o valor atual, maximo e minimo
-        oldest_date = get_oldest_date(list(self.purchases.keys()))
-
-        price, high, low = self.api.get_latest_price(self.ticket, oldest_date)
-        self.current_value = price
-        self.historical_high = high
-        self.historical_low = low
-
-        # modificar a valorizacao para depender apenas de valor gasto, ja que pode ter comprado a acao por precos diferentes
-        total_current = self.current_value * self.quantity
-        self.gain = (
-            (total_current - self.total_spent) / self.total_spent
-        ) * 100  # Em porcentagem
+            return
+
+        # atualiza o historico desde a compra mais antiga; valor atual, maximo e
+        # minimo sao lidos da matriz de precos compartilhada
+        oldest_date = self.purchases.oldest_date()
+        self.api.get_latest_price(self.ticket, oldest_date)
+        self.since = oldest_date
+        # recalcula os totais direto das colunas dos lotes
+        self.quantity = self.purchases.total_quantity()
+        self.total_spent = self.purchases.total_spent()
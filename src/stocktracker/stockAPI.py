@@ -1,34 +1,385 @@
-import yfinance as yf
-from curl_cffi import requests
-
-class StockAPI:
-    def __init__(self):
-        self.session = requests.Session(impersonate="chrome")
-
-    def get_stock_data(self, ticket: str):
-        return yf.Ticker(ticket, session=self.session)
-
-    def get_history(self, ticket: str, start_date: str):
-        return self.get_stock_data(ticket).history(start=start_date)
-
-    def get_sector(self, ticket: str):
-        return self.get_stock_data(ticket).info.get('sector', 'Unknown')
-
-    def get_current_price(self, ticket: str, start_date: str):
-        history = self.get_history(ticket, start_date)
-        if history.empty:
-            raise ValueError(f"No data for the date: {start_date}")
-        return history["Open"].iloc[0]
-
-    def get_latest_price(self, ticket: str, start_date: str):
-        history = self.get_history(ticket, start_date)
-        # Se não há dados, tente buscar até hoje
-        if history.empty:
-            # Tenta buscar até hoje
-            from datetime import datetime
-            today = datetime.today().strftime("%Y-%m-%d")
-            history = self.get_history(ticket, start_date)
-            if history.empty:
-                raise ValueError(f"No data for the date: {start_date}")
-        # Garante que pega o último valor disponível
-        return history["Close"].iloc[-1], history["High"].max(), history["Low"].min()
\ No newline at end of file
+import threading
+import time
+from concurrent.futures import Future
+
+import pandas as pd
+
+from stocktracker.pricematrix import PriceMatrix
+from stocktracker.pricestore import PriceStore, is_fresh
+from stocktracker.providers import TRANSIENT_ERRORS, get_provider
+from stocktracker.quotecache import QuoteCache
+from stocktracker.resilience import CircuitBreakers, MarketDataUnavailable, RetryPolicy, TokenBucket
+
+# quantos dias antes da data pedida procurar o ultimo preco disponivel (fins de semana, feriados)
+LOOKBACK_DAYS = 7
+
+
+class StockAPI:
+    def __init__(
+        self,
+        provider=None,
+        cache_dir: str = None,
+        use_cache: bool = True,
+        tail_max_age: float = 15 * 60,
+        max_connections: int = 8,
+        memory_ttl: float = 60,
+        memory_maxsize: int = 256,
+        rate_limiter: TokenBucket = None,
+        retry_policy: RetryPolicy = None,
+        breakers: CircuitBreakers = None,
+    ):
+        """
+        Args:
+            provider: MarketDataProvider used for downloads (defaults to
+                providers.get_provider(), i.e. yfinance unless STOCKTRACKER_PROVIDER says otherwise).
+            cache_dir: Directory of the on-disk price cache (see pricestore.get_cache_dir).
+            use_cache: If False, every history request goes to the provider.
+            tail_max_age: Seconds after which the most recent days of a cached
+                ticker are downloaded again (prices of the current day change).
+            max_connections: Maximum number of simultaneous requests to the provider.
+            memory_ttl: Seconds a history stays in the in-memory cache (0 disables it).
+            memory_maxsize: Maximum number of histories kept in memory (LRU).
+            rate_limiter: TokenBucket throttling provider calls (default 5/s, bursts of 10).
+            retry_policy: RetryPolicy for transient provider errors (default 3 tries).
+            breakers: CircuitBreakers per ticket and per provider; while a breaker
+                is open the last cached history is served instead.
+
+        Prefer get_shared_api() over creating new instances: every StockAPI
+        opens its own HTTP session and cache connection.
+        """
+        self.provider = provider or get_provider(max_connections=max_connections)
+        # o semaforo limita quantas requisicoes ficam abertas ao mesmo tempo
+        self.max_connections = max_connections
+        self._connections = threading.BoundedSemaphore(max_connections)
+        self._counter_lock = threading.Lock()
+
+        self.store = PriceStore(cache_dir) if use_cache else None
+        self.tail_max_age = tail_max_age
+        # historicos pedidos de novo dentro de uma mesma acao do usuario nem chegam ao disco
+        self.memory_cache = QuoteCache(memory_maxsize, memory_ttl) if memory_ttl > 0 else None
+        self.network_calls = 0  # numero de downloads feitos no provedor
+        self.stale_reads = 0  # historicos servidos do disco porque o provedor falhou
+        # todo historico carregado tambem vai para a matriz de precos compartilhada
+        self.prices = PriceMatrix()
+        self._inflight = SingleFlight()
+
+        self.rate_limiter = rate_limiter or TokenBucket()
+        self.retry_policy = retry_policy or RetryPolicy(transient=TRANSIENT_ERRORS)
+        self.breakers = breakers or CircuitBreakers()
+
+    def download_history(self, ticket: str, start_date: str, end_date: str = None):
+        """Downloads the history straight from the provider, bypassing the cache."""
+        return self._call_provider([ticket], self.provider.get_history, ticket, start_date, end_date)
+
+    def _call_provider(self, tickets, function, *args):
+        """
+        Calls the provider under the rate limiter, the connection limit and
+        the retry policy. Raises MarketDataUnavailable without calling it when
+        the breaker of the provider or of one of the `tickets` is open.
+        """
+        host = type(self.provider).__name__
+        host_breaker = self.breakers.get(host)
+        ticket_breakers = [self.breakers.get(ticket) for ticket in tickets]
+        if not host_breaker.allow() or not all(breaker.allow() for breaker in ticket_breakers):
+            raise MarketDataUnavailable(f"Market data for {', '.join(tickets)} is temporarily unavailable")
+
+        def attempt():
+            self.rate_limiter.acquire()
+            with self._counter_lock:
+                self.network_calls += 1
+            with self._connections:
+                return function(*args)
+
+        try:
+            result = self.retry_policy.call(attempt)
+        except Exception as e:
+            for breaker in ticket_breakers:
+                breaker.record_failure()
+            # so erros de rede/limite contam contra o provedor inteiro
+            if isinstance(e, self.retry_policy.transient):
+                host_breaker.record_failure()
+            raise
+
+        host_breaker.record_success()
+        for breaker in ticket_breakers:
+            breaker.record_success()
+        return result
+
+    def get_history(self, ticket: str, start_date: str, end_date: str = None):
+        """
+        Returns the daily history of `ticket` from `start_date` to `end_date`
+        (exclusive, defaults to today).
+
+        Recent identical requests are answered by the in-memory QuoteCache.
+        Ranges already on disk are served by the PriceStore; only the days
+        missing before the cached range and the trailing days since the last
+        download are requested from the provider.
+        """
+        key = (ticket, start_date, end_date, "1d")  # so trabalhamos com candles diarios
+        history = self.memory_cache.get(key) if self.memory_cache is not None else None
+        if history is None:
+            # chamadas simultaneas com a mesma chave esperam pelo mesmo download
+            history = self._inflight.do(key, self._load_history, ticket, start_date, end_date)
+        # copia para que quem recebe possa alterar o DataFrame sem estragar o cache
+        return history.copy()
+
+    def _load_history(self, ticket: str, start_date: str, end_date: str = None):
+        history = self._read_history(ticket, start_date, end_date)
+        self.prices.update(ticket, history)
+        if self.memory_cache is not None:
+            self.memory_cache.set((ticket, start_date, end_date, "1d"), history)
+        return history
+
+    def _read_history(self, ticket: str, start_date: str, end_date: str = None):
+        if self.store is None:
+            return self.download_history(ticket, start_date, end_date)
+
+        coverage = self.store.get_coverage(ticket)
+        if coverage is None:
+            history = self.download_history(ticket, start_date)
+            self._save(ticket, history, start_date=start_date, fetched_at=time.time())
+            return self.store.read(ticket, start_date, end_date)
+
+        covered_start, fetched_at = coverage
+
+        try:
+            if start_date < covered_start:
+                # falta o inicio do intervalo: baixa so ate o começo do que ja temos
+                head = self.download_history(ticket, start_date, covered_start)
+                self._save(ticket, head, start_date=start_date)
+
+            if self._needs_tail(fetched_at, end_date):
+                # baixa de novo a partir do ultimo dia salvo, que pode ter sido parcial
+                tail_start = self.store.get_last_date(ticket) or covered_start
+                tail = self.download_history(ticket, tail_start)
+                self._save(ticket, tail, fetched_at=time.time())
+        except Exception:
+            # provedor fora do ar ou circuito aberto: serve o ultimo valor salvo
+            self._count_stale_read()
+
+        return self.store.read(ticket, start_date, end_date)
+
+    def _save(self, ticket: str, history, start_date: str = None, fetched_at: float = None):
+        """
+        Writes a download to the store, marking as covered only what it really
+        returned: an empty download (the provider may fail without raising)
+        changes nothing, and the coverage only goes back to `start_date` when
+        the first row is at most LOOKBACK_DAYS after it (weekends and
+        holidays), otherwise to the first row.
+        """
+        if history is None or history.empty:
+            return
+        if start_date is not None:
+            first = history.index[0].tz_localize(None) if history.index.tz is not None else history.index[0]
+            if first - pd.Timestamp(start_date) > pd.Timedelta(days=LOOKBACK_DAYS):
+                start_date = first.strftime("%Y-%m-%d")
+        self.store.write(ticket, history, start_date=start_date, fetched_at=fetched_at)
+
+    def _count_stale_read(self):
+        with self._counter_lock:
+            self.stale_reads += 1
+
+    def download_histories(self, tickets, start_date: str, end_date: str = None):
+        """
+        Downloads the history of several tickets with a single batched provider
+        call, bypassing the cache. Returns a dict ticket -> OHLCV DataFrame.
+        """
+        tickets = list(tickets)
+        return self._call_provider(tickets, self.provider.get_histories, tickets, start_date, end_date)
+
+    def get_histories(self, tickets, start_date: str, end_date: str = None, field: str = "Close"):
+        """
+        Returns one column of the daily history (`field`, default Close) of every
+        ticket in `tickets` as a wide DataFrame (dates x tickets) aligned on the
+        union of trading days.
+
+        Tickets whose range is already cached are read from disk; all the others
+        are downloaded together in one batched request.
+        """
+        tickets = list(dict.fromkeys(tickets))  # remove repetidos mantendo a ordem
+        if not tickets:
+            return pd.DataFrame()
+
+        key = (tuple(tickets), start_date, end_date, field)
+        return self._inflight.do(key, self._load_histories, tickets, start_date, end_date, field).copy()
+
+    def _load_histories(self, tickets, start_date: str, end_date: str = None, field: str = "Close"):
+
+        if self.store is None:
+            histories = self.download_histories(tickets, start_date, end_date)
+        else:
+            fetch_starts = {}
+            for ticket in tickets:
+                fetch_start = self._fetch_start(ticket, start_date, end_date)
+                if fetch_start is not None:
+                    fetch_starts[ticket] = fetch_start
+
+            if fetch_starts:
+                # um unico download a partir da menor data que falta, ate hoje
+                try:
+                    downloaded = self.download_histories(list(fetch_starts), min(fetch_starts.values()))
+                except Exception:
+                    # serve o que houver em disco; tickets sem nada salvo ficam vazios
+                    self._count_stale_read()
+                else:
+                    fetched_at = time.time()
+                    for ticket, fetch_start in fetch_starts.items():
+                        self._save(ticket, downloaded.get(ticket), start_date=fetch_start, fetched_at=fetched_at)
+
+            histories = {ticket: self.store.read(ticket, start_date, end_date) for ticket in tickets}
+
+        for ticket, history in histories.items():
+            self.prices.update(ticket, history)
+        return self.prices.frame(tickets, start_date, end_date, field)
+
+    def _fetch_start(self, ticket: str, start_date: str, end_date: str = None):
+        """
+        Returns the first date that has to be downloaded for the cache to serve
+        `ticket` from `start_date` to `end_date`, or None when nothing is missing.
+        """
+        coverage = self.store.get_coverage(ticket)
+        if coverage is None:
+            return start_date
+
+        covered_start, fetched_at = coverage
+        if start_date < covered_start:
+            return start_date
+        if self._needs_tail(fetched_at, end_date):
+            return self.store.get_last_date(ticket) or covered_start
+        return None
+
+    def _needs_tail(self, fetched_at: float, end_date: str = None):
+        # o intervalo pedido vai alem do ultimo download e esse download ja esta velho
+        fetched_day = time.strftime("%Y-%m-%d", time.localtime(fetched_at))
+        needs_tail = end_date is None or end_date > fetched_day
+        return needs_tail and not is_fresh(fetched_at, self.tail_max_age)
+
+    def get_sector(self, ticket: str):
+        return self._call_provider([ticket], self.provider.get_info, ticket).get('sector', 'Unknown')
+
+    def get_current_price(self, ticket: str, start_date: str):
+        history = self.get_history(ticket, start_date)
+        if history.empty:
+            raise ValueError(f"No data for the date: {start_date}")
+        return history["Open"].iloc[0]
+
+    def get_latest_price(self, ticket: str, start_date: str):
+        history = self.get_history(ticket, start_date)
+        # Se não há dados (ex: data num fim de semana ou hoje antes da abertura),
+        # volta alguns dias para pegar o ultimo pregao disponivel
+        if history.empty:
+            lookback = (pd.Timestamp(start_date) - pd.Timedelta(days=LOOKBACK_DAYS)).strftime("%Y-%m-%d")
+            history = self.get_history(ticket, lookback)
+            if history.empty:
+                raise ValueError(f"No data for the date: {start_date}")
+        # Garante que pega o último valor disponível
+        return history["Close"].iloc[-1], history["High"].max(), history["Low"].min()
+
+
+class SingleFlight:
+    """
+    Junta chamadas simultaneas com a mesma chave: a primeira executa a funcao
+    e as demais esperam pelo mesmo resultado (ou pela mesma excecao).
+    """
+
+    def __init__(self):
+        self._calls = {}  # chave -> Future da chamada em andamento
+        self._lock = threading.Lock()
+        self.shared = 0  # quantas chamadas reaproveitaram uma chamada em andamento
+
+    def do(self, key, function, *args):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = function(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class SharedAPIRegistry:
+    """
+    Guarda uma unica instancia de StockAPI por processo, criada sob demanda,
+    para que todos os Stocks, carteiras e callbacks reutilizem a mesma sessao HTTP.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._options = {}
+        self._api = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._api is None:
+                self._api = self._factory(**self._options)
+            return self._api
+
+    def configure(self, **options):
+        """Replaces the options used to build the shared StockAPI (e.g. max_connections, cache_dir)."""
+        with self._lock:
+            self._options = options
+            self._api = None  # objetos que ja tem a instancia antiga continuam usando ela
+
+    def set(self, api):
+        """Installs an already built api as the shared instance (useful in tests)."""
+        with self._lock:
+            self._api = api
+
+
+class SharedAPIService:
+    """
+    Servico de processo (ex.: BenchmarkService) ligado a StockAPI
+    compartilhada. Quando a api compartilhada e trocada (ex.: nos testes) o
+    servico antigo e descartado e outro e criado com a nova api, ja que os
+    dados guardados nele vieram da fonte antiga.
+    """
+
+    def __init__(self, factory, close=None):
+        self._factory = factory  # recebe a api e devolve o servico (que guarda a api em .api)
+        self._close = close  # chamado com o servico descartado
+        self._service = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        api = get_shared_api()
+        with self._lock:
+            if self._service is None or self._service.api is not api:
+                if self._service is not None and self._close is not None:
+                    self._close(self._service)
+                self._service = self._factory(api)
+            return self._service
+
+
+_registry = SharedAPIRegistry(StockAPI)
+
+
+def get_shared_api():
+    """Returns the process-wide StockAPI."""
+    return _registry.get()
+
+
+def configure_shared_api(**options):
+    """Configures the process-wide StockAPI; takes the same arguments as StockAPI()."""
+    _registry.configure(**options)
+
+
+def set_shared_api(api):
+    """Replaces the process-wide StockAPI by `api`."""
+    _registry.set(api)
@@ -0,0 +1,57 @@
+import pandas as pd
+
+
+class ValueHistory:
+    """
+    Serie do valor diario de uma carteira guardada entre chamadas de
+    get_performance_history. Guarda a versao da carteira e as versoes dos
+    precos usadas no calculo e a data mais antiga afetada por compras/vendas
+    ou por precos recarregados desde entao, para refazer so o trecho que
+    mudou (e os dias novos quando o tempo passa).
+    """
+
+    def __init__(self):
+        self.series = None
+        self.start = None  # primeiro dia da serie
+        self.end = None  # dia (hoje) em que a serie foi calculada
+        self.version = None  # versao da carteira no ultimo calculo
+        self.price_versions = {}  # ticket -> versao dos precos (PriceMatrix.versions) no ultimo calculo
+        self.dirty_from = None  # dia mais antigo afetado por mudancas desde o ultimo calculo
+
+    def invalidate(self, date: str = None):
+        """Marks the series as stale from `date` (yyyy-mm-dd) on, or entirely when no date is given."""
+        if date is None:
+            self.series = None
+            return
+        date = pd.Timestamp(date)
+        if self.dirty_from is None or date < self.dirty_from:
+            self.dirty_from = date
+
+    def stale_from(self, start: pd.Timestamp, end: pd.Timestamp, version: int):
+        """
+        First day that must be (re)computed for a series from `start` to `end`
+        of the wallet at `version`, or None if the stored series is current.
+        """
+        if self.series is None or start != self.start:
+            return start
+        if self.dirty_from is not None:
+            # o ultimo dia calculado tambem e refeito, pois o fechamento dele pode ter mudado
+            return max(start, min(self.dirty_from, self.end))
+        if version != self.version:
+            return start  # mudanca sem data conhecida: refaz tudo
+        if end == self.end:
+            return None
+        return self.end
+
+    def store(
+        self, values: pd.Series, since: pd.Timestamp, start: pd.Timestamp, end: pd.Timestamp, version: int,
+        price_versions: dict = None,
+    ):
+        """Replaces the stored series from `since` on with `values`, computed with prices at `price_versions`."""
+        if self.series is None or since <= start:
+            self.series = values
+        else:
+            self.series = pd.concat([self.series[self.series.index < since], values])
+        self.start, self.end, self.version = start, end, version
+        self.price_versions = dict(price_versions or {})
+        self.dirty_from = None
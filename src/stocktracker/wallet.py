@@ -1,104 +1,445 @@
-from stocktracker.stock import Stock
+from stocktracker.stock import FETCH_ERRORS, Stock
+from stocktracker import analytics
+from stocktracker.benchmarks import get_benchmark_service
+from stocktracker.covariance import get_covariance_engine
+from stocktracker.costbasis import RealizedLedger, get_method
+from stocktracker.utils import get_current_date
+from stocktracker.stockAPI import LOOKBACK_DAYS, get_shared_api
+from stocktracker.valuehistory import ValueHistory
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import numpy as np
 import pandas as pd
 
 import yfinance as yf
 
+UNIX_EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+TRANSACTION_COLUMNS = ["ticker", "date", "qty", "price", "side"]
+
 
 class Wallet:
 
     # Lista de acoes e suas quantidades que o usuario possui.
 
-    def __init__(self, name: str):
+    def __init__(self, name: str, cost_basis: str = "fifo"):
         self.name = name
+        self.cost_basis = get_method(cost_basis).name  # metodo usado nas vendas (ver costbasis)
         self.stocks = {}  # dicionario que aponta para o objeto acao
         self.total_value = (
             0  # somatorio dos valores de cada acao no momento que o usuario abre o app
         )
         self.total_spent = 0  # valor gasto na compra das acoes ate entao. Valorizacao = valor_total - valor_gasto
-        self.total_gain = 0  # valorizacao de cada acao esta em percentual. Falta ver como representar isso numa carteira com distribuições desiguais de valor entre ativos
         self.total_quantity = 0 #n tipos diferentes de ativos na carteira
         self.tickets_count = 0 # somatorio da quantidade de cada ativo
+        self.refresh_errors = {}  # ticket -> erro da ultima atualizacao de precos
+        self.resolve_errors = {}  # ticket -> compras invalidas encontradas no ultimo resolve()
+        self._unlogged = None  # compra validada pelo add_stock antes do BUY dela ir para o diario
+        # Os totais acima sao mantidos a cada compra/venda (O(1)); o preco usado em
+        # total_value e o da ultima atualizacao, guardado aqui por ticket
+        self.last_prices = {}
+        self.version = 0  # muda a cada compra/venda
+        self.value_history = ValueHistory()  # valor diario guardado entre chamadas de get_performance_history
+        self._frame = None  # ultimo to_dataframe(), refeito quando versao da carteira ou dos precos muda
+        self._frame_key = None
+        self.journal = None  # WalletJournal que grava compras e vendas, se a carteira for persistida
+        self.realized = RealizedLedger()  # vendas e lucro realizado de cada uma
+
+    @property
+    def total_gain(self):
+        # valorizacao de cada acao esta em percentual. Falta ver como representar isso numa carteira com distribuições desiguais de valor entre ativos
+        # Valorização = ((valor_atual - valor_gasto) / valor_gasto) * 100
+        if self.total_spent > 0:
+            return ((self.total_value - self.total_spent) / self.total_spent) * 100  # Em porcentagem
+        return 0.0
+
+    @property
+    def realized_gain(self):
+        """Profit (or loss) of the shares already sold."""
+        return self.realized.gain
 
-    def add_stock(self, stock: str, n_stocks: int, price: float, data_compra: str = None):
+    @property
+    def unrealized_gain(self):
+        """Profit (or loss) of the shares held, at the prices of the last refresh."""
+        return self.total_value - self.total_spent
+
+    def add_stock(self, stock: str, n_stocks: int, price: float, data_compra: str = None, validate: bool = False):
         # antes verifica se ja exsite este stock no dicionario
         # se nao, inicializa classe stock
 
         # PROBLEMA: devemos fazer com que o cara possa comprar a acao X mais de uma vez e salvar os precos de compra diferentes
         # Deve receber uma data de compra e salvar o valor pago junto com a quantidade de ativos comprados para cada vez que o usuario add ativos na carteira
 
+        # sem data a compra e de hoje; resolvida aqui para o diario guardar a mesma data do lote
+        data_compra = data_compra or get_current_date()
         if stock in self.stocks:
             # self.stocks[stock].numero_acoes += n_stocks
             # self.stocks[stock].atualiza_valor_gasto(n_stocks, data_compra)
             # self.stocks[stock].atualiza_status_acao()
-            self.stocks[stock].add_purchase(data_compra, n_stocks, price)
+            purchase = self.stocks[stock].add_purchase(data_compra, n_stocks, price)
 
         else:
-            self.stocks[stock] = Stock(stock, n_stocks, price, data_compra)
-
-    def remove_stock(self, stock: str, n_stocks: int = None):
-        self.update_wallet_status()
-
+            # compras so sao registradas; a validacao e os precos vem no resolve()/update_wallet_status()
+            holding = Stock(stock, n_stocks, price, data_compra, lazy=True)
+            purchase = holding.pending[-1]
+            self._add_holding(stock, holding)
+
+        self._apply(stock, n_stocks, price * n_stocks if price else 0)
+        self._touch(data_compra)
+        if validate:
+            # com validate=True (ex.: interface) a compra e conferida ja, antes de ir para o diario
+            self._unlogged = purchase
+            try:
+                self._validate_purchase(stock, purchase)
+            finally:
+                self._unlogged = None
+        # o preco registrado e o da compra ja resolvida, nao a cotacao do dia em que o diario for lido
+        self._log("BUY", ticket=stock, quantity=n_stocks, price=purchase.price, date=data_compra)
+
+    def remove_stock(
+        self, stock: str, n_stocks: int = None, method: str = None, lots=None, price: float = None, date: str = None
+    ):
+        """
+        Sells shares of `stock` and records the realized profit.
+
+        Args:
+            stock: Ticker sold.
+            n_stocks: Number of shares sold (None sells all of them).
+            method: Cost basis method (defaults to the wallet's cost_basis).
+            lots: Views of the lots to sell, for method='specific'.
+            price: Sale price per share (defaults to the price of the last
+                refresh, or to the cost when the stock was never refreshed).
+            date: Sale date (yyyy-mm-dd, defaults to today).
+        """
+        # o custo das compras vendidas precisa estar conhecido; o resolve e o da
+        # carteira, para os totais acompanharem as compras validadas ou descartadas
+        if stock in self.stocks and self._unpriced(self.stocks[stock]):
+            self.resolve()
         if stock not in self.stocks:
             print(f"Stock: {stock} is not in the wallet.")
             return
 
-        stock_quantity = self.stocks[stock].quantity
-
-        if n_stocks is None:
-            # Remove tudo
-            self.total_value -= self.stocks[stock].current_value * stock_quantity
-            self.total_spent -= self.stocks[stock].total_spent
-            del self.stocks[stock]
+        holding = self.stocks[stock]
+        quantity = holding.quantity if n_stocks is None else n_stocks
+        if quantity > holding.quantity:
+            raise ValueError("Attempting to remove more shares than are available in your wallet.")
+        if self._unpriced(holding):
+            raise ValueError(f"Purchase prices of {stock} are not known yet: {self.resolve_errors.get(stock)}")
+
+        method = method or self.cost_basis
+        lot_keys = [holding.purchases.lot_key(lot) for lot in lots] if lots else None
+        # a venda pode consumir qualquer lote, entao o historico muda desde o primeiro
+        self._touch(holding.purchases.oldest_date())
+        price, date = self._sell(stock, quantity, method, lots, price, date)
+
+        event = {"ticket": stock, "quantity": n_stocks, "method": method, "price": price, "date": date}
+        if lot_keys:
+            event["lots"] = lot_keys
+        self._log("SELL", **event)
+
+    def _sell(self, ticket: str, quantity: int, method: str, lots=None, price: float = None, date: str = None):
+        # vende pelo metodo escolhido, atualiza os totais e registra o lucro realizado
+        holding = self.stocks[ticket]
+        if price is None or pd.isna(price):
+            # preco da ultima atualizacao (venda nao acessa a rede)
+            price = self.last_prices.get(ticket, holding.prices.latest(ticket, "Close"))
+        date = date or get_current_date()
+
+        removed, spent_removed = holding.sell(quantity, method, lots)
+        self._apply(ticket, -removed, -spent_removed)
+        if pd.isna(price):
+            price = spent_removed / removed if removed else 0.0  # sem preco conhecido: vendida pelo custo
+        if removed:
+            acquired = holding.purchases.last_acquired_day
+            acquired = pd.Timestamp.fromordinal(acquired).strftime("%Y-%m-%d") if acquired else None
+            self.realized.record(
+                ticket, date, removed, price, spent_removed, acquired, holding.purchases.last_paid,
+                holding.purchases.last_sold,
+            )
+        if not holding.quantity:
+            self._drop(ticket)
+        return float(price), date
+
+    def _restore_pool_adjustment(self, ticket: str, adjustment: float):
+        # custo medio deixado por vendas anteriores a um snapshot (ver LotLedger.consume_pooled)
+        holding = self.stocks[ticket]
+        holding.purchases.pool_adjustment += adjustment
+        holding.total_spent += adjustment
+        self._apply(ticket, 0, adjustment)
+
+    def _unpriced(self, holding: Stock):
+        return any(purchase.price is None for purchase in holding.pending if holding.purchases.holds(purchase))
+
+    def _validate_purchase(self, ticket: str, purchase):
+        # resolve agora; so conta um erro gerado por este resolve() (resolve_errors guarda os antigos)
+        before = self.resolve_errors.get(ticket)
+        self.resolve()
+        error = self.resolve_errors.get(ticket)
+        if error is None or error is before:
+            return
+        holding = self.stocks.get(ticket)
+        if holding is not None and holding.purchases.holds(purchase):
+            if purchase not in holding.pending:
+                return  # a compra foi validada; o erro e de outros lotes do ticker
+            # historico indisponivel: desfaz a compra em vez de deixa-la pendente
+            quantity, price = purchase.quantity, purchase.price
+            holding.remove_purchase(purchase)
+            self._apply(ticket, -quantity, -(price or 0) * quantity)
+            if not holding.purchases:
+                self._drop(ticket)
+        raise ValueError(str(error))
+
+    def _touch(self, date: str = None):
+        # marca a carteira como alterada a partir de `date` (ou toda ela)
+        self.version += 1
+        self.value_history.invalidate(date)
+
+    def _add_holding(self, ticket: str, stock: Stock):
+        self.stocks[ticket] = stock
+        self.total_quantity += 1
+        known_price = stock.prices.latest(ticket, "Close")
+        if not pd.isna(known_price):
+            self.last_prices[ticket] = known_price
+
+    def import_transactions(self, source):
+        """
+        Imports many buys and sells at once, e.g. a broker export.
+
+        All rows are validated before anything changes. Buys are recorded
+        per ticker in one pass, prices are resolved with a single batched
+        download, then sells are applied in date order with the wallet's
+        cost basis method, each one seeing only the lots bought up to its
+        date.
+
+        Args:
+            source: Path of a CSV file, a DataFrame, or an iterable of dicts or
+                tuples with the columns ticker, date, qty, price (empty/NaN
+                uses the latest opening price for buys and the price of the
+                last refresh for sells) and side ('BUY' or 'SELL', defaults
+                to 'BUY').
+
+        Returns:
+            dict: Errors of purchases dropped on resolution (see resolve()).
+        """
+        transactions = _read_transactions(source)
+        if transactions.empty:
+            return self.resolve_errors
+
+        # posicao de cada ticker ao longo do tempo nao pode ficar negativa
+        signed = transactions["qty"].where(transactions["side"] == "BUY", -transactions["qty"])
+        base = transactions["ticker"].map(lambda ticket: self.stocks[ticket].quantity if ticket in self.stocks else 0)
+        position = signed.groupby(transactions["ticker"], sort=False).cumsum() + base
+        if (position < 0).any():
+            row = transactions[position < 0].iloc[0]
+            raise ValueError(
+                f"Attempting to remove more shares than are available in your wallet: {row['ticker']} on {row['date'].date()}"
+            )
 
-        elif n_stocks < stock_quantity:
-            removed, spent_removed = self.stocks[stock].sell(n_stocks)
-            self.total_spent -= spent_removed
-            self.total_value -= self.stocks[stock].current_value * removed
+        days = transactions["date"].values.astype("datetime64[D]").astype(np.int64) + UNIX_EPOCH_ORDINAL
+        transactions = transactions.assign(day=days)
+
+        self._touch(transactions["date"].min().strftime("%Y-%m-%d"))
+
+        # um snapshot no fim no lugar de um evento por linha (ou por preco resolvido) no diario
+        journal, self.journal = self.journal, None
+        try:
+            self._import_purchases(transactions[transactions["side"] == "BUY"])
+            self.resolve()  # um unico download para todos os tickers
+
+            # em ordem de data, cada venda so ve os lotes comprados ate o dia dela
+            # (importa para LIFO e custo medio)
+            for row in transactions[transactions["side"] == "SELL"].itertuples():
+                if row.ticker not in self.stocks:
+                    continue  # compras descartadas no resolve()
+                date = row.date.strftime("%Y-%m-%d")
+                with self.stocks[row.ticker].purchases.until(date):
+                    self._sell(row.ticker, row.qty, self.cost_basis, price=row.price, date=date)
+        finally:
+            self.journal = journal
+
+        if self.journal is not None:
+            self.journal.snapshot(self)
+            for stock in self.stocks.values():
+                stock.filled = []  # precos ja gravados no snapshot
+        return self.resolve_errors
+
+    def _import_purchases(self, buys: pd.DataFrame):
+        # grava as compras de cada ticker de uma vez; precos e validacao vem no resolve()
+        for ticket, rows in buys.groupby("ticker", sort=False):
+            quantities, prices = rows["qty"].to_numpy(), rows["price"].to_numpy(dtype=float)
+            if ticket not in self.stocks:
+                first = rows.iloc[0]
+                price = None if pd.isna(first["price"]) else float(first["price"])
+                self._add_holding(ticket, Stock(ticket, int(first["qty"]), price, first["date"].strftime("%Y-%m-%d"), lazy=True))
+                self._apply(ticket, int(first["qty"]), price * int(first["qty"]) if price else 0)
+                rows, quantities, prices = rows.iloc[1:], quantities[1:], prices[1:]
+            self.stocks[ticket].add_purchases(rows["day"].to_numpy(), quantities, prices)
+            self._apply(ticket, int(quantities.sum()), float(np.nansum(prices * quantities)))
+
+    def _log(self, event: str, **fields):
+        if self.journal is not None:
+            self._log_fills()
+            self.journal.record(self, {"type": event, **fields})
+
+    def _log_fills(self):
+        # compras gravadas sem preco e precificadas no resolve(): o preco vai para o diario antes
+        # do proximo evento, para a carga nao usar a cotacao do dia em que o diario for lido
+        if self.journal is None:
+            return  # ficam guardados ate a carteira ter um diario (ex.: durante a carga)
+        for ticket, stock in self.stocks.items():
+            # a compra que o add_stock esta validando vai com o preco no proprio BUY
+            filled, stock.filled = [purchase for purchase in stock.filled if purchase != self._unlogged], []
+            for purchase in filled:
+                if not stock.purchases.holds(purchase):
+                    continue
+                date, position = stock.purchases.lot_key(purchase)
+                self.journal.record(
+                    self, {"type": "PRICE", "ticket": ticket, "lot": [date, position], "price": purchase.price}
+                )
 
-        elif n_stocks == stock_quantity:
-            self.total_value -= self.stocks[stock].current_value * stock_quantity
-            self.total_spent -= self.stocks[stock].total_spent
-            del self.stocks[stock]
+    def _restore_fill(self, ticket: str, purchase, price: float):
+        # preco de uma compra sem preco como foi resolvido quando o diario foi gravado
+        if purchase.price is not None:
+            return
+        holding = self.stocks[ticket]
+        purchase.price = price
+        holding.total_spent += price * purchase.quantity
+        self._apply(ticket, 0, price * purchase.quantity)
+
+    def _apply(self, ticket: str, quantity: int, spent: float):
+        # soma (ou subtrai, com valores negativos) uma compra/venda nos totais, sem acessar a rede
+        self.tickets_count += quantity
+        self.total_spent += spent
+        self.total_value += self.last_prices.get(ticket, 0) * quantity
+
+    def _reprice(self, ticket: str, price: float):
+        # troca o preco de um ticket em total_value
+        if pd.isna(price):
+            return
+        self.total_value += (price - self.last_prices.get(ticket, 0)) * self.stocks[ticket].quantity
+        self.last_prices[ticket] = price
 
-        else:
-            raise ValueError("Attempting to remove more shares than are available in your wallet.")
+    def _drop(self, ticket: str):
+        del self.stocks[ticket]
+        self.last_prices.pop(ticket, None)
+        self.total_quantity -= 1
 
     def clear(self):
         self.stocks.clear()
+        self.realized.clear()
+        self._touch()
+        self._log("CLEAR")
+        self.last_prices.clear()
+        self.total_value = 0
+        self.total_spent = 0
+        self.total_quantity = 0
+        self.tickets_count = 0
 
     def generate_report(self):
         # usar stock info pra add % de cada setor etc
         # https://www.geeksforgeeks.org/what-is-yfinance-library/
-        self.update_wallet_status()
+        # usa os totais mantidos pela carteira; precos so mudam em update_wallet_status()
+        self.resolve()
 
         print(f"Total shares: {self.total_quantity}")
         print(f"Number of tickers: {self.tickets_count}")
         print(f"Total spent: ${self.total_spent:.2f}")
         print(f"Current total value: ${self.total_value:.2f}")
         print(f"Portfolio gain: {self.total_gain:.2f}%")
+        print(f"Realized gain: ${self.realized_gain:.2f}")
+        print(f"Unrealized gain: ${self.unrealized_gain:.2f}")
 
-    def update_wallet_status(self):
+    def resolve(self):
+        """
+        Resolves every purchase recorded lazily: downloads the history of all
+        pending tickets in one batched request, then validates each stock
+        from the cache. Invalid purchases are dropped and their errors kept
+        in `self.resolve_errors` (a stock left without purchases is removed).
+        A ticker whose history cannot be fetched keeps its purchases pending
+        and its error is kept there too; the other tickers go on.
+        """
+        pending = {ticket: stock for ticket, stock in self.stocks.items() if stock.pending}
+        if not pending:
+            return self.resolve_errors
+
+        oldest_day = min(purchase.day for stock in pending.values() for purchase in stock.pending)
+        oldest_date = pd.Timestamp.fromordinal(oldest_day).strftime("%Y-%m-%d")
+        get_shared_api().get_histories(pending.keys(), oldest_date)  # um download para todos
+
+        for ticket, stock in pending.items():
+            quantity, spent = stock.quantity, stock.total_spent
+            first_pending = pd.Timestamp.fromordinal(min(purchase.day for purchase in stock.pending)).strftime("%Y-%m-%d")
+            try:
+                stock.resolve()
+            except (ValueError,) + FETCH_ERRORS as e:
+                self.resolve_errors[ticket] = e
+            # compras invalidas saem e compras sem preco ganham um custo
+            self._apply(ticket, stock.quantity - quantity, stock.total_spent - spent)
+            if stock.quantity != quantity:
+                self._touch(first_pending)
+            elif stock.total_spent != spent:
+                self._frame = None  # compras que ganharam preco mudam so o custo
+            if not stock.purchases:
+                self._drop(ticket)
+            elif not stock.pending:
+                try:
+                    stock.update_stock_status()  # servido pelo cache preenchido acima
+                    self._reprice(ticket, stock.current_value)
+                except (ValueError,) + FETCH_ERRORS as e:
+                    self.resolve_errors[ticket] = e
+        self._log_fills()
+        return self.resolve_errors
+
+    def update_wallet_status(self, concurrent: bool = True, max_workers: int = None):
+        """
+        Refreshes the price of every stock and recomputes the wallet totals.
+        This is the only step that refreshes prices: buying and selling
+        update the totals incrementally with the prices of the last refresh.
+
+        With `concurrent` the stocks are refreshed in parallel by a bounded
+        thread pool (at most `max_workers`, defaults to the shared api's
+        max_connections). A ticker that fails keeps its previous values and
+        its exception is stored in `self.refresh_errors` instead of aborting
+        the refresh of the others.
+        """
         # Atualiza valor atual e valor gasto da carteira
-        for stock in self.stocks.values():
-            stock.update_stock_status()
-
+        self.resolve()
+        self.refresh_errors = {}
+        stocks = list(self.stocks.items())
+
+        if concurrent and len(stocks) > 1:
+            if max_workers is None:
+                max_workers = get_shared_api().max_connections
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(stocks))) as executor:
+                futures = {
+                    executor.submit(stock.update_stock_status): ticket for ticket, stock in stocks
+                }
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self.refresh_errors[futures[future]] = e
+        else:
+            for ticket, stock in stocks:
+                try:
+                    stock.update_stock_status()
+                except Exception as e:
+                    self.refresh_errors[ticket] = e
+
+        # recalcula os totais do zero, corrigindo qualquer desvio acumulado
+        previous, self.last_prices = self.last_prices, {}
+        for ticket, stock in self.stocks.items():
+            price = stock.current_value
+            # ticker ainda sem historico (compras pendentes): fica com o preco anterior
+            self.last_prices[ticket] = previous.get(ticket, 0) if pd.isna(price) else price
         self.total_value = sum(
-            stock.current_value * stock.quantity for stock in self.stocks.values()
+            self.last_prices[ticket] * stock.quantity for ticket, stock in self.stocks.items()
         )
         self.total_spent = sum(stock.total_spent for stock in self.stocks.values())
         self.total_quantity = len(self.stocks)
         self.tickets_count = sum(stock.quantity for stock in self.stocks.values())
 
-        # Valorização = ((valor_atual - valor_gasto) / valor_gasto) * 100
-        if self.total_spent > 0:
-            self.total_gain = (
-                (self.total_value - self.total_spent) / self.total_spent
-            ) * 100  # Em porcentagem
-        else:
-            self.total_gain = 0.0
-
     def print_stock_details(self):
-        self.update_wallet_status()
+        self.resolve()
         for ticket, stock in self.stocks.items():
             print(f"Ticket: {ticket}")
             print(f"  Total quantity: {stock.quantity}")
@@ -113,41 +454,56 @@ class Wallet:
                 )
     
     def to_dataframe(self):
-        data = []
-        for ticket, acao in self.stocks.items():
-            preco_medio = acao.total_spent / acao.quantity if acao.quantity > 0 else 0
-            valorizacao = (
-                ((acao.current_price * acao.quantity - acao.total_spent) / acao.total_spent) * 100
-                if acao.total_spent > 0 else 0
-            )
-            data.append({
-                "Ticket": ticket,
-                # "Setor": acao.sector,
-                "Quantidade": acao.quantity,
-                "Preço Médio": preco_medio,
-                "Preço Atual": acao.current_price,
-                "Valor Atual": acao.current_price * acao.quantity,
-                "Valor Gasto": acao.total_spent,
-                "Valorização (%)": valorizacao,
-                # "Data Compra(s)": list(acao.purchases.keys()),
-            })
-
-        df = pd.DataFrame(data)
-        return df
+        """
+        Returns one row per stock (quantity, average and current price,
+        value, amount spent and gain). The frame is cached and only rebuilt
+        after a purchase, a sale or a price update, so treat it as read-only.
+        """
+        self.resolve()
+        prices = get_shared_api().prices
+        # so os precos dos tickets da carteira invalidam o frame, nao cargas de outros tickets
+        key = (self.version, tuple(prices.versions(self.stocks).values()))
+        if self._frame is None or self._frame_key != key:
+            self._frame = self._build_dataframe(prices)
+            self._frame_key = key
+        return self._frame
+
+    def _build_dataframe(self, prices):
+        # monta coluna a coluna com arrays, em vez de um dicionario por linha
+        tickets = list(self.stocks)
+        quantity = np.array([stock.quantity for stock in self.stocks.values()], dtype=np.int64)
+        spent = np.array([stock.total_spent for stock in self.stocks.values()], dtype=float)
+        current_price = prices.latest_many(tickets, "Open")
+        current_value = current_price * quantity
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            preco_medio = np.where(quantity > 0, spent / quantity, 0)
+            valorizacao = np.where(spent > 0, (current_value - spent) / spent * 100, 0)
+
+        return pd.DataFrame({
+            "Ticket": tickets,
+            # "Setor": acao.sector,
+            "Quantidade": quantity,
+            "Preço Médio": preco_medio,
+            "Preço Atual": current_price,
+            "Valor Atual": current_value,
+            "Valor Gasto": spent,
+            "Valorização (%)": valorizacao,
+            # "Data Compra(s)": list(acao.purchases.keys()),
+        })
     
     def get_performance_history(self, days=None):
         """
         Retorna uma Series com o valor total da carteira para cada dia útil dos últimos `days` dias,
         considerando a data de aquisição de cada ação.
         """
-        min_purchase_date = None
-        for stock in self.stocks.values():
-            for purchase_date in stock.purchases.keys():
-                pd_date = pd.to_datetime(purchase_date)
-                if min_purchase_date is None or pd_date < min_purchase_date:
-                    min_purchase_date = pd_date
+        self.resolve()
+        tickets = list(self.stocks)
+        lots = [self.stocks[ticket].purchases.lots() for ticket in tickets]  # (dias, quantidades)
+        first_day = min((int(days.min()) for days, _ in lots if len(days)), default=None)
+        min_purchase_date = pd.Timestamp.fromordinal(first_day) if first_day is not None else None
 
-        end_date = pd.to_datetime("today")
+        end_date = pd.Timestamp("today").normalize()
         
         # If no purchases found and no days specified, return empty Series
         if min_purchase_date is None and days is None:
@@ -161,37 +517,269 @@ class Wallet:
                 # Ensure we have at least N days of history
                 start_date = min(start_date, end_date - pd.Timedelta(days=days))
 
-        date_range = pd.date_range(start=start_date, end=end_date, freq="B")
         if not self.stocks:
             # Carteira vazia: retorna série zerada
+            date_range = pd.date_range(start=start_date, end=end_date, freq="B")
             return pd.Series([0]*len(date_range), index=date_range)
 
-        df = pd.DataFrame(index=date_range)
+        # so recalcula os dias afetados por compras/vendas ou por precos recarregados
+        # desde a ultima chamada e os dias novos
+        prices = get_shared_api().prices
+        changed = prices.changed_since(self.value_history.price_versions)
+        if changed is not None:
+            self.value_history.invalidate(changed)
+        since = self.value_history.stale_from(start_date, end_date, self.version)
+        if since is not None:
+            values = self._value_series(tickets, lots, since, end_date)
+            self.value_history.store(values, since, start_date, end_date, self.version, prices.versions(tickets))
+
+        series = self.value_history.series
+        # Se não há nenhum valor (nenhum ativo válido), retorna zeros
+        if series.sum() == 0:
+            return pd.Series([0]*len(series), index=series.index)
+        return series.copy()
+
+    def get_holdings_history(self, days: int = 365):
+        """
+        Daily value, over the last `days` days, of the shares held today.
+        Unlike get_performance_history the buys and sells of the period are
+        left out, so the changes of the series are returns only.
+        """
+        self.resolve()
+        tickets = [ticket for ticket, stock in self.stocks.items() if stock.quantity]
+        end_date = pd.Timestamp("today").normalize()
+        start_date = end_date - pd.Timedelta(days=days)
+        if not tickets:
+            return pd.Series(dtype=float, name=self.name)
+
+        date_range, closes = _daily_closes(tickets, start_date, end_date)
+        quantities = np.array([self.stocks[ticket].quantity for ticket in tickets])
+        return pd.Series(np.nansum(closes * quantities, axis=1), index=date_range, name=self.name)
+
+    def get_risk_metrics(self, days: int = 365, benchmark: str = None, risk_free: float = 0.0):
+        """
+        Risk metrics of the current holdings over the last `days` days (see
+        analytics.risk_metrics); beta and alpha are measured against the
+        `benchmark` ticker, when given.
+        """
+        values = self.get_holdings_history(days)
+        benchmark_closes = get_benchmark_closes(benchmark, values.index[0]) if benchmark and not values.empty else None
+        return analytics.risk_metrics(values, benchmark_closes, risk_free)
 
-        for ticket, stock in self.stocks.items():
-            hist = stock.api.get_history(ticket, start_date.strftime("%Y-%m-%d"))
-            if hist.empty or "Close" not in hist.columns:
-                continue
+    def get_benchmark_history(self, benchmark: str, days=None):
+        """
+        Value over time of buying `benchmark` with the same amounts, on the
+        same dates, as the purchases still held, on the days of
+        get_performance_history(days). Purchases made on a day without
+        trading buy at the close of the next trading day.
+        """
+        history = self.get_performance_history(days)
+        if history.empty or not self.stocks:
+            return pd.Series(dtype=float, name=benchmark)
+
+        # valor pago em cada lote, de todos os ativos
+        lot_days = np.concatenate([stock.purchases.lots()[0] for stock in self.stocks.values()])
+        amounts = np.nan_to_num(np.concatenate([stock.purchases.costs() for stock in self.stocks.values()]))
+        start_date = min(history.index[0], pd.Timestamp.fromordinal(int(lot_days.min())))
+        closes = get_benchmark_closes(benchmark, start_date).dropna()
+        closes = closes[closes > 0]
+        if closes.empty:
+            return pd.Series(np.nan, index=history.index, name=benchmark)
+
+        # cada compra vai para o primeiro pregao na data dela ou depois
+        trading_days = closes.index.values.astype("datetime64[D]").astype(np.int64) + UNIX_EPOCH_ORDINAL
+        positions = np.searchsorted(trading_days, lot_days)
+        traded = positions < len(trading_days)
+        positions = positions[traded]
+        shares = amounts[traded] / closes.to_numpy()[positions]
+
+        # cotas compradas em cada dia da serie, acumuladas com uma soma
+        range_days = history.index.values.astype("datetime64[D]").astype(np.int64) + UNIX_EPOCH_ORDINAL
+        rows = np.searchsorted(range_days, trading_days[positions])
+        inside = rows < len(range_days)
+        bought = np.zeros(len(range_days))
+        np.add.at(bought, rows[inside], shares[inside])
+
+        prices = closes.reindex(closes.index.union(history.index)).ffill().reindex(history.index).to_numpy()
+        return pd.Series(np.cumsum(bought) * prices, index=history.index, name=benchmark)
+
+    def get_cash_flows(self):
+        """
+        Every cash flow of the wallet: the cost of each lot held (negative, on
+        its purchase date), the cost of each lot sold and the proceeds of each
+        sale (see RealizedLedger.cash_flows) and, today, the value of each holding at
+        the prices of the last refresh.
 
-            hist.index = hist.index.tz_localize(None) if hist.index.tzinfo else hist.index
-            hist.index = hist.index.normalize()
-            hist = hist.reindex(df.index).ffill()
+        Returns:
+            tuple: (tickets, day ordinals, amounts)
+        """
+        self.resolve()
+        tickets, days, amounts = self.realized.cash_flows()
+        days, amounts = [days], [amounts]
+        today = pd.Timestamp("today").toordinal()
+        for ticket, stock in self.stocks.items():
+            lot_days, _ = stock.purchases.lots()
+            price = self.last_prices.get(ticket, stock.current_value)
+            tickets = tickets + [ticket] * (len(lot_days) + 1)
+            days += [lot_days, [today]]
+            amounts += [-np.nan_to_num(stock.purchases.costs()), [price * stock.quantity]]
+        return tickets, np.concatenate(days).astype(np.int64), np.concatenate(amounts)
+
+    def get_money_weighted_returns(self):
+        """
+        Money-weighted return (XIRR, annual rate) of each ticket held or sold
+        and of the whole wallet ("Total"), from get_cash_flows(), solved in
+        one batch.
+        """
+        tickets, days, amounts = self.get_cash_flows()
+        groups = tickets + ["Total"] * len(tickets)
+        return analytics.xirr_by_group(groups, np.concatenate([days, days]), np.concatenate([amounts, amounts]))
 
-            qty_series = pd.Series(0, index=df.index)
-            for purchase_date, purchase in stock.purchases.items():
-                purchase_date = pd.to_datetime(purchase_date)
-                qty_series.loc[qty_series.index >= purchase_date] += purchase.quantity
+    def get_time_weighted_return(self, days=None):
+        """
+        Cumulative time-weighted return over get_performance_history(days):
+        the value each purchase adds on its day is treated as a deposit, so
+        only price changes count as return.
+        """
+        history = self.get_performance_history(days)
+        if history.empty or not self.stocks:
+            return 0.0
+        tickets = list(self.stocks)
+        lots = [self.stocks[ticket].purchases.lots() for ticket in tickets]
+        date_range, closes = _daily_closes(tickets, history.index[0], history.index[-1])
+        flows = np.nansum(closes * _lot_matrix(date_range, lots), axis=1)  # valor que entrou em cada dia
+        return float(analytics.time_weighted_return(history.to_numpy(dtype=float), flows))
+
+    def get_holding_weights(self):
+        """Share of the wallet value in each ticket held, at the prices of the last refresh (pd.Series)."""
+        self.resolve()
+        values = pd.Series(
+            {ticket: self.last_prices.get(ticket, stock.current_value) * stock.quantity for ticket, stock in self.stocks.items()},
+            dtype=float,
+        )
+        values = values[values > 0]
+        return values / values.sum() if not values.empty else values
 
-            df[ticket] = hist["Close"] * qty_series
+    def get_correlation(self):
+        """
+        Correlation matrix of the daily returns of the tickets held, read from
+        the shared CovarianceEngine (brought up to date first).
+        """
+        tickets = list(self.get_holding_weights().index)
+        engine = get_covariance_engine()
+        engine.sync(tickets)
+        return engine.correlation(tickets)
 
-        # Se não há nenhuma coluna (nenhum ativo válido), retorna zeros
-        if df.empty or df.sum(axis=1).sum() == 0:
-            return pd.Series([0]*len(date_range), index=date_range)
+    def get_diversification(self):
+        """
+        Diversification of the current holdings, from the shared CovarianceEngine.
 
-        df["Total"] = df.sum(axis=1, skipna=True)
-        # Se todos os valores são zero até a data da primeira compra, mas depois há valores, mantém a série
-        if df["Total"].sum() == 0:
-            cutoff_date = end_date - pd.Timedelta(days=days)
-            return df["Total"].loc[df.index >= cutoff_date]
-        return df["Total"]
+        Returns:
+            pd.Series: "Volatility" (annualized, of the whole wallet),
+            "Diversification Ratio" (see CovarianceEngine.diversification_ratio)
+            and "Average Correlation" (between the holdings, weighted by value).
+        """
+        weights = self.get_holding_weights()
+        result = pd.Series(np.nan, index=["Volatility", "Diversification Ratio", "Average Correlation"], name=self.name)
+        if weights.empty:
+            return result
+        engine = get_covariance_engine()
+        engine.sync(list(weights.index))
+        result["Volatility"] = np.sqrt(engine.portfolio_variance(weights, analytics.TRADING_DAYS))
+        result["Diversification Ratio"] = engine.diversification_ratio(weights)
+        if len(weights) > 1:
+            # media dos pares (i != j) ponderada pelo peso dos dois ativos
+            pairs = np.outer(weights, weights)
+            np.fill_diagonal(pairs, 0)
+            correlation = engine.correlation(list(weights.index)).to_numpy()
+            valid = ~np.isnan(correlation)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result["Average Correlation"] = (np.where(valid, correlation, 0) * pairs).sum() / (pairs * valid).sum()
+        return result
+
+    def _value_series(self, tickets, lots, start_date, end_date):
+        date_range, closes = _daily_closes(tickets, start_date, end_date)
+        holdings = np.cumsum(_lot_matrix(date_range, lots), axis=0)
+        return pd.Series(np.nansum(closes * holdings, axis=1), index=date_range, name="Total")
+
+
+def get_benchmark_closes(benchmark: str, start_date: pd.Timestamp):
+    """Closing prices of the `benchmark` ticker since `start_date`, indexed by day (from the benchmark service)."""
+    return get_benchmark_service().closes(benchmark, start_date)
+
+
+def _daily_closes(tickets, start_date, end_date):
+    """Closing prices (business days x tickets) from `start_date` to `end_date`, carried over holidays."""
+    date_range = pd.date_range(start=start_date, end=end_date, freq="B")
+
+    # baixa o fechamento de todos os ativos de uma vez (dias x tickets), com
+    # alguns dias antes do inicio para preencher feriados no primeiro dia
+    lookback = (start_date - pd.Timedelta(days=LOOKBACK_DAYS)).strftime("%Y-%m-%d")
+    closes = get_shared_api().get_histories(tickets, lookback)
+    closes.index = closes.index.normalize()
+    closes = closes.reindex(index=closes.index.union(date_range), columns=tickets).ffill()
+    return date_range, closes.reindex(date_range).to_numpy()
+
+
+def _lot_matrix(date_range, lots):
+    """
+    Shares bought on each day of `date_range` (days x tickets), given the
+    (day ordinals, quantities) of the lots of each ticket. Lots bought before
+    the range are counted on its first day.
+    """
+    # a soma acumulada (cumsum) desta matriz da a quantidade de cada ativo em cada dia
+    range_days = date_range.values.astype("datetime64[D]").astype(np.int64) + UNIX_EPOCH_ORDINAL
+    bought = np.zeros((len(date_range), len(lots)))
+    for column, (lot_days, quantities) in enumerate(lots):
+        rows = np.searchsorted(range_days, lot_days)
+        inside = rows < len(range_days)
+        np.add.at(bought[:, column], rows[inside], quantities[inside])
+    return bought
+
+
+def _read_transactions(source):
+    """
+    Loads `source` (CSV path, DataFrame or iterable of rows) into a DataFrame
+    with TRANSACTION_COLUMNS, validated and sorted by date.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        transactions = pd.read_csv(source)
+    elif isinstance(source, pd.DataFrame):
+        transactions = source.copy()
+    else:
+        rows = list(source)
+        if rows and not isinstance(rows[0], dict):
+            rows = pd.DataFrame(rows, columns=TRANSACTION_COLUMNS[:len(rows[0])])
+        transactions = pd.DataFrame(rows)
+
+    transactions.columns = [str(column).strip().lower() for column in transactions.columns]
+    transactions = transactions.rename(columns={"ticket": "ticker", "quantity": "qty"})
+    if "side" not in transactions.columns:
+        transactions["side"] = "BUY"
+    if "price" not in transactions.columns:
+        transactions["price"] = np.nan
+    missing = [column for column in TRANSACTION_COLUMNS if column not in transactions.columns]
+    if missing:
+        raise ValueError(f"Missing transaction columns: {', '.join(missing)}")
+    transactions = transactions[TRANSACTION_COLUMNS]
+
+    # valida todas as linhas de uma vez e informa as primeiras invalidas
+    transactions["ticker"] = transactions["ticker"].astype(str).str.strip().str.upper()
+    transactions["side"] = transactions["side"].fillna("BUY").astype(str).str.strip().str.upper()
+    transactions["date"] = pd.to_datetime(transactions["date"], format="%Y-%m-%d", errors="coerce")
+    transactions["price"] = pd.to_numeric(transactions["price"], errors="coerce")
+    qty = pd.to_numeric(transactions["qty"], errors="coerce")
+    invalid = (
+        transactions["date"].isna()
+        | qty.isna() | (qty <= 0) | (qty != qty.round())
+        | ~transactions["side"].isin(["BUY", "SELL"])
+        | (transactions["price"] < 0)
+        | transactions["ticker"].isin(["", "NAN", "NONE"])
+    )
+    if invalid.any():
+        rows = ", ".join(str(index) for index in transactions.index[invalid][:10])
+        raise ValueError(f"Invalid transactions at rows: {rows}")
+    transactions["qty"] = qty.astype(np.int64)
+
+    return transactions.sort_values("date", kind="stable").reset_index(drop=True)
 
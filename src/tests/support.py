@@ -0,0 +1,43 @@
+import tempfile
+import unittest
+
+from stocktracker.providers import ReplayProvider
+from stocktracker.stockAPI import StockAPI, configure_shared_api, set_shared_api
+
+REPLAY_TODAY = "2024-06-28"  # ultimo dia dos dados sinteticos usados na maioria dos testes
+
+
+class SharedAPITestCase(unittest.TestCase):
+    """
+    Base dos testes que usam a StockAPI compartilhada sem rede: dados
+    sinteticos do ReplayProvider ate REPLAY_TODAY e cache num diretorio
+    temporario. A api fica em `self.api` e e instalada como compartilhada;
+    no fim a compartilhada volta a ser criada sob demanda.
+    """
+
+    api_options = {}  # argumentos extras da StockAPI (ex.: memory_ttl=0)
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self._apis = []
+        self.api = self.make_api(cache_dir=self.tmpdir.name)
+        set_shared_api(self.api)
+
+    def tearDown(self):
+        for api in self._apis:
+            api.store.close()
+        configure_shared_api()
+        self.tmpdir.cleanup()
+
+    def make_api(self, today: str = REPLAY_TODAY, cache_dir: str = None):
+        """A new StockAPI over replayed data up to `today` (None: up to the real date), with its own cache."""
+        cache_dir = cache_dir or tempfile.mkdtemp(dir=self.tmpdir.name)
+        api = StockAPI(ReplayProvider(today=today), cache_dir=cache_dir, **self.api_options)
+        self._apis.append(api)
+        return api
+
+    def use_api(self, today: str = REPLAY_TODAY):
+        """Replaces `self.api` and the shared api by make_api(today); e.g. windows that end on the real date."""
+        self.api = self.make_api(today)
+        set_shared_api(self.api)
+        return self.api
@@ -0,0 +1,101 @@
+import unittest
+import numpy as np
+import pandas as pd
+from stocktracker import analytics
+
+
+class TestAnalytics(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.benchmark = 100 * np.cumprod(1 + rng.normal(0.0004, 0.01, 500))
+        noise = rng.normal(0, 0.005, 499)
+        # carteira com beta 1.5 em relacao ao benchmark, mais um ruido
+        returns = 1.5 * analytics.to_returns(self.benchmark) + noise
+        self.values = 1000 * np.concatenate([[1], np.cumprod(1 + returns)])
+        self.returns = analytics.to_returns(self.values)
+
+    def test_volatility_and_ratios(self):
+        expected = np.std(self.returns, ddof=1) * np.sqrt(252)
+        self.assertAlmostEqual(analytics.annualized_volatility(self.returns), expected)
+        sharpe = self.returns.mean() / np.std(self.returns, ddof=1) * np.sqrt(252)
+        self.assertAlmostEqual(analytics.sharpe_ratio(self.returns), sharpe)
+        downside = np.sqrt(np.mean(np.minimum(self.returns, 0) ** 2))
+        self.assertAlmostEqual(analytics.sortino_ratio(self.returns), self.returns.mean() / downside * np.sqrt(252))
+
+    def test_max_drawdown(self):
+        drawdown, duration = analytics.max_drawdown([100, 120, 90, 60, 110, 130, 125])
+        self.assertAlmostEqual(drawdown, 60 / 120 - 1)
+        self.assertEqual(duration, 3)
+
+    def test_beta_alpha(self):
+        beta, alpha = analytics.beta_alpha(self.returns, analytics.to_returns(self.benchmark))
+        self.assertAlmostEqual(beta, 1.5, delta=0.1)
+        self.assertTrue(np.isfinite(alpha))
+
+    def test_value_at_risk(self):
+        returns = np.linspace(-0.10, 0.09, 20)
+        var, cvar = analytics.value_at_risk(returns, level=0.90)
+        self.assertAlmostEqual(var, -np.quantile(returns, 0.10))
+        self.assertAlmostEqual(cvar, -returns[:2].mean())
+
+    def test_portfolio_returns(self):
+        returns = np.array([[0.01, 0.03], [np.nan, -0.02]])
+        np.testing.assert_allclose(analytics.portfolio_returns(returns, [1, 3]), [0.025, -0.015])
+
+    def test_columns_match_single_series(self):
+        index = pd.bdate_range("2023-01-02", periods=500)
+        frame = pd.DataFrame({"A": self.values, "B": self.benchmark, "Empty": 0.0}, index=index)
+        benchmark = pd.Series(self.benchmark, index=index)
+
+        table = analytics.risk_metrics(frame, benchmark)
+        single = analytics.risk_metrics(frame["A"], benchmark)
+
+        self.assertEqual(list(table.columns), analytics.METRICS)
+        pd.testing.assert_series_equal(table.loc["A"], single.rename("A"))
+        self.assertAlmostEqual(table.loc["B", "Beta"], 1.0)
+        self.assertTrue(table.loc["Empty", ["Volatility", "Sharpe", "Beta"]].isna().all())
+
+    def test_leading_zeros_are_ignored(self):
+        values = pd.Series([0, 0, 100, 110, 99], index=pd.bdate_range("2024-01-01", periods=5))
+        metrics = analytics.risk_metrics(values)
+        self.assertAlmostEqual(metrics["Max Drawdown"], 99 / 110 - 1)
+        self.assertAlmostEqual(metrics["Volatility"], np.std([0.10, -0.10], ddof=1) * np.sqrt(252))
+
+    def test_time_weighted_return_ignores_deposits(self):
+        # dobra o valor no dia 2 com um aporte de 100: so a variacao de preco conta
+        values = np.array([100.0, 110.0, 220.0, 242.0])
+        flows = np.array([0.0, 0.0, 110.0, 0.0])
+        self.assertAlmostEqual(analytics.time_weighted_return(values, flows), 1.1 * 1.0 * 1.1 - 1)
+
+    def test_xirr(self):
+        self.assertAlmostEqual(analytics.xirr([-100, 110], [0, 365]), 0.10)
+
+        amounts = [[-100, 110, 0], [-100, -100, 250], [-100, 0, 0], [100, 50, 0]]
+        days = [[0, 365, 0], [0, 365, 730], [0, 0, 0], [0, 10, 0]]
+        rates = analytics.xirr(amounts, days)
+        npv = -100 - 100 / (1 + rates[1]) + 250 / (1 + rates[1]) ** 2
+        self.assertAlmostEqual(rates[0], 0.10)
+        self.assertAlmostEqual(npv, 0, places=6)
+        self.assertTrue(np.isnan(rates[2:]).all())
+
+    def test_xirr_many_series(self):
+        rng = np.random.default_rng(3)
+        amounts = -rng.uniform(10, 100, (2000, 12))
+        amounts[:, -1] = -amounts[:, :-1].sum(axis=1) * rng.uniform(0.5, 2.0, 2000)
+        days = np.sort(rng.integers(0, 1500, (2000, 12)), axis=1)
+
+        rates = analytics.xirr(amounts, days)
+        years = (days - days[:, :1]) / 365.0
+        npv = (amounts * (1 + rates[:, None]) ** -years).sum(axis=1)
+        self.assertFalse(np.isnan(rates).any())
+        self.assertTrue((np.abs(npv) <= 1e-6 * np.abs(amounts).sum(axis=1)).all())
+
+    def test_xirr_by_group(self):
+        rates = analytics.xirr_by_group(["A", "B", "A", "B", "B"], [0, 0, 365, 365, 730], [-100, -100, 110, -100, 250])
+        self.assertEqual(list(rates.index), ["A", "B"])
+        self.assertAlmostEqual(rates["A"], 0.10)
+        self.assertAlmostEqual(rates["B"], analytics.xirr([-100, -100, 250], [0, 365, 730]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import pandas as pd
+from stocktracker.benchmarks import BENCHMARKS, BenchmarkService, get_benchmark_service
+from stocktracker.stockAPI import set_shared_api
+from tests.support import SharedAPITestCase
+
+
+class TestBenchmarkService(SharedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.service = BenchmarkService(self.api, start_date="2024-01-02")
+
+    def tearDown(self):
+        self.service.stop()
+        super().tearDown()
+
+    def test_switching_benchmarks_is_served_from_memory(self):
+        self.service.refresh()
+        self.assertEqual(self.api.network_calls, 1)
+
+        for ticket in BENCHMARKS:
+            closes = self.service.closes(ticket, "2024-03-01")
+            self.assertEqual(closes.index[0], pd.Timestamp("2024-03-01"))
+            self.assertEqual(closes.index[-1], pd.Timestamp("2024-06-28"))
+        self.assertEqual(self.api.network_calls, 1)
+
+    def test_new_ticket_and_older_dates_are_loaded_once(self):
+        self.service.refresh()
+        closes = self.service.closes("^BVSP", "2023-06-01")
+
+        self.assertEqual(self.api.network_calls, 2)
+        self.assertEqual(closes.index[0], pd.Timestamp("2023-06-01"))
+        self.assertIn("^BVSP", self.service.tickets)
+        self.assertEqual(self.service.start_date, "2023-06-01")
+        self.service.closes("^BVSP", "2024-01-02")
+        self.assertEqual(self.api.network_calls, 2)
+
+    def test_aligned_and_normalized(self):
+        index = pd.date_range("2024-05-25", "2024-06-05", freq="D")
+        aligned = self.service.aligned("^GSPC", index, base=100)
+
+        self.assertTrue(aligned.index.equals(index))
+        self.assertAlmostEqual(aligned.iloc[0], 100)
+        # fim de semana repete o fechamento de sexta
+        self.assertEqual(aligned.loc["2024-06-01"], aligned.loc["2024-05-31"])
+
+    def test_background_refresh(self):
+        self.service.refresh_interval = 0.01
+        self.service.start()
+        for _ in range(200):
+            if self.service.refreshed_at is not None:
+                break
+            self.service._stop.wait(0.01)
+        self.service.stop()
+
+        self.assertIsNotNone(self.service.refreshed_at)
+        self.assertFalse(self.service.closes("^DJI").empty)
+
+    def test_shared_service_follows_the_shared_api(self):
+        service = get_benchmark_service()
+        self.assertIs(service.api, self.api)
+        self.assertIs(get_benchmark_service(), service)
+
+        other = self.make_api()
+        set_shared_api(other)
+        self.assertIs(get_benchmark_service().api, other)
+
+
+if __name__ == "__main__":
+    unittest.main()
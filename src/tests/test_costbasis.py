@@ -0,0 +1,104 @@
+import unittest
+from datetime import date
+from stocktracker.costbasis import RealizedLedger, get_method
+from stocktracker.lotledger import LotLedger
+from stocktracker.purchase import Purchase
+
+
+class TestCostBasis(unittest.TestCase):
+    def setUp(self):
+        self.ledger = LotLedger(
+            [Purchase("2023-01-01", 100, 2), Purchase("2023-02-01", 110, 3), Purchase("2023-03-01", 120, 5)]
+        )
+
+    def quantities(self):
+        return [(lot.date, lot.quantity) for lot in self.ledger.values()]
+
+    def test_fifo(self):
+        self.assertEqual(get_method("fifo").match(self.ledger, 4), (4, 2 * 100 + 2 * 110))
+        self.assertEqual(self.quantities(), [("2023-02-01", 1), ("2023-03-01", 5)])
+        # dia medio das compras vendidas, ponderado pelo custo
+        january, february = date(2023, 1, 1).toordinal(), date(2023, 2, 1).toordinal()
+        self.assertEqual(self.ledger.last_acquired_day, round((200 * january + 220 * february) / 420))
+
+    def test_lifo(self):
+        self.assertEqual(get_method("lifo").match(self.ledger, 7), (7, 5 * 120 + 2 * 110))
+        self.assertEqual(self.quantities(), [("2023-01-01", 2), ("2023-02-01", 1)])
+
+    def test_lifo_after_insert_in_the_middle(self):
+        self.ledger.insert("2023-02-15", 130, 1)
+        self.assertEqual(get_method("lifo").match(self.ledger, 6), (6, 5 * 120 + 130))
+        self.assertEqual(self.ledger.total_quantity(), 5)
+
+    def test_average(self):
+        removed, cost = get_method("average").match(self.ledger, 4)
+
+        self.assertEqual(removed, 4)
+        self.assertAlmostEqual(cost, 4 * 113)
+        self.assertAlmostEqual(self.ledger.average_price(), 113)
+        self.assertEqual(self.quantities(), [("2023-02-01", 1), ("2023-03-01", 5)])
+        # os lotes guardam o preco pago; a diferenca para o custo medio fica a parte
+        self.assertEqual([lot.price for lot in self.ledger.values()], [110, 120])
+        self.assertEqual(self.ledger.costs().tolist(), [110, 600])
+        self.assertEqual(self.ledger.last_paid, 2 * 100 + 2 * 110)
+
+        removed, cost = get_method("average").match(self.ledger, 3)
+        self.assertAlmostEqual(cost, 3 * 113)
+        get_method("average").match(self.ledger, 3)
+        self.assertEqual(self.ledger.pool_adjustment, 0)
+
+    def test_specific_lots(self):
+        march, january = self.ledger["2023-03-01"], self.ledger["2023-01-01"]
+        removed, cost = get_method("specific").match(self.ledger, 6, [march, january])
+
+        self.assertEqual((removed, cost), (6, 5 * 120 + 100))
+        self.assertEqual(self.quantities(), [("2023-01-01", 1), ("2023-02-01", 3)])
+
+    def test_specific_lots_must_cover_the_sale(self):
+        with self.assertRaises(ValueError):
+            get_method("specific").match(self.ledger, 3, [self.ledger["2023-01-01"]])
+        with self.assertRaises(ValueError):
+            get_method("specific").match(self.ledger, 1)
+        self.assertEqual(self.ledger.total_quantity(), 10)
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            get_method("hifo")
+
+    def test_lot_keys(self):
+        second = self.ledger.insert("2023-02-01", 115, 4)
+        self.assertEqual(self.ledger.lot_key(second), ("2023-02-01", 1))
+        self.assertEqual(self.ledger.lot("2023-02-01", 1), second)
+
+
+class TestRealizedLedger(unittest.TestCase):
+    def test_totals_and_gains_per_ticket(self):
+        realized = RealizedLedger(capacity=1)
+        realized.record("AAPL", "2024-06-10", 4, 200.0, 720.0)
+        realized.record("MSFT", "2024-06-11", 1, 390.0, 400.0)
+        realized.record("AAPL", "2024-06-12", 2, 210.0, 360.0)
+
+        self.assertEqual(len(realized), 3)
+        self.assertAlmostEqual(realized.gain, (800 - 720) + (390 - 400) + (420 - 360))
+        self.assertEqual(realized.gains().to_dict(), {"AAPL": 140.0, "MSFT": -10.0})
+        self.assertEqual(realized.to_frame()["Gain"].tolist(), [80.0, -10.0, 60.0])
+        self.assertEqual(realized.entries()[2], {"ticket": "AAPL", "date": "2024-06-12", "quantity": 2, "price": 210.0, "cost": 360.0, "acquired": "2024-06-12", "paid": 360.0, "lots": [["2024-06-12", 360.0]]})
+
+    def test_cash_flows_per_lot_sold(self):
+        lots = LotLedger([Purchase("2023-01-02", 100, 2), Purchase("2023-06-01", 110, 3)])
+        removed, cost = get_method("fifo").match(lots, 4)
+        realized = RealizedLedger(capacity=1)
+        realized.record("MSFT", "2024-01-05", 1, 390.0, 400.0)
+        realized.record("AAPL", "2024-06-10", removed, 150.0, cost, paid=lots.last_paid, lots=lots.last_sold)
+
+        # cada lote vendido sai no dia da sua compra, nao num dia medio
+        tickets, days, amounts = realized.cash_flows()
+        self.assertEqual(tickets, ["MSFT", "AAPL", "AAPL", "MSFT", "AAPL"])
+        self.assertEqual([date.fromordinal(int(day)).isoformat() for day in days],
+                         ["2024-01-05", "2023-01-02", "2023-06-01", "2024-01-05", "2024-06-10"])
+        self.assertEqual(amounts.tolist(), [-400.0, -200.0, -220.0, 390.0, 600.0])
+        self.assertEqual(realized.entries()[1]["lots"], [["2023-01-02", 200.0], ["2023-06-01", 220.0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+import numpy as np
+import pandas as pd
+from stocktracker.covariance import CovarianceEngine, get_covariance_engine
+from tests.support import SharedAPITestCase
+
+
+def make_closes(days=80, seed=3):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range("2024-01-02", periods=days)
+    market = rng.normal(0, 0.01, days)
+    returns = np.column_stack([market + rng.normal(0, 0.01, days) * k for k in (0.5, 1, 2)])
+    closes = pd.DataFrame(100 * np.cumprod(1 + returns, axis=0), index=index, columns=["A", "B", "C"])
+    closes.iloc[:10, 2] = np.nan  # C so comeca a negociar depois
+    return closes
+
+
+class TestCovarianceEngine(unittest.TestCase):
+    def test_matches_full_recomputation(self):
+        closes = make_closes()
+        engine = CovarianceEngine(window=None)
+        engine.update_frame(closes)
+        returns = closes.pct_change(fill_method=None)
+
+        pd.testing.assert_frame_equal(engine.covariance(), returns.cov(), check_names=False)
+        pd.testing.assert_frame_equal(engine.correlation(), returns.corr(), check_names=False)
+
+    def test_rolling_window_subtracts_old_days(self):
+        closes = make_closes()
+        engine = CovarianceEngine(window=30)
+        engine.update_frame(closes.iloc[:50])
+        engine.update_frame(closes)  # so os dias novos sao somados
+        returns = closes.pct_change(fill_method=None).iloc[-30:]
+
+        np.testing.assert_allclose(engine.covariance().to_numpy(), returns.cov().to_numpy(), rtol=1e-8, atol=1e-12)
+        self.assertEqual(engine.last_date, closes.index[-1])
+
+    def test_revised_last_day_is_redone(self):
+        closes = make_closes()
+        provisional = closes.iloc[:50].copy()
+        provisional.iloc[-1] *= 1.05  # fechamento do dia ainda em andamento
+        for window, rows in ((None, slice(None)), (30, slice(-30, None))):
+            engine = CovarianceEngine(window=window)
+            engine.update_frame(provisional)
+            engine.update_frame(closes)
+            returns = closes.pct_change(fill_method=None).iloc[rows]
+
+            np.testing.assert_allclose(engine.covariance().to_numpy(), returns.cov().to_numpy(), rtol=1e-8, atol=1e-12)
+
+    def test_portfolio_variance_and_diversification(self):
+        closes = make_closes()
+        engine = CovarianceEngine(window=None)
+        engine.update_frame(closes)
+        weights = pd.Series({"A": 2.0, "B": 1.0, "C": 1.0})
+        w = (weights / weights.sum()).to_numpy()
+        covariance = closes.pct_change(fill_method=None).cov().to_numpy()
+
+        self.assertAlmostEqual(engine.portfolio_variance(weights), w @ covariance @ w)
+        self.assertAlmostEqual(engine.portfolio_variance(weights, periods=252), 252 * (w @ covariance @ w))
+        ratio = w @ np.sqrt(np.diag(covariance)) / np.sqrt(w @ covariance @ w)
+        self.assertAlmostEqual(engine.diversification_ratio(weights), ratio)
+        self.assertGreater(ratio, 1)
+
+    def test_identical_series_are_not_diversified(self):
+        closes = make_closes()[["A"]]
+        engine = CovarianceEngine(window=None)
+        engine.update_frame(closes.assign(B=closes["A"] * 3))
+
+        self.assertAlmostEqual(engine.correlation().loc["A", "B"], 1.0)
+        self.assertAlmostEqual(engine.diversification_ratio({"A": 1, "B": 1}), 1.0)
+
+    def test_errors(self):
+        engine = CovarianceEngine()
+        engine.update_frame(make_closes())
+        with self.assertRaises(ValueError):
+            engine.correlation(["A", "XYZ"])
+        with self.assertRaises(ValueError):
+            engine.portfolio_variance({"A": 0.0})
+
+
+class TestCovarianceSync(SharedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.engine = CovarianceEngine(self.api, window=60, start_date="2024-01-02")
+
+    def test_sync_from_price_store(self):
+        self.engine.sync(["AAPL", "MSFT"])
+        closes = self.api.get_histories(["AAPL", "MSFT"], "2024-01-02")
+        expected = closes.pct_change(fill_method=None).iloc[-60:].corr()
+
+        np.testing.assert_allclose(self.engine.correlation().to_numpy(), expected.to_numpy(), rtol=1e-8)
+        self.assertEqual(self.engine.last_date, pd.Timestamp("2024-06-28"))
+
+    def test_sync_without_new_days_keeps_statistics(self):
+        self.engine.sync(["AAPL", "MSFT"])
+        before = self.engine.covariance()
+        self.engine.sync()
+        pd.testing.assert_frame_equal(self.engine.covariance(), before)
+
+    def test_new_ticket_restarts(self):
+        self.engine.sync(["AAPL"])
+        self.engine.sync(["JPM"])
+
+        self.assertEqual(self.engine.tickets, ["AAPL", "JPM"])
+        self.assertFalse(self.engine.correlation().isna().any().any())
+
+    def test_shared_engine_follows_shared_api(self):
+        engine = get_covariance_engine()
+        self.assertIs(engine.api, self.api)
+        self.assertIs(get_covariance_engine(), engine)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import json
+import os
+import unittest
+from stocktracker.journal import WalletJournal, load_wallets
+from stocktracker.utils import get_current_date
+from stocktracker.wallet import Wallet
+from tests.support import SharedAPITestCase
+
+
+class TestWalletJournal(SharedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.journal_dir = os.path.join(self.tmpdir.name, "journal")
+        os.makedirs(self.journal_dir)
+
+    def make_wallet(self, snapshot_every=100):
+        wallet = Wallet("Journaled")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        WalletJournal.create(wallet, self.journal_dir, snapshot_every)
+        return wallet
+
+    def lots(self, wallet):
+        return sorted(
+            (ticket, lot.date, lot.price, lot.quantity)
+            for ticket, stock in wallet.stocks.items()
+            for lot in stock.purchases.values()
+        )
+
+    def test_reload_replays_buys_and_sells(self):
+        wallet = self.make_wallet()
+        wallet.add_stock("MSFT", 5, 400.0, "2024-05-15")
+        wallet.add_stock("AAPL", 4, 190.0, "2024-06-10")
+        wallet.remove_stock("AAPL", 12)
+        wallet.remove_stock("MSFT")
+        wallet.journal.close()
+
+        loaded, = load_wallets(self.journal_dir)
+        self.assertEqual(loaded.name, "Journaled")
+        self.assertEqual(self.lots(loaded), [("AAPL", "2024-06-10", 190.0, 2)])
+        self.assertEqual(loaded.journal.seq, 4)
+
+    def test_reload_keeps_cost_basis_and_realized_gain(self):
+        wallet = Wallet("Journaled", cost_basis="lifo")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        WalletJournal.create(wallet, self.journal_dir, snapshot_every=3)
+        wallet.add_stock("AAPL", 4, 190.0, "2024-06-10")
+        wallet.add_stock("AAPL", 2, 185.0, "2024-06-10")
+        wallet.remove_stock("AAPL", 1, price=200.0, date="2024-06-20")  # terceiro evento: snapshot
+        lot = wallet.stocks["AAPL"].purchases.lot("2024-06-10", 1)
+        wallet.remove_stock("AAPL", 1, method="specific", lots=[lot], price=210.0, date="2024-06-21")
+        wallet.journal.close()
+
+        loaded, = load_wallets(self.journal_dir)
+        self.assertEqual(loaded.cost_basis, "lifo")
+        self.assertEqual(self.lots(loaded), self.lots(wallet))
+        self.assertAlmostEqual(loaded.realized_gain, wallet.realized_gain)
+        self.assertEqual(len(loaded.realized), 2)
+
+    def test_snapshot_keeps_average_cost_basis(self):
+        wallet = Wallet("Journaled", cost_basis="average")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("AAPL", 5, 210.0, "2024-06-10")
+        WalletJournal.create(wallet, self.journal_dir, snapshot_every=1)
+        wallet.remove_stock("AAPL", 12, price=200.0, date="2024-06-20")  # grava snapshot, vende dos dois lotes
+        wallet.journal.close()
+
+        loaded, = load_wallets(self.journal_dir)
+        self.assertEqual(self.lots(loaded), self.lots(wallet))
+        self.assertAlmostEqual(loaded.total_spent, wallet.total_spent)
+        self.assertEqual(loaded.realized.entries(), wallet.realized.entries())
+        self.assertEqual(loaded.realized.cash_flows()[1].tolist(), wallet.realized.cash_flows()[1].tolist())
+        loaded.remove_stock("AAPL", 3, price=200.0, date="2024-06-21")
+        self.assertAlmostEqual(loaded.realized.to_frame()["Cost"].iloc[-1], 3 * 190.0)
+
+    def test_snapshot_restarts_the_journal(self):
+        wallet = self.make_wallet(snapshot_every=2)
+        wallet.add_stock("MSFT", 5, 400.0, "2024-05-15")
+        wallet.remove_stock("AAPL", 3)  # segundo evento: grava snapshot
+        wallet.add_stock("GOOG", 2, 170.0, "2024-06-05")
+        wallet.journal.close()
+
+        with open(wallet.journal.journal_path) as f:
+            self.assertEqual([json.loads(line)["seq"] for line in f], [3])
+        loaded, = load_wallets(self.journal_dir)
+        self.assertEqual(self.lots(loaded), self.lots(wallet))
+
+    def test_events_already_in_snapshot_and_torn_line_are_skipped(self):
+        wallet = self.make_wallet()
+        wallet.add_stock("MSFT", 5, 400.0, "2024-05-15")
+        wallet.journal.close()
+        with open(wallet.journal.journal_path) as f:
+            events = f.read()
+        wallet.journal.snapshot(wallet)
+        # parada entre o snapshot e a limpeza do diario, com uma linha pela metade no fim
+        with open(wallet.journal.journal_path, "w") as f:
+            f.write(events + '{"seq": 2, "type": "BU')
+
+        loaded, = load_wallets(self.journal_dir)
+        self.assertEqual(self.lots(loaded), self.lots(wallet))
+
+    def test_buy_without_date_is_logged_with_todays_date(self):
+        wallet = self.make_wallet()
+        wallet.add_stock("MSFT", 5, 400.0)
+        wallet.journal.close()
+
+        with open(wallet.journal.journal_path) as f:
+            event, = [json.loads(line) for line in f]
+        self.assertEqual(event["date"], get_current_date())
+        self.assertIn(get_current_date(), wallet.stocks["MSFT"].purchases)
+
+    def test_unpriced_buy_reloads_with_the_resolved_price(self):
+        wallet = self.make_wallet()
+        wallet.add_stock("MSFT", 5, None, "2024-06-05")
+        wallet.add_stock("GOOG", 2, None, "2024-06-05", validate=True)
+        wallet.resolve()
+        prices = {ticket: lot.price for ticket, lot in self.lots_by_ticket(wallet)}
+        total_spent = wallet.total_spent
+        wallet.journal.close()
+
+        with open(wallet.journal.journal_path) as f:
+            events = [json.loads(line) for line in f]
+        # MSFT ganha preco no resolve() da validacao de GOOG; GOOG leva o preco no proprio BUY
+        self.assertEqual([event["type"] for event in events], ["BUY", "PRICE", "BUY"])
+        self.assertEqual(events[1]["price"], prices["MSFT"])
+        self.assertEqual(events[2]["price"], prices["GOOG"])
+
+        # na carga a cotacao mais recente ja e outra
+        self.use_api("2024-06-14")
+        loaded, = load_wallets(self.journal_dir)
+        self.assertEqual({ticket: lot.price for ticket, lot in self.lots_by_ticket(loaded)}, prices)
+        self.assertAlmostEqual(loaded.total_spent, total_spent)
+
+    def lots_by_ticket(self, wallet):
+        return [(ticket, lot) for ticket, stock in wallet.stocks.items() for lot in stock.purchases.values()]
+
+    def test_delete(self):
+        wallet = self.make_wallet()
+        wallet.journal.delete()
+        self.assertEqual(load_wallets(self.journal_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from stocktracker.lotledger import LotLedger
+from stocktracker.purchase import Purchase
+
+
+class TestLotLedger(unittest.TestCase):
+    def setUp(self):
+        self.ledger = LotLedger()
+        self.ledger.add(Purchase("2023-03-01", 120, 5))
+        self.ledger.add(Purchase("2023-01-01", 100, 2))
+        self.ledger.add(Purchase("2023-02-01", 110, 3))
+
+    def test_lots_are_kept_in_date_order(self):
+        self.assertEqual(self.ledger.keys(), ["2023-01-01", "2023-02-01", "2023-03-01"])
+        self.assertEqual(self.ledger.oldest_date(), "2023-01-01")
+
+    def test_same_date_keeps_every_lot(self):
+        self.ledger["2023-02-01"] = Purchase("2023-02-01", 115, 4)
+
+        self.assertEqual(len(self.ledger), 4)
+        # o primeiro lote da data continua sendo o primeiro a ser vendido
+        self.assertEqual(self.ledger["2023-02-01"].price, 110)
+        self.assertEqual([lot.price for lot in self.ledger.values()], [100, 110, 115, 120])
+
+    def test_consume_fifo(self):
+        removed, spent = self.ledger.consume(4)
+
+        self.assertEqual((removed, spent), (4, 2 * 100 + 2 * 110))
+        self.assertNotIn("2023-01-01", self.ledger)
+        self.assertEqual(self.ledger["2023-02-01"].quantity, 1)
+        self.assertEqual(self.ledger.oldest_date(), "2023-02-01")
+
+    def test_until_hides_later_lots(self):
+        with self.ledger.until("2023-02-15"):
+            self.assertEqual(self.ledger.total_quantity(), 5)
+            self.assertEqual(self.ledger.consume_last(4), (4, 3 * 110 + 100))
+
+        self.assertEqual([(lot.date, lot.quantity) for lot in self.ledger.values()], [("2023-01-01", 1), ("2023-03-01", 5)])
+        self.ledger.insert("2023-04-01", 130, 1)
+        self.assertEqual(self.ledger.keys(), ["2023-01-01", "2023-03-01", "2023-04-01"])
+
+    def test_consume_more_than_available(self):
+        removed, spent = self.ledger.consume(20)
+
+        self.assertEqual((removed, spent), (10, 2 * 100 + 3 * 110 + 5 * 120))
+        self.assertEqual(len(self.ledger), 0)
+        self.assertIsNone(self.ledger.oldest_date())
+
+    def test_remove_by_view(self):
+        second = self.ledger.add(Purchase("2023-02-01", 115, 4))
+
+        self.assertTrue(self.ledger.remove(second))
+        self.assertFalse(self.ledger.holds(second))
+        self.assertEqual(self.ledger["2023-02-01"].price, 110)
+        self.assertFalse(self.ledger.remove(second))
+
+    def test_views_write_to_columns(self):
+        lot = self.ledger.insert("2023-01-15", None, 4)
+        self.assertIsNone(lot.price)
+        self.assertEqual(self.ledger.total_spent(), 2 * 100 + 3 * 110 + 5 * 120)
+
+        lot.price = 105
+        self.assertEqual(self.ledger.values()[1].price, 105)
+        self.assertEqual(self.ledger.total_quantity(), 14)
+        self.assertAlmostEqual(self.ledger.average_price(), (2 * 100 + 4 * 105 + 3 * 110 + 5 * 120) / 14)
+
+    def test_many_lots(self):
+        ledger = LotLedger()
+        for day in range(1, 29):
+            for _ in range(500):
+                ledger.add(Purchase(f"2023-02-{day:02d}", day, 1))
+
+        removed, spent = ledger.consume(1000)
+        self.assertEqual((removed, spent), (1000, 500 * 1 + 500 * 2))
+        self.assertEqual(ledger.oldest_date(), "2023-02-03")
+        self.assertEqual(len(ledger), 27 * 500 - 500)
+
+        ledger.add(Purchase("2023-01-15", 50, 1))
+        self.assertEqual(ledger.consume(1), (1, 50))
+
+    def test_accepts_unpadded_dates(self):
+        ledger = LotLedger([Purchase("2025-6-12", 1, 1), Purchase("2025-6-3", 2, 1)])
+        self.assertEqual(ledger.oldest_date(), "2025-06-03")
+        self.assertIn("2025-6-12", ledger)
+
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError):
+            self.ledger.insert("01/02/2023", 100, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
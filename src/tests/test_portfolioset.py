@@ -0,0 +1,86 @@
+import unittest
+import numpy as np
+import pandas as pd
+from stocktracker.benchmarks import get_benchmark_service
+from stocktracker.covariance import get_covariance_engine
+from stocktracker.portfolioset import PortfolioSet
+from stocktracker.wallet import Wallet
+from tests.support import SharedAPITestCase
+
+
+class TestPortfolioSet(SharedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.wallets = self.make_wallets()
+
+    def make_wallets(self):
+        tech, mixed, banks = Wallet("Tech"), Wallet("Mixed"), Wallet("Banks")
+        tech.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        tech.add_stock("MSFT", 5, 400.0, "2024-05-15")
+        mixed.add_stock("AAPL", 2, 170.0, "2024-05-01")
+        mixed.add_stock("JPM", 4, 195.0, "2024-05-20")
+        banks.add_stock("JPM", 6, 190.0, "2024-06-05")
+        return PortfolioSet([tech, mixed, banks])
+
+    def test_union_of_tickers_and_dates(self):
+        self.assertEqual(self.wallets.tickers(), ["AAPL", "MSFT", "JPM"])
+        self.assertEqual(self.wallets.oldest_date(), "2024-05-01")
+
+    def test_refresh_downloads_once(self):
+        errors = self.wallets.refresh()
+
+        self.assertEqual(errors, {})
+        self.assertEqual(self.api.network_calls, 1)
+        self.assertEqual([wallet.tickets_count for wallet in self.wallets], [15, 6, 6])
+        self.assertAlmostEqual(self.wallets[0].last_prices["AAPL"], self.wallets[1].last_prices["AAPL"])
+
+    def test_histories_download_once(self):
+        histories = self.wallets.get_performance_histories()
+
+        self.assertEqual(self.api.network_calls, 1)
+        self.assertEqual(len(histories), 3)
+        self.assertAlmostEqual(histories[2].loc["2024-06-28"], 6 * self.api.prices.frame(["JPM"]).iloc[-1, 0])
+
+    def test_risk_metrics_of_every_wallet(self):
+        self.use_api(today=None)  # janela termina hoje: dados sinteticos ate a data real
+        self.wallets = self.make_wallets()
+        get_benchmark_service().refresh()  # indices carregados na inicializacao do app
+        calls = self.api.network_calls
+        table = self.wallets.get_risk_metrics(days=90, benchmark="^GSPC")
+
+        self.assertEqual(self.api.network_calls - calls, 1)
+        self.assertEqual(list(table.index), ["Tech", "Mixed", "Banks"])
+        banks = self.wallets[2].get_risk_metrics(days=90, benchmark="^GSPC")
+        pd.testing.assert_series_equal(table.loc["Banks"], banks)
+
+    def test_returns_of_every_wallet(self):
+        self.wallets.refresh()
+        rates = self.wallets.get_money_weighted_returns()
+
+        self.assertEqual(rates.index.names, ["wallet", "ticket"])
+        for wallet in self.wallets:
+            pd.testing.assert_series_equal(rates.loc[wallet.name], wallet.get_money_weighted_returns(), check_names=False, check_index_type=False)
+        twr = self.wallets.get_time_weighted_returns()
+        self.assertAlmostEqual(twr["Banks"], self.wallets[2].get_time_weighted_return())
+
+    def test_diversification_of_every_wallet(self):
+        self.use_api(today=None)
+        self.wallets = self.make_wallets()
+        self.wallets.refresh()
+        table = self.wallets.get_diversification()
+
+        self.assertEqual(list(table.index), ["Tech", "Mixed", "Banks"])
+        self.assertEqual(get_covariance_engine().tickets, ["AAPL", "MSFT", "JPM"])
+        self.assertAlmostEqual(table.loc["Banks", "Diversification Ratio"], 1.0)
+        self.assertTrue(np.isnan(table.loc["Banks", "Average Correlation"]))
+        pd.testing.assert_series_equal(table.loc["Mixed"], self.wallets[1].get_diversification())
+
+    def test_behaves_like_a_list(self):
+        self.wallets.append(Wallet("Empty"))
+        del self.wallets[0]
+        self.assertEqual([wallet.name for wallet in self.wallets], ["Mixed", "Banks", "Empty"])
+        self.assertEqual(self.wallets.tickers(), ["AAPL", "JPM"])
+
+
+if __name__ == "__main__":
+    unittest.main()
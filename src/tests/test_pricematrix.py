@@ -0,0 +1,76 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from stocktracker.pricematrix import PriceMatrix
+from stocktracker.wallet import Wallet
+from tests.support import SharedAPITestCase
+
+
+def history(dates, closes):
+    index = pd.DatetimeIndex(dates, name="Date")
+    closes = np.array(closes, dtype=float)
+    return pd.DataFrame({"Open": closes - 1, "High": closes + 1, "Low": closes - 2, "Close": closes}, index=index)
+
+
+class TestPriceMatrix(unittest.TestCase):
+    def setUp(self):
+        self.matrix = PriceMatrix()
+        self.matrix.update("AAPL", history(["2024-01-02", "2024-01-03", "2024-01-04"], [10, 11, 12]))
+        self.matrix.update("MSFT", history(["2024-01-03", "2024-01-05"], [20, 21]))
+
+    def test_dates_are_merged(self):
+        self.assertEqual(len(self.matrix.dates), 4)
+        self.assertEqual(self.matrix.columns, {"AAPL": 0, "MSFT": 1})
+        self.assertTrue(np.isnan(self.matrix.values["Close"][0, 1]))
+
+    def test_latest_values(self):
+        self.assertEqual(self.matrix.latest("AAPL"), 12)
+        self.assertEqual(self.matrix.latest("MSFT", "Open"), 20)
+        np.testing.assert_array_equal(self.matrix.latest_many(["MSFT", "XXXX", "AAPL"]), [21, np.nan, 12])
+
+    def test_high_low_since(self):
+        self.assertEqual(self.matrix.max("AAPL", "High", "2024-01-03"), 13)
+        self.assertEqual(self.matrix.min("AAPL", "Low", "2024-01-03"), 9)
+        # sem pregao depois da data: usa o ultimo valor
+        self.assertEqual(self.matrix.max("AAPL", "High", "2024-01-06"), 13)
+
+    def test_frame_slice(self):
+        frame = self.matrix.frame(["AAPL", "MSFT"], "2024-01-03", "2024-01-05")
+        self.assertEqual(list(frame.index), [pd.Timestamp("2024-01-03"), pd.Timestamp("2024-01-04")])
+        self.assertEqual(frame.loc["2024-01-03", "MSFT"], 20)
+        self.assertTrue(np.isnan(frame.loc["2024-01-04", "MSFT"]))
+
+    def test_update_overwrites_rows(self):
+        self.matrix.update("AAPL", history(["2024-01-04"], [15]))
+        self.assertEqual(self.matrix.latest("AAPL"), 15)
+
+    def test_versions_track_changed_days(self):
+        versions = self.matrix.versions(["AAPL", "MSFT", "JPM"])
+        self.assertEqual(versions["JPM"], 0)
+
+        self.matrix.update("AAPL", history(["2024-01-03", "2024-01-04"], [11, 12]))  # mesmos valores
+        self.assertEqual(self.matrix.versions(["AAPL", "MSFT", "JPM"]), versions)
+        self.assertIsNone(self.matrix.changed_since(versions))
+
+        self.matrix.update("AAPL", history(["2024-01-03", "2024-01-04"], [11, 13]))
+        self.matrix.update("MSFT", history(["2024-01-03"], [19]))
+        self.assertGreater(self.matrix.versions(["AAPL"])["AAPL"], versions["AAPL"])
+        self.assertEqual(self.matrix.changed_since({"AAPL": versions["AAPL"]}), pd.Timestamp("2024-01-04"))
+        self.assertEqual(self.matrix.changed_since(versions), pd.Timestamp("2024-01-03"))
+
+
+class TestSharedPrices(SharedAPITestCase):
+    def test_wallets_share_one_column_per_ticker(self):
+        first, second = Wallet("First"), Wallet("Second")
+        first.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        second.add_stock("AAPL", 5, 170.0, "2024-05-01")
+        second.add_stock("MSFT", 5, 400.0, "2024-05-15")
+        first.update_wallet_status()
+        second.update_wallet_status()
+
+        self.assertEqual(list(self.api.prices.columns), ["AAPL", "MSFT"])
+        self.assertEqual(first.stocks["AAPL"].current_value, second.stocks["AAPL"].current_value)
+        self.assertEqual(first.stocks["AAPL"].current_value, self.api.prices.latest("AAPL"))
+        self.assertGreaterEqual(second.stocks["AAPL"].historical_high, first.stocks["AAPL"].historical_high)
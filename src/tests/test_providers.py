@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+
+import pandas as pd
+
+from stocktracker.providers import (
+    MarketDataProvider,
+    RecordingProvider,
+    ReplayProvider,
+    YFinanceProvider,
+    get_provider,
+)
+from stocktracker.wallet import Wallet
+from tests.support import SharedAPITestCase
+
+
+class TestReplayProvider(unittest.TestCase):
+    def setUp(self):
+        self.provider = ReplayProvider(today="2024-06-28")
+
+    def test_implements_protocol(self):
+        self.assertIsInstance(self.provider, MarketDataProvider)
+        self.assertIsInstance(YFinanceProvider(), MarketDataProvider)
+
+    def test_synthetic_data_is_deterministic(self):
+        first = self.provider.get_history("AAPL", "2024-01-02")
+        second = ReplayProvider(today="2024-06-28").get_history("AAPL", "2024-01-02")
+        pd.testing.assert_frame_equal(first, second)
+        self.assertFalse(first.equals(self.provider.get_history("MSFT", "2024-01-02")))
+
+    def test_value_does_not_depend_on_range(self):
+        long_range = self.provider.get_history("AAPL", "2023-01-02")
+        short_range = self.provider.get_history("AAPL", "2024-03-01", "2024-04-01")
+        pd.testing.assert_frame_equal(short_range, long_range.loc["2024-03-01":"2024-03-29"])
+        self.assertEqual(short_range.index[-1], pd.Timestamp("2024-03-29"))
+
+    def test_batch_and_quote(self):
+        histories = self.provider.get_histories(["AAPL", "^GSPC"], "2024-06-03")
+        self.assertEqual(set(histories), {"AAPL", "^GSPC"})
+        self.assertEqual(self.provider.get_latest_quote("AAPL"), histories["AAPL"]["Close"].iloc[-1])
+
+    def test_without_synthetic_data_unknown_ticker_is_empty(self):
+        self.assertTrue(ReplayProvider(synthetic=False).get_history("AAPL", "2024-01-02").empty)
+
+
+class TestRecordingProvider(unittest.TestCase):
+    def test_recorded_data_is_replayed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = ReplayProvider(today="2024-06-28")
+            recorder = RecordingProvider(source, directory)
+            recorder.get_history("^GSPC", "2024-01-02", "2024-03-01")
+            recorder.get_histories(["^GSPC"], "2024-02-01")
+
+            replay = ReplayProvider(directory, synthetic=False)
+            pd.testing.assert_frame_equal(
+                replay.get_history("^GSPC", "2024-01-02"),
+                source.get_history("^GSPC", "2024-01-02"),
+                check_freq=False,
+            )
+
+    def test_get_provider_by_name(self):
+        self.assertIsInstance(get_provider("replay"), ReplayProvider)
+        with self.assertRaises(ValueError):
+            get_provider("bloomberg")
+
+
+class TestOfflineWallet(SharedAPITestCase):
+    def test_wallet_without_network(self):
+        wallet = Wallet("Offline")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("MSFT", 5, 400.0, "2024-05-15")
+        wallet.update_wallet_status()
+
+        history = wallet.get_performance_history()
+        self.assertEqual(wallet.refresh_errors, {})
+        self.assertEqual(wallet.total_spent, 3800.0)
+        self.assertAlmostEqual(history.loc["2024-06-28"], wallet.total_value)
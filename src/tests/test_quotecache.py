@@ -0,0 +1,74 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from stocktracker.quotecache import QuoteCache
+from stocktracker.stockAPI import StockAPI
+from tests.test_stockAPI import fake_download
+
+
+class TestQuoteCache(unittest.TestCase):
+    def test_hit_and_miss_counters(self):
+        cache = QuoteCache(maxsize=4, ttl=60)
+        self.assertIsNone(cache.get(("AAPL", "2024-01-02")))
+        cache.set(("AAPL", "2024-01-02"), 1)
+        self.assertEqual(cache.get(("AAPL", "2024-01-02")), 1)
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = QuoteCache(maxsize=2, ttl=60)
+        cache.set(("A",), 1)
+        cache.set(("B",), 2)
+        cache.get(("A",))  # A passa a ser o mais recente
+        cache.set(("C",), 3)
+
+        self.assertIsNone(cache.get(("B",)))
+        self.assertEqual(cache.get(("A",)), 1)
+        self.assertEqual(len(cache), 2)
+
+    def test_expired_entry_is_a_miss(self):
+        cache = QuoteCache(maxsize=2, ttl=10)
+        with patch("stocktracker.quotecache.time.monotonic", return_value=100):
+            cache.set(("A",), 1)
+        with patch("stocktracker.quotecache.time.monotonic", return_value=111):
+            self.assertIsNone(cache.get(("A",)))
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate_ticket(self):
+        cache = QuoteCache()
+        cache.set(("A", "2024-01-02"), 1)
+        cache.set(("B", "2024-01-02"), 2)
+        cache.invalidate("A")
+        self.assertIsNone(cache.get(("A", "2024-01-02")))
+        self.assertEqual(cache.get(("B", "2024-01-02")), 2)
+
+
+class TestStockAPIMemoryCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.api = StockAPI(cache_dir=self.tmpdir.name)
+
+    def tearDown(self):
+        self.api.store.close()
+        self.tmpdir.cleanup()
+
+    def test_repeated_history_hits_memory(self):
+        with patch.object(StockAPI, "download_history", side_effect=fake_download):
+            self.api.get_history("AAPL", "2024-01-02")
+            # mesmo pedido feito por Stock.__init__ e depois por get_latest_price
+            with patch.object(self.api.store, "read") as read:
+                self.api.get_latest_price("AAPL", "2024-01-02")
+                read.assert_not_called()
+
+        self.assertEqual(self.api.memory_cache.hits, 1)
+        self.assertEqual(self.api.memory_cache.misses, 1)
+
+    def test_returned_history_is_a_copy(self):
+        with patch.object(StockAPI, "download_history", side_effect=fake_download):
+            history = self.api.get_history("AAPL", "2024-01-02")
+            history["Close"] = 0.0
+            self.assertNotEqual(self.api.get_history("AAPL", "2024-01-02")["Close"].iloc[0], 0.0)
@@ -0,0 +1,130 @@
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from stocktracker.providers import ReplayProvider
+from stocktracker.resilience import (
+    CircuitBreaker,
+    CircuitBreakers,
+    MarketDataUnavailable,
+    RetryPolicy,
+    TokenBucket,
+)
+from stocktracker.stockAPI import StockAPI
+
+
+class TestTokenBucket(unittest.TestCase):
+    @patch("stocktracker.resilience.time.sleep")
+    def test_waits_when_bucket_is_empty(self, sleep):
+        bucket = TokenBucket(rate=2, capacity=1)
+        with patch("stocktracker.resilience.time.monotonic", side_effect=[0, 0, 0.5]):
+            bucket._updated = 0
+            bucket.acquire()  # consome o unico token
+            bucket.acquire()  # precisa esperar meio segundo por outro
+
+        sleep.assert_called_once_with(0.5)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    @patch("stocktracker.resilience.time.sleep")
+    def test_transient_error_is_retried(self, sleep):
+        function = MagicMock(side_effect=[ConnectionError("reset"), TimeoutError(), "ok"])
+        self.assertEqual(RetryPolicy(attempts=3).call(function), "ok")
+        self.assertEqual(function.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    @patch("stocktracker.resilience.time.sleep")
+    def test_gives_up_after_last_attempt(self, sleep):
+        function = MagicMock(side_effect=ConnectionError("down"))
+        with self.assertRaises(ConnectionError):
+            RetryPolicy(attempts=2).call(function)
+        self.assertEqual(function.call_count, 2)
+
+    def test_other_errors_are_not_retried(self):
+        function = MagicMock(side_effect=KeyError("Close"))
+        with self.assertRaises(KeyError):
+            RetryPolicy(attempts=3).call(function)
+        function.assert_called_once()
+
+    def test_delay_is_bounded(self):
+        policy = RetryPolicy(base_delay=1, max_delay=3)
+        self.assertTrue(all(0 <= policy.delay(attempt) <= 3 for attempt in range(10)))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    @patch("stocktracker.resilience.time.monotonic")
+    def test_open_then_half_open(self, monotonic):
+        monotonic.return_value = 100
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        monotonic.return_value = 131
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        breaker.record_failure()  # falha no meio-aberto reabre
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        monotonic.return_value = 162
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+class TestStockAPIResilience(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.provider = ReplayProvider(today="2024-06-28")
+        self.api = StockAPI(
+            self.provider,
+            cache_dir=self.tmpdir.name,
+            memory_ttl=0,
+            retry_policy=RetryPolicy(attempts=1),
+            breakers=CircuitBreakers(failure_threshold=2, reset_timeout=60),
+        )
+
+    def tearDown(self):
+        self.api.store.close()
+        self.tmpdir.cleanup()
+
+    def expire_cache(self):
+        with self.api.store._lock, self.api.store._conn:
+            self.api.store._conn.execute("UPDATE coverage SET fetched_at = ?", (time.time() - 3600,))
+
+    def test_stale_history_served_while_provider_is_down(self):
+        cached = self.api.get_history("AAPL", "2024-06-03")
+        self.expire_cache()
+
+        with patch.object(self.provider, "get_history", side_effect=ConnectionError("down")) as download:
+            for _ in range(4):
+                history = self.api.get_history("AAPL", "2024-06-03")
+
+        # depois de 2 falhas o circuito abre e o provedor nao e mais chamado
+        self.assertEqual(download.call_count, 2)
+        self.assertEqual(self.api.stale_reads, 4)
+        self.assertEqual(history["Close"].iloc[-1], cached["Close"].iloc[-1])
+        self.assertIn("AAPL", self.api.breakers.open_keys())
+
+    def test_open_circuit_without_cache_raises(self):
+        with patch.object(self.provider, "get_history", side_effect=ConnectionError("down")):
+            for _ in range(2):
+                with self.assertRaises(ConnectionError):
+                    self.api.get_history("MSFT", "2024-06-03")
+            with self.assertRaises(MarketDataUnavailable):
+                self.api.get_history("MSFT", "2024-06-03")
+
+    def test_batch_failure_serves_cached_tickers(self):
+        self.api.get_histories(["AAPL"], "2024-06-03")
+        self.expire_cache()
+
+        with patch.object(self.provider, "get_histories", side_effect=TimeoutError()):
+            closes = self.api.get_histories(["AAPL", "MSFT"], "2024-06-03")
+
+        self.assertFalse(closes["AAPL"].isna().all())
+        self.assertTrue(closes["MSFT"].isna().all())
+
+    def test_latest_price_on_weekend_uses_last_session(self):
+        price, high, low = self.api.get_latest_price("AAPL", "2024-06-29")  # sabado
+        friday = self.api.get_history("AAPL", "2024-06-28")
+        self.assertEqual(price, friday["Close"].iloc[-1])
@@ -0,0 +1,219 @@
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from stocktracker.stockAPI import SingleFlight, StockAPI, configure_shared_api, get_shared_api
+
+
+def make_history(start, end):
+    """Cria um historico diario falso no formato do yfinance."""
+    index = pd.bdate_range(start, end, tz="America/New_York", name="Date")
+    values = range(len(index))
+    return pd.DataFrame(
+        {
+            "Open": [100.0 + v for v in values],
+            "High": [101.0 + v for v in values],
+            "Low": [99.0 + v for v in values],
+            "Close": [100.5 + v for v in values],
+            "Volume": [1000.0] * len(index),
+        },
+        index=index,
+    )
+
+
+def fake_download(ticket, start_date, end_date=None):
+    return make_history(start_date, pd.Timestamp(end_date) - pd.Timedelta(days=1) if end_date else "2024-03-01")
+
+
+class TestStockAPICache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        # sem o cache em memoria, para exercitar so o cache em disco
+        self.api = StockAPI(cache_dir=self.tmpdir.name, memory_ttl=0)
+
+    def tearDown(self):
+        self.api.store.close()
+        self.tmpdir.cleanup()
+
+    def test_warm_start_served_from_disk(self):
+        with patch.object(StockAPI, "download_history", side_effect=fake_download) as download:
+            first = self.api.get_history("AAPL", "2024-01-02")
+            second = self.api.get_history("AAPL", "2024-01-10")
+
+            # Uma nova instancia usa o mesmo arquivo em disco
+            other = StockAPI(cache_dir=self.tmpdir.name, memory_ttl=0)
+            third = other.get_history("AAPL", "2024-01-02")
+            other.store.close()
+
+        self.assertEqual(download.call_count, 1)
+        self.assertEqual(len(first), len(third))
+        self.assertEqual(second.index[0], pd.Timestamp("2024-01-10"))
+        self.assertEqual(first["Close"].iloc[-1], third["Close"].iloc[-1])
+
+    def test_missing_head_is_fetched(self):
+        with patch.object(StockAPI, "download_history", side_effect=fake_download) as download:
+            self.api.get_history("AAPL", "2024-02-01")
+            history = self.api.get_history("AAPL", "2024-01-02")
+
+        self.assertEqual(download.call_count, 2)
+        self.assertEqual(download.call_args.args, ("AAPL", "2024-01-02", "2024-02-01"))
+        self.assertEqual(history.index[0], pd.Timestamp("2024-01-02"))
+
+    def test_empty_head_download_is_not_covered(self):
+        with patch.object(StockAPI, "download_history", side_effect=fake_download) as download:
+            self.api.get_history("AAPL", "2024-02-01")
+            download.side_effect = lambda *args: pd.DataFrame()  # falha silenciosa do provedor
+            self.assertEqual(self.api.get_history("AAPL", "2024-01-02").index[0], pd.Timestamp("2024-02-01"))
+            self.assertEqual(self.api.store.get_coverage("AAPL")[0], "2024-02-01")
+
+            # so o trecho que voltou conta como coberto; o resto e pedido de novo
+            download.side_effect = lambda ticket, start, end=None: make_history("2024-01-16", "2024-01-31")
+            self.api.get_history("AAPL", "2024-01-02")
+            self.assertEqual(self.api.store.get_coverage("AAPL")[0], "2024-01-16")
+            download.side_effect = fake_download
+            history = self.api.get_history("AAPL", "2024-01-02")
+
+        self.assertEqual(download.call_args.args, ("AAPL", "2024-01-02", "2024-01-16"))
+        self.assertEqual(history.index[0], pd.Timestamp("2024-01-02"))
+
+    def test_stale_tail_is_refetched_from_last_date(self):
+        with patch.object(StockAPI, "download_history", side_effect=fake_download) as download:
+            self.api.get_history("AAPL", "2024-01-02")
+            # fetched_at antigo: a cobertura precisa ser atualizada
+            with self.api.store._lock, self.api.store._conn:
+                self.api.store._conn.execute("UPDATE coverage SET fetched_at = ?", (time.time() - 3600,))
+            self.api.get_history("AAPL", "2024-01-02")
+
+        self.assertEqual(download.call_count, 2)
+        self.assertEqual(download.call_args.args, ("AAPL", "2024-03-01"))
+
+    def test_closed_range_does_not_refetch(self):
+        with patch.object(StockAPI, "download_history", side_effect=fake_download) as download:
+            self.api.get_history("^GSPC", "2024-01-02")
+            with self.api.store._lock, self.api.store._conn:
+                self.api.store._conn.execute("UPDATE coverage SET fetched_at = ?", (time.time() - 3600,))
+            history = self.api.get_history("^GSPC", "2024-01-02", "2024-02-01")
+
+        self.assertEqual(download.call_count, 1)
+        self.assertEqual(history.index[-1], pd.Timestamp("2024-01-31"))
+
+
+def fake_batch_download(tickets, start_date, end_date=None):
+    return {ticket: fake_download(ticket, start_date, end_date) for ticket in tickets if ticket != "XXXX"}
+
+
+class TestStockAPIBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.api = StockAPI(cache_dir=self.tmpdir.name)
+
+    def tearDown(self):
+        self.api.store.close()
+        self.tmpdir.cleanup()
+
+    def test_single_request_for_all_tickets(self):
+        with patch.object(StockAPI, "download_histories", side_effect=fake_batch_download) as download:
+            closes = self.api.get_histories(["AAPL", "MSFT", "GOOG"], "2024-01-02")
+            again = self.api.get_histories(["AAPL", "MSFT", "GOOG"], "2024-01-02")
+
+        self.assertEqual(download.call_count, 1)
+        self.assertEqual(list(closes.columns), ["AAPL", "MSFT", "GOOG"])
+        self.assertEqual(closes.index[0], pd.Timestamp("2024-01-02"))
+        pd.testing.assert_frame_equal(closes, again)
+
+    def test_only_missing_tickers_are_downloaded(self):
+        with patch.object(StockAPI, "download_histories", side_effect=fake_batch_download) as download:
+            self.api.get_histories(["AAPL"], "2024-01-02")
+            closes = self.api.get_histories(["AAPL", "MSFT"], "2024-01-02", field="Open")
+
+        self.assertEqual(download.call_count, 2)
+        self.assertEqual(download.call_args.args, (["MSFT"], "2024-01-02"))
+        self.assertEqual(closes["MSFT"].iloc[0], 100.0)
+
+    def test_empty_batch_download_is_not_covered(self):
+        with patch.object(StockAPI, "download_histories", side_effect=fake_batch_download) as download:
+            self.api.get_histories(["AAPL"], "2024-02-01")
+            download.side_effect = lambda tickets, start, end=None: {ticket: pd.DataFrame() for ticket in tickets}
+            self.api.get_histories(["AAPL"], "2023-01-02")
+            self.assertEqual(self.api.store.get_coverage("AAPL")[0], "2024-02-01")
+
+            download.side_effect = fake_batch_download
+            closes = self.api.get_histories(["AAPL"], "2023-01-02")
+
+        self.assertEqual(download.call_count, 3)
+        self.assertEqual(closes.index[0], pd.Timestamp("2023-01-02"))
+
+    def test_unknown_ticker_gives_empty_column(self):
+        with patch.object(StockAPI, "download_histories", side_effect=lambda t, s, e=None: {}):
+            closes = self.api.get_histories(["XXXX"], "2024-01-02")
+
+        self.assertIn("XXXX", closes.columns)
+        self.assertTrue(closes["XXXX"].empty)
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_callers_share_one_download(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        api = StockAPI(cache_dir=tmpdir.name)
+        started, release = threading.Event(), threading.Event()
+
+        def slow_download(ticket, start_date, end_date=None):
+            started.set()
+            release.wait(5)
+            return fake_download(ticket, start_date, end_date)
+
+        results = []
+        with patch.object(StockAPI, "download_history", side_effect=slow_download) as download:
+            first = threading.Thread(target=lambda: results.append(api.get_history("AAPL", "2024-01-02")))
+            first.start()
+            started.wait(5)
+            second = threading.Thread(target=lambda: results.append(api.get_history("AAPL", "2024-01-02")))
+            second.start()
+            while api._inflight.shared == 0:
+                time.sleep(0.01)
+            release.set()
+            first.join()
+            second.join()
+
+        self.assertEqual(download.call_count, 1)
+        self.assertEqual(len(results), 2)
+        self.assertIsNot(results[0], results[1])
+        api.store.close()
+        tmpdir.cleanup()
+
+    def test_error_is_shared_and_key_released(self):
+        def failing():
+            raise ValueError("No data")
+
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do("key", failing)
+        self.assertEqual(flight.do("key", lambda: 1), 1)
+
+
+class TestSharedAPI(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        configure_shared_api(cache_dir=self.tmpdir.name, max_connections=2)
+
+    def tearDown(self):
+        get_shared_api().store.close()
+        configure_shared_api()
+        self.tmpdir.cleanup()
+
+    def test_same_instance_is_shared(self):
+        api = get_shared_api()
+        self.assertIs(api, get_shared_api())
+        self.assertEqual(api.max_connections, 2)
+        self.assertEqual(api.store.cache_dir, self.tmpdir.name)
+
+    @patch("stocktracker.stockAPI.StockAPI")
+    def test_registry_ignores_patched_class(self, mock_api):
+        # o registro guarda a classe original, entao patches no modulo nao vazam para a instancia compartilhada
+        configure_shared_api(cache_dir=self.tmpdir.name)
+        self.assertIsInstance(get_shared_api(), StockAPI)
+        mock_api.assert_not_called()
@@ -0,0 +1,43 @@
+import unittest
+import pandas as pd
+from stocktracker.valuehistory import ValueHistory
+
+
+class TestValueHistory(unittest.TestCase):
+    def setUp(self):
+        self.history = ValueHistory()
+        self.start = pd.Timestamp("2024-06-03")
+        self.end = pd.Timestamp("2024-06-14")
+        index = pd.date_range(self.start, self.end, freq="B")
+        self.history.store(pd.Series(range(len(index)), index=index, dtype=float), self.start, self.start, self.end, 1)
+
+    def test_same_version_and_day_is_a_cache_read(self):
+        self.assertIsNone(self.history.stale_from(self.start, self.end, 1))
+
+    def test_new_days_recompute_from_last_computed_day(self):
+        self.assertEqual(self.history.stale_from(self.start, pd.Timestamp("2024-06-18"), 1), self.end)
+
+    def test_backdated_change_recomputes_from_its_date(self):
+        self.history.invalidate("2024-06-05")
+        self.history.invalidate("2024-06-10")
+        self.assertEqual(self.history.stale_from(self.start, self.end, 3), pd.Timestamp("2024-06-05"))
+
+    def test_change_without_date_or_new_start_recomputes_everything(self):
+        self.assertEqual(self.history.stale_from(self.start, self.end, 2), self.start)
+        earlier = pd.Timestamp("2024-05-01")
+        self.assertEqual(self.history.stale_from(earlier, self.end, 1), earlier)
+
+    def test_store_splices_recomputed_tail(self):
+        since = pd.Timestamp("2024-06-12")
+        tail = pd.Series([100.0, 101.0, 102.0, 103.0], index=pd.date_range(since, "2024-06-17", freq="B"))
+        self.history.store(tail, since, self.start, pd.Timestamp("2024-06-17"), 2)
+
+        series = self.history.series
+        self.assertEqual(len(series), 11)
+        self.assertEqual(series.loc["2024-06-11"], 6)
+        self.assertEqual(series.loc["2024-06-17"], 103)
+        self.assertIsNone(self.history.dirty_from)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,14 @@
+import os
+import threading
 import unittest
+import numpy as np
+import pandas as pd
 from unittest.mock import MagicMock, patch
+from stocktracker import analytics
+from stocktracker.resilience import MarketDataUnavailable, RetryPolicy
 from stocktracker.wallet import Wallet
 from stocktracker.stock import Stock
+from tests.support import SharedAPITestCase
 
 class TestWallet(unittest.TestCase):
     @patch('stocktracker.stockAPI.StockAPI')
@@ -75,4 +82,455 @@ class TestWallet(unittest.TestCase):
         df = self.wallet.to_dataframe()
         self.assertEqual(len(df), 1)  # Uma linha por ação
         self.assertEqual(df.iloc[0]['Ticket'], self.ticket)
-        self.assertEqual(df.iloc[0]['Quantidade'], self.quantity)
\ No newline at end of file
+        self.assertEqual(df.iloc[0]['Quantidade'], self.quantity)
+
+
+class TestWalletRefresh(unittest.TestCase):
+    def make_stock(self, price, quantity, spent, update=None):
+        stock = MagicMock(current_value=price, quantity=quantity, total_spent=spent, pending=[])
+        if update:
+            stock.update_stock_status.side_effect = update
+        return stock
+
+    def test_refresh_runs_in_parallel(self):
+        # so passa da barreira se as tres atualizacoes estiverem rodando ao mesmo tempo
+        barrier = threading.Barrier(3, timeout=5)
+        wallet = Wallet("Parallel")
+        wallet.stocks = {
+            ticket: self.make_stock(10, 1, 5, update=barrier.wait) for ticket in ("A", "B", "C")
+        }
+
+        wallet.update_wallet_status(max_workers=3)
+
+        self.assertEqual(wallet.refresh_errors, {})
+        self.assertEqual(wallet.total_value, 30)
+        self.assertEqual(wallet.total_spent, 15)
+        self.assertEqual(wallet.tickets_count, 3)
+
+    def test_failed_ticker_does_not_abort_refresh(self):
+        wallet = Wallet("Failures")
+        wallet.stocks = {
+            "OK": self.make_stock(10, 2, 10),
+            "BAD": self.make_stock(5, 1, 5, update=ValueError("No data")),
+        }
+
+        wallet.update_wallet_status()
+
+        self.assertEqual(list(wallet.refresh_errors), ["BAD"])
+        wallet.stocks["OK"].update_stock_status.assert_called_once()
+        self.assertEqual(wallet.total_value, 25)
+        self.assertAlmostEqual(wallet.total_gain, 66.6667, places=3)
+
+
+class TestLazyWallet(SharedAPITestCase):
+    api_options = {"memory_ttl": 0}
+
+    def test_lazy_stock_defers_download(self):
+        stock = Stock("AAPL", 10, None, "2024-06-03", lazy=True)
+        self.assertEqual(self.api.network_calls, 0)
+        self.assertEqual(stock.total_spent, 0)
+
+        price = stock.current_price
+        self.assertEqual(self.api.network_calls, 1)
+        self.assertEqual(stock.pending, [])
+        self.assertAlmostEqual(stock.total_spent, price * 10)
+
+    def test_resolve_uses_one_batched_download(self):
+        wallet = Wallet("Lazy")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("MSFT", 5, 400.0, "2024-05-15")
+        wallet.add_stock("AAPL", 2, 190.0, "2024-06-10")
+        self.assertEqual(self.api.network_calls, 0)
+
+        wallet.update_wallet_status()
+        self.assertEqual(self.api.network_calls, 1)
+        self.assertEqual(wallet.total_spent, 4180.0)
+        self.assertEqual(wallet.stocks["AAPL"].quantity, 12)
+
+    def test_resolve_drops_invalid_purchases(self):
+        wallet = Wallet("Lazy")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("MSFT", 5, 400.0, "2030-01-02")
+
+        errors = wallet.resolve()
+        self.assertEqual(list(errors), ["MSFT"])
+        self.assertNotIn("MSFT", wallet.stocks)
+        self.assertEqual(wallet.stocks["AAPL"].quantity, 10)
+
+    def test_empty_history_keeps_purchases_pending(self):
+        wallet = Wallet("Offline")
+        wallet.add_stock("AAPL", 10, None, "2024-06-03")
+        # provedor sem resposta (como o yfinance offline): historicos vazios
+        with patch.object(self.api.provider, "get_history", return_value=pd.DataFrame()), \
+                patch.object(self.api.provider, "get_histories", return_value={}):
+            wallet.update_wallet_status()
+
+        self.assertIsInstance(wallet.resolve_errors["AAPL"], MarketDataUnavailable)
+        self.assertIn("AAPL", wallet.stocks)
+        self.assertTrue(wallet.stocks["AAPL"].pending)
+        self.assertEqual(wallet.total_spent, 0)
+
+        wallet.update_wallet_status()
+        self.assertFalse(wallet.stocks["AAPL"].pending)
+        self.assertAlmostEqual(wallet.total_spent, 10 * wallet.stocks["AAPL"].purchases["2024-06-03"].price)
+        self.assertGreater(wallet.total_spent, 0)
+
+    def test_network_error_does_not_abort_refresh(self):
+        self.api.retry_policy = RetryPolicy(attempts=1)
+        wallet = Wallet("Flaky")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("MSFT", 5, 400.0, "2024-05-15")
+        with patch.object(self.api.provider, "get_history", side_effect=OSError("offline")), \
+                patch.object(self.api.provider, "get_histories", side_effect=OSError("offline")):
+            wallet.update_wallet_status()
+
+        self.assertEqual(sorted(wallet.resolve_errors), ["AAPL", "MSFT"])
+        self.assertIsInstance(wallet.resolve_errors["AAPL"], OSError)
+        self.assertEqual(wallet.tickets_count, 15)
+        self.assertEqual(wallet.total_spent, 3800)
+
+    def test_selling_unpriced_purchase_keeps_totals_in_sync(self):
+        wallet = Wallet("Unpriced")
+        wallet.add_stock("AAPL", 10, None, "2024-06-03")
+        wallet.remove_stock("AAPL", 4)
+
+        stock = wallet.stocks["AAPL"]
+        self.assertEqual(stock.quantity, 6)
+        self.assertGreater(stock.total_spent, 0)
+        self.assertAlmostEqual(wallet.total_spent, stock.total_spent)
+        self.assertEqual(wallet.tickets_count, 6)
+
+    def test_validated_purchase_reports_only_its_own_errors(self):
+        wallet = Wallet("Validated")
+        wallet.resolve_errors["AAPL"] = ValueError("stale error from an earlier refresh")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03", validate=True)
+        self.assertEqual(wallet.stocks["AAPL"].quantity, 10)
+
+        with self.assertRaises(ValueError):
+            wallet.add_stock("AAPL", 5, 190.0, "2030-01-02", validate=True)
+        self.assertEqual(wallet.tickets_count, 10)
+
+        with patch.object(self.api.provider, "get_history", return_value=pd.DataFrame()), \
+                patch.object(self.api.provider, "get_histories", return_value={}):
+            with self.assertRaises(ValueError):
+                wallet.add_stock("MSFT", 5, 400.0, "2024-05-15", validate=True)
+        self.assertNotIn("MSFT", wallet.stocks)
+        self.assertEqual((wallet.tickets_count, wallet.total_spent, wallet.total_quantity), (10, 1800.0, 1))
+
+    def test_sold_pending_lots_leave_the_pending_list(self):
+        wallet = Wallet("Pruned")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("AAPL", 5, 185.0, "2024-06-10")
+        wallet.remove_stock("AAPL", 10)  # vende o primeiro lote, ainda pendente
+        stock = wallet.stocks["AAPL"]
+        self.assertEqual(len(stock.pending), 1)
+
+        wallet.add_stock("AAPL", 3, None, "2024-06-12")
+        wallet.remove_stock("AAPL", 2)
+        self.assertEqual(stock.quantity, 6)
+        self.assertAlmostEqual(wallet.total_spent, stock.total_spent)
+
+    def test_mutations_update_totals_without_network(self):
+        wallet = Wallet("Incremental")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.update_wallet_status()
+        calls = self.api.network_calls
+        price = wallet.last_prices["AAPL"]
+
+        wallet.add_stock("AAPL", 5, 190.0, "2024-06-10")
+        wallet.remove_stock("AAPL", 12)
+
+        self.assertEqual(self.api.network_calls, calls)
+        self.assertEqual(wallet.tickets_count, 3)
+        self.assertEqual(wallet.total_quantity, 1)
+        self.assertAlmostEqual(wallet.total_spent, 3 * 190.0)
+        self.assertAlmostEqual(wallet.total_value, 3 * price)
+
+        wallet.remove_stock("AAPL")
+        self.assertEqual((wallet.total_quantity, wallet.tickets_count), (0, 0))
+        self.assertAlmostEqual(wallet.total_value, 0)
+
+    def test_performance_history_matches_holdings(self):
+        wallet = Wallet("History")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("AAPL", 4, 185.0, "2024-06-08")  # sabado: conta a partir de segunda
+        wallet.add_stock("MSFT", 5, 400.0, "2024-06-05")
+        wallet.remove_stock("AAPL", 3)
+
+        history = wallet.get_performance_history()
+        closes = self.api.get_histories(["AAPL", "MSFT"], "2024-06-03")
+
+        for day, aapl, msft in [("2024-06-04", 7, 0), ("2024-06-07", 7, 5), ("2024-06-10", 11, 5)]:
+            expected = aapl * closes.loc[day, "AAPL"] + msft * closes.loc[day, "MSFT"]
+            self.assertAlmostEqual(history.loc[day], expected)
+
+    def test_performance_history_is_memoized(self):
+        wallet = Wallet("Memo")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("MSFT", 5, 400.0, "2024-06-05")
+        first = wallet.get_performance_history()
+
+        with patch.object(self.api, "get_histories", wraps=self.api.get_histories) as get_histories:
+            self.assertTrue(wallet.get_performance_history().equals(first))
+            get_histories.assert_not_called()
+
+            # compra retroativa: refaz so a partir da data dela
+            wallet.add_stock("MSFT", 2, 390.0, "2024-06-12")
+            updated = wallet.get_performance_history()
+            self.assertEqual(get_histories.call_args.args[1], "2024-06-05")
+
+        wallet.value_history.invalidate()
+        self.assertTrue(updated.equals(wallet.get_performance_history()))
+        self.assertTrue(updated.loc[:"2024-06-11"].equals(first.loc[:"2024-06-11"]))
+
+    def test_performance_history_follows_price_changes(self):
+        wallet = Wallet("Prices")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("MSFT", 5, 400.0, "2024-06-05")
+        first = wallet.get_performance_history()
+
+        # fechamento do ultimo pregao revisto por um refresh durante o dia
+        last = self.api.get_history("AAPL", "2024-06-03").iloc[-1:]
+        self.api.store.write("AAPL", last.assign(Close=last["Close"] + 1000))
+        wallet.update_wallet_status()
+        updated = wallet.get_performance_history()
+
+        self.assertAlmostEqual(updated.loc["2024-06-28"], first.loc["2024-06-28"] + 10 * 1000)
+        self.assertTrue(updated.loc[:"2024-06-27"].equals(first.loc[:"2024-06-27"]))
+
+        # recarregar os mesmos precos nao refaz nada
+        self.api.prices.update("MSFT", self.api.get_history("MSFT", "2024-06-03"))
+        with patch.object(wallet, "_value_series") as value_series:
+            self.assertTrue(wallet.get_performance_history().equals(updated))
+            value_series.assert_not_called()
+
+    def test_to_dataframe_is_cached_until_a_change(self):
+        wallet = Wallet("Frame")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("MSFT", 5, 400.0, "2024-05-15")
+
+        df = wallet.to_dataframe()
+        self.assertIs(wallet.to_dataframe(), df)
+        self.assertEqual(list(df["Ticket"]), ["AAPL", "MSFT"])
+        aapl = wallet.stocks["AAPL"]
+        self.assertAlmostEqual(df.iloc[0]["Valor Atual"], aapl.current_price * 10)
+        self.assertAlmostEqual(df.iloc[0]["Valorização (%)"], (aapl.current_price * 10 - 1800) / 1800 * 100)
+
+        wallet.remove_stock("MSFT", 2)
+        df = wallet.to_dataframe()
+        self.assertEqual(df.iloc[1]["Quantidade"], 3)
+
+        self.api.get_history("JPM", "2024-06-03")  # precos de outro ticket nao refazem o frame
+        self.assertIs(wallet.to_dataframe(), df)
+
+        self.api.prices.update("AAPL", self.api.get_history("AAPL", "2024-06-03").iloc[-1:] * 2)
+        self.assertIsNot(wallet.to_dataframe(), df)
+        self.assertAlmostEqual(wallet.to_dataframe().iloc[0]["Preço Atual"], df.iloc[0]["Preço Atual"] * 2)
+
+    def test_import_transactions(self):
+        wallet = Wallet("Import")
+        wallet.add_stock("AAPL", 2, 170.0, "2024-05-01")
+        transactions = pd.DataFrame({
+            "Ticker": ["aapl", "MSFT", "AAPL", "MSFT", "AAPL"],
+            "Date": ["2024-06-03", "2024-05-15", "2024-06-10", "2024-06-12", "2024-06-14"],
+            "Qty": [10, 5, 4, 2, 3],
+            "Price": [180.0, 400.0, None, None, None],
+            "Side": ["BUY", "BUY", "buy", "SELL", "SELL"],
+        })
+
+        errors = wallet.import_transactions(transactions)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(self.api.network_calls, 1)
+        self.assertEqual(wallet.stocks["AAPL"].quantity, 13)
+        self.assertEqual(wallet.stocks["MSFT"].quantity, 3)
+        # FIFO: a venda de AAPL consome as 2 compradas em maio e 1 das de junho
+        self.assertEqual(wallet.stocks["AAPL"].purchases["2024-06-03"].quantity, 9)
+        self.assertIsNotNone(wallet.stocks["AAPL"].purchases["2024-06-10"].price)
+        self.assertEqual(wallet.tickets_count, 16)
+        self.assertAlmostEqual(
+            wallet.total_spent, sum(stock.total_spent for stock in wallet.stocks.values())
+        )
+
+    def test_import_transactions_sells_only_earlier_buys(self):
+        wallet = Wallet("Import", cost_basis="lifo")
+        wallet.import_transactions([
+            ("AAPL", "2024-06-03", 10, 180.0, "BUY"),
+            ("AAPL", "2024-06-05", 4, 185.0, "SELL"),
+            ("AAPL", "2024-06-10", 5, 190.0, "BUY"),
+        ])
+
+        # a venda de 05/06 so podia sair do lote de 03/06
+        lots = [(lot.date, lot.quantity) for lot in wallet.stocks["AAPL"].purchases.values()]
+        self.assertEqual(lots, [("2024-06-03", 6), ("2024-06-10", 5)])
+        self.assertAlmostEqual(wallet.realized_gain, 4 * (185 - 180))
+        self.assertEqual(self.api.network_calls, 1)
+
+    def test_import_transactions_resolves_once_with_mixed_sells(self):
+        rows = [
+            ("AAPL", "2024-06-03", 10, 180.0, "BUY"),
+            ("AAPL", "2024-06-04", 6, 184.0, "SELL"),
+            ("AAPL", "2024-06-05", 5, 190.0, "BUY"),
+            ("AAPL", "2024-06-06", 4, 195.0, "SELL"),
+            ("AAPL", "2024-06-07", 2, 200.0, "BUY"),
+        ]
+        imported = Wallet("Import", cost_basis="average")
+        with patch.object(imported, "resolve", wraps=imported.resolve) as resolve:
+            imported.import_transactions(rows)
+        self.assertEqual(resolve.call_count, 1)
+
+        # mesmo resultado de lancar as linhas uma a uma
+        manual = Wallet("Manual", cost_basis="average")
+        for ticket, date, qty, price, side in rows:
+            if side == "BUY":
+                manual.add_stock(ticket, qty, price, date)
+            else:
+                manual.remove_stock(ticket, qty, price=price, date=date)
+        self.assertAlmostEqual(imported.realized_gain, manual.realized_gain)
+        self.assertAlmostEqual(imported.total_spent, manual.total_spent)
+        lots = lambda wallet: [(lot.date, lot.quantity, lot.price) for lot in wallet.stocks["AAPL"].purchases.values()]
+        self.assertEqual(lots(imported), lots(manual))
+
+    def test_import_transactions_from_csv_rows(self):
+        wallet = Wallet("Import")
+        path = os.path.join(self.tmpdir.name, "broker.csv")
+        with open(path, "w") as f:
+            f.write("ticker,date,qty,price\nAAPL,2024-06-03,10,180\nMSFT,2024-6-5,5,400\n")
+        wallet.import_transactions(path)
+        wallet.import_transactions([("AAPL", "2024-06-12", 2, 190.0, "SELL")])
+
+        self.assertEqual(wallet.stocks["AAPL"].quantity, 8)
+        self.assertEqual(wallet.stocks["MSFT"].purchases.oldest_date(), "2024-06-05")
+        self.assertAlmostEqual(wallet.total_spent, 8 * 180 + 5 * 400)
+
+    def test_import_transactions_validates_everything_first(self):
+        wallet = Wallet("Import")
+        with self.assertRaises(ValueError):
+            wallet.import_transactions([("AAPL", "2024-06-03", 10, 180.0), ("MSFT", "03/06/2024", 5, 400.0)])
+        with self.assertRaises(ValueError):
+            wallet.import_transactions([("AAPL", "2024-06-03", 10, 180.0, "BUY"), ("AAPL", "2024-06-01", 1, 0, "SELL")])
+        self.assertEqual(wallet.stocks, {})
+
+    def test_realized_and_unrealized_gain(self):
+        wallet = Wallet("Gains", cost_basis="lifo")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("AAPL", 5, 190.0, "2024-06-10")
+        wallet.update_wallet_status()
+
+        wallet.remove_stock("AAPL", 6, price=200.0, date="2024-06-20")
+        self.assertAlmostEqual(wallet.realized_gain, 5 * (200 - 190) + (200 - 180))
+        self.assertAlmostEqual(wallet.total_spent, 9 * 180.0)
+        self.assertAlmostEqual(wallet.unrealized_gain, 9 * (wallet.last_prices["AAPL"] - 180))
+
+        # vender tudo usa o preco da ultima atualizacao
+        last_price = wallet.last_prices["AAPL"]
+        wallet.remove_stock("AAPL")
+        self.assertNotIn("AAPL", wallet.stocks)
+        self.assertAlmostEqual(wallet.realized_gain, 70 + 9 * (last_price - 180))
+        self.assertEqual(len(wallet.realized), 2)
+        self.assertAlmostEqual(wallet.unrealized_gain, 0)
+
+    def test_average_cost_keeps_lot_prices(self):
+        wallet = Wallet("Average", cost_basis="average")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("AAPL", 5, 210.0, "2024-06-10")
+        wallet.update_wallet_status()
+
+        wallet.remove_stock("AAPL", 6, price=200.0, date="2024-06-20")
+        self.assertAlmostEqual(wallet.realized_gain, 6 * (200 - 190))
+        self.assertAlmostEqual(wallet.total_spent, 9 * 190.0)
+        holding = wallet.stocks["AAPL"]
+        self.assertEqual([lot.price for lot in holding.purchases.values()], [180.0, 210.0])
+
+        # fluxos de caixa com o valor pago de verdade: somam o lucro total
+        tickets, days, amounts = wallet.get_cash_flows()
+        self.assertAlmostEqual(amounts[amounts < 0].sum(), -(10 * 180 + 5 * 210))
+        self.assertAlmostEqual(amounts.sum(), wallet.realized_gain + wallet.unrealized_gain)
+
+        holding.update_stock_status()
+        self.assertAlmostEqual(holding.total_spent, 9 * 190.0)
+
+    def test_specific_lot_sale(self):
+        wallet = Wallet("Lots")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("AAPL", 5, 190.0, "2024-06-10")
+        lot = wallet.stocks["AAPL"].purchases["2024-06-10"]
+
+        wallet.remove_stock("AAPL", 3, method="specific", lots=[lot], price=195.0)
+        self.assertAlmostEqual(wallet.realized_gain, 3 * 5)
+        self.assertEqual(lot.quantity, 2)
+        self.assertEqual(wallet.tickets_count, 12)
+
+    def test_risk_metrics_of_current_holdings(self):
+        self.use_api(today=None)  # janela termina hoje: dados sinteticos ate a data real
+        wallet = Wallet("Risk")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("MSFT", 5, 400.0, "2024-05-15")
+
+        metrics = wallet.get_risk_metrics(days=120, benchmark="^GSPC")
+        values = wallet.get_holdings_history(days=120)
+
+        self.assertEqual(list(metrics.index), analytics.METRICS)
+        self.assertAlmostEqual(values.iloc[-1], 10 * wallet.last_prices["AAPL"] + 5 * wallet.last_prices["MSFT"])
+        self.assertGreater(metrics["Volatility"], 0)
+        self.assertTrue(np.isfinite(metrics["Beta"]))
+        self.assertLessEqual(metrics["Max Drawdown"], 0)
+
+    def test_diversification_of_current_holdings(self):
+        self.use_api(today=None)  # a janela da correlacao termina hoje
+        wallet = Wallet("Diversified")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("JPM", 5, 190.0, "2024-05-15")
+
+        weights = wallet.get_holding_weights()
+        correlation = wallet.get_correlation()
+        diversification = wallet.get_diversification()
+
+        self.assertAlmostEqual(weights.sum(), 1.0)
+        self.assertEqual(list(correlation.index), ["AAPL", "JPM"])
+        self.assertAlmostEqual(correlation.loc["AAPL", "AAPL"], 1.0)
+        self.assertAlmostEqual(diversification["Average Correlation"], correlation.loc["AAPL", "JPM"])
+        self.assertGreaterEqual(diversification["Diversification Ratio"], 1.0)
+        self.assertGreater(diversification["Volatility"], 0)
+
+    def test_benchmark_history_snaps_to_next_trading_day(self):
+        wallet = Wallet("Benchmark")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("MSFT", 5, 400.0, "2024-06-08")  # sabado: compra na segunda, 10/06
+
+        benchmark = wallet.get_benchmark_history("^GSPC")
+        history = wallet.get_performance_history()
+        closes = self.api.get_history("^GSPC", "2024-06-01")["Close"]
+        closes.index = closes.index.normalize()
+
+        self.assertTrue(benchmark.index.equals(history.index))
+        self.assertAlmostEqual(benchmark.loc["2024-06-07"], 1800.0 / closes.loc["2024-06-03"] * closes.loc["2024-06-07"])
+        shares = 1800.0 / closes.loc["2024-06-03"] + 2000.0 / closes.loc["2024-06-10"]
+        self.assertAlmostEqual(benchmark.loc["2024-06-10"], shares * closes.loc["2024-06-10"])
+        self.assertAlmostEqual(benchmark.iloc[-1], shares * closes.iloc[-1])
+
+    def test_money_weighted_returns(self):
+        wallet = Wallet("Returns")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        wallet.add_stock("AAPL", 5, 190.0, "2024-06-10")
+        wallet.add_stock("MSFT", 5, 400.0, "2024-05-15")
+        wallet.update_wallet_status()
+        wallet.remove_stock("MSFT", price=420.0, date="2024-06-20")
+
+        tickets, days, amounts = wallet.get_cash_flows()
+        rates = wallet.get_money_weighted_returns()
+
+        self.assertEqual(list(rates.index), ["MSFT", "AAPL", "Total"])
+        self.assertAlmostEqual(rates["MSFT"], (420 / 400) ** (365 / 36) - 1)
+        self.assertAlmostEqual(amounts.sum(), wallet.realized_gain + wallet.unrealized_gain)
+        self.assertAlmostEqual(rates["Total"], analytics.xirr(amounts, days))
+
+    def test_time_weighted_return_ignores_later_purchases(self):
+        wallet = Wallet("TWR")
+        wallet.add_stock("AAPL", 10, 180.0, "2024-06-03")
+        history = wallet.get_performance_history()
+        expected = history.iloc[-1] / history.loc["2024-06-03"] - 1
+        self.assertAlmostEqual(wallet.get_time_weighted_return(), expected)
+
+        wallet.add_stock("AAPL", 30, 190.0, "2024-06-14")
+        self.assertAlmostEqual(wallet.get_time_weighted_return(), expected)